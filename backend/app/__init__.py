@@ -15,11 +15,34 @@ def create_app():
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # 接口响应缓存配置，详见 app/utils/cache.py
+    app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'memory')
+    app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL')
+    app.config['CACHE_DEFAULT_TTL'] = int(os.getenv('CACHE_DEFAULT_TTL', 60))
+    app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+    app.config['CACHE_WORKERS'] = int(os.getenv('WEB_CONCURRENCY', 1))
+    app.config['CACHE_MEMORY_MULTI_WORKER_TTL'] = int(os.getenv('CACHE_MEMORY_MULTI_WORKER_TTL', 5))
+    # 登录态缓存配置，详见 app/utils/auth.py
+    app.config['AUTH_TOKEN_CACHE_SIZE'] = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 4096))
+    app.config['AUTH_USER_CACHE_SIZE'] = int(os.getenv('AUTH_USER_CACHE_SIZE', 4096))
+    app.config['AUTH_USER_CACHE_TTL'] = int(os.getenv('AUTH_USER_CACHE_TTL', 60))
+    # 列表查询严格加载模式（测试用），详见 app/utils/loading.py
+    app.config['STRICT_LOADING'] = os.getenv('STRICT_LOADING', '0') in ('1', 'true', 'True')
+    # 课程搜索索引配置，详见 app/utils/search.py
+    app.config['SEARCH_BACKEND'] = os.getenv('SEARCH_BACKEND', 'auto')
+    app.config['SEARCH_MEMORY_TTL'] = int(os.getenv('SEARCH_MEMORY_TTL', 300))
+    # 搜索联想索引配置，详见 app/utils/suggest.py
+    app.config['SUGGEST_TTL'] = int(os.getenv('SUGGEST_TTL', 300))
     
     # 初始化扩展
     db.init_app(app)
     CORS(app)
     
+    from app.utils.cache import cache
+    cache.init_app(app)
+    from app.utils import auth as auth_utils
+    auth_utils.init_app(app)
+    
     # 初始化API对象但先不关联Flask应用
     from app.api import api
     
@@ -29,9 +52,14 @@ def create_app():
     # 创建数据库表
     with app.app_context():
         db.create_all()
+        
+        from app.utils.search import search_index
+        search_index.init_app(app)
+        from app.utils.suggest import suggest_index
+        suggest_index.init_app(app)
     
     # 先导入API模块，让它们注册路由
-    from app.api import courses, teachers, evaluations, comments, rankings, discussions, rankings_frontend, auth
+    from app.api import courses, teachers, evaluations, comments, rankings, discussions, rankings_frontend, auth, search
     
     # 然后再将API对象与Flask应用关联，确保所有路由都已注册
     api.init_app(app)
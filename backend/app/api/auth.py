@@ -1,18 +1,21 @@
 from flask import request, jsonify
 from flask_restful import Resource
-import requests
 import jwt
 import os
 import time
 from datetime import datetime, timedelta
 from app import db
-from app.models import User, Evaluation, Comment, Like
-from app.schemas import EvaluationSchema, CommentSchema
-from app.utils.auth import get_current_user
-from sqlalchemy import desc
+from app.models import User, Evaluation, Comment, UserStats
+from app.schemas import EvaluationSchema
+from app.utils.auth import get_current_user, invalidate_user
+from app.utils.comments import dump_comment_tree, load_subtrees
+from app.utils.loading import list_load_options
+from app.utils.user_stats import ensure_user_stats, user_stats_fields
+from app.utils.wechat import WechatUnavailableError, get_wechat_client
+from app.utils.pagination import apply_order, cursor_paginate
+from sqlalchemy.orm import joinedload
 
 evaluations_schema = EvaluationSchema(many=True)
-comments_schema = CommentSchema(many=True)
 
 class WechatLoginResource(Resource):
     def post(self):
@@ -24,7 +27,10 @@ class WechatLoginResource(Resource):
             return {'error': '缺少code参数'}, 400
         
         # 调用微信API获取openid
-        openid = self._get_wechat_openid(code)
+        try:
+            openid = self._get_wechat_openid(code)
+        except WechatUnavailableError:
+            return {'error': '微信服务暂时不可用，请稍后重试'}, 503
         if not openid:
             return {'error': '获取微信openid失败'}, 500
         
@@ -39,6 +45,8 @@ class WechatLoginResource(Resource):
                 avatar_url=None       # 默认头像，后续可以更新
             )
             db.session.add(user)
+            db.session.flush()
+            ensure_user_stats(user.id)
             db.session.commit()
         
         # 生成JWT token
@@ -69,21 +77,9 @@ class WechatLoginResource(Resource):
             # 这样在开发环境中可以模拟多用户场景
             return f"mock_openid_{hash(code)}_{int(time.time())}"
         
-        # 微信API接口
-        url = f'https://api.weixin.qq.com/sns/jscode2session?appid={appid}&secret={secret}&js_code={code}&grant_type=authorization_code'
-        
-        try:
-            response = requests.get(url, timeout=5)
-            result = response.json()
-            
-            if 'openid' in result:
-                return result['openid']
-            else:
-                print(f"微信API错误: {result}")
-                return None
-        except Exception as e:
-            print(f"请求微信API失败: {e}")
-            return None
+        # 通过共享连接池的客户端调用微信API（超时、重试与熔断见 app/utils/wechat.py）
+        result = get_wechat_client().code2session(code)
+        return result['openid'] if result else None
     
     def _generate_jwt_token(self, user_id):
         """生成JWT token"""
@@ -122,6 +118,7 @@ class UpdateUserInfoResource(Resource):
             user.avatar_url = data['avatar_url']
 
         db.session.commit()
+        invalidate_user(user.id)
 
         return {
             'id': user.id,
@@ -136,10 +133,8 @@ class CurrentUserResource(Resource):
         if not user:
             return {'error': '请先登录'}, 401
 
-        # 统计用户数据
-        evaluations_count = Evaluation.query.filter_by(user_id=user.id).count()
-        discussions_count = Comment.query.filter_by(user_id=user.id, parent_id=None).count()
-        comments_count = Comment.query.filter_by(user_id=user.id).filter(Comment.parent_id.isnot(None)).count()
+        # 统计用户数据：按主键读取 user_stats 一行
+        stats = UserStats.query.get(user.id)
 
         return {
             'id': user.id,
@@ -147,12 +142,7 @@ class CurrentUserResource(Resource):
             'avatar_url': user.avatar_url,
             'openid': user.openid,
             'created_at': user.created_at.isoformat() if user.created_at else None,
-            'stats': {
-                'evaluations_count': evaluations_count,
-                'discussions_count': discussions_count,
-                'comments_count': comments_count,
-                'total_posts': evaluations_count + discussions_count + comments_count
-            }
+            'stats': user_stats_fields(stats)
         }, 200
 
 class UserEvaluationsResource(Resource):
@@ -160,13 +150,27 @@ class UserEvaluationsResource(Resource):
         """获取指定用户的评价列表"""
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
-
-        # 构建查询
-        query = Evaluation.query.filter_by(user_id=user_id)
-        query = query.order_by(desc(Evaluation.created_at))
+        # 传入cursor参数（第一页为空字符串）时使用游标分页
+        cursor = request.args.get('cursor')
+
+        # 构建查询（所属课程随评价一次取回）
+        query = Evaluation.query.options(*list_load_options(joinedload(Evaluation.course))).filter_by(user_id=user_id)
+        order_by = [(Evaluation.created_at, True), (Evaluation.id, True)]
+
+        if cursor is not None:
+            # 游标分页：不统计总数
+            try:
+                evaluations, next_cursor = cursor_paginate(query, order_by, cursor, per_page)
+            except ValueError:
+                return {'error': '无效的cursor参数'}, 400
+            return {
+                'evaluations': evaluations_schema.dump(evaluations),
+                'next_cursor': next_cursor,
+                'per_page': per_page
+            }, 200
 
         # 分页
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        pagination = apply_order(query, order_by).paginate(page=page, per_page=per_page, error_out=False)
         evaluations = pagination.items
 
         result = evaluations_schema.dump(evaluations)
@@ -183,37 +187,54 @@ class UserDiscussionsResource(Resource):
         """获取指定用户的讨论列表（包括评论和回复）"""
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
-
-        # 获取用户的所有评论（包括讨论和回复）
-        query = Comment.query.filter_by(user_id=user_id)
-        query = query.order_by(desc(Comment.created_at))
-
-        # 分页
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        comments = pagination.items
+        # 传入cursor参数（第一页为空字符串）时使用游标分页
+        cursor = request.args.get('cursor')
+
+        # 获取用户的所有评论（包括讨论和回复），所属课程和被回复的父评论随评论一次取回
+        query = Comment.query.options(
+            *list_load_options(joinedload(Comment.course), joinedload(Comment.parent))
+        ).filter_by(user_id=user_id)
+        order_by = [(Comment.created_at, True), (Comment.id, True)]
+
+        if cursor is not None:
+            # 游标分页：不统计总数
+            try:
+                comments, next_cursor = cursor_paginate(query, order_by, cursor, per_page)
+            except ValueError:
+                return {'error': '无效的cursor参数'}, 400
+        else:
+            # 分页
+            pagination = apply_order(query, order_by).paginate(page=page, per_page=per_page, error_out=False)
+            comments = pagination.items
+
+        # 一次查询加载本页评论的全部回复树
+        children = load_subtrees(comments)
 
         # 格式化数据
         result = []
         for comment in comments:
-            comment_data = comments_schema.dump([comment])[0]
+            comment_data = dump_comment_tree(comment, children)
             # 添加类型标识
             comment_data['type'] = 'discussion' if comment.parent_id is None else 'reply'
             # 添加点赞信息
-            likes_count = Like.query.filter_by(
-                target_type='comment',
-                target_id=comment.id
-            ).count()
-            comment_data['likes_count'] = likes_count
+            comment_data['likes_count'] = comment.likes_count
 
             # 如果是回复，添加父评论信息
             if comment.parent_id:
-                parent = Comment.query.get(comment.parent_id)
+                parent = comment.parent
                 if parent:
                     comment_data['parent_author'] = parent.user_name
                     comment_data['parent_content'] = parent.content[:50] + '...' if len(parent.content) > 50 else parent.content
 
             result.append(comment_data)
 
+        if cursor is not None:
+            return {
+                'discussions': result,
+                'next_cursor': next_cursor,
+                'per_page': per_page
+            }, 200
+
         return {
             'discussions': result,
             'total': pagination.total,
@@ -243,6 +264,7 @@ class UpdateNicknameResource(Resource):
         user.nickname = nickname
         user.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_user(user.id)
 
         return {
             'id': user.id,
@@ -1,10 +1,19 @@
 from flask import request, jsonify
 from flask_restful import Resource
 from app import db
-from app.models import Comment, Course, Like, User
+from app.models import Comment, Course, User
 from app.schemas import CommentSchema
 from app.utils.auth import get_current_user
-from sqlalchemy import desc
+from app.utils.cache import cache
+from app.utils.comments import (
+    assign_comment_path, can_reply_to, delete_comment_tree, dump_comment_tree, load_reply_page, load_subtrees,
+    reply_page_args
+)
+from app.utils.pagination import apply_order, cursor_paginate
+from app.utils.likes import liked_target_ids, toggle_like
+from app.utils.loading import list_load_options
+from app.utils.user_stats import apply_comment
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 
 comment_schema = CommentSchema()
@@ -16,49 +25,57 @@ class CommentsResource(Resource):
         course_id = request.args.get('course_id')
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
+        # 传入cursor参数（第一页为空字符串）时使用游标分页
+        cursor = request.args.get('cursor')
         
         # 获取当前登录用户
         user = get_current_user()
         
-        # 构建查询，只获取顶级评论（非回复）
-        query = Comment.query.filter(Comment.parent_id.is_(None))
+        # 构建查询，只获取顶级评论（非回复），所属课程随评论一次取回
+        query = Comment.query.options(*list_load_options(joinedload(Comment.course))).filter(Comment.parent_id.is_(None))
         
         if course_id:
             query = query.filter(Comment.course_id == course_id)
         
         # 按创建时间降序排序
-        query = query.order_by(desc(Comment.created_at))
+        order_by = [(Comment.created_at, True), (Comment.id, True)]
+        
+        if cursor is not None:
+            # 游标分页：不统计总数
+            try:
+                comments, next_cursor = cursor_paginate(query, order_by, cursor, per_page)
+            except ValueError:
+                return {'error': '无效的cursor参数'}, 400
+        else:
+            # 分页
+            pagination = apply_order(query, order_by).paginate(page=page, per_page=per_page, error_out=False)
+            comments = pagination.items
+        
+        # 一次查询得到当前用户对本页评论的点赞状态
+        liked_ids = liked_target_ids(user, 'comment', [comment.id for comment in comments])
         
-        # 分页
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        comments = pagination.items
+        # 一次查询加载本页评论的全部回复树
+        children = load_subtrees(comments)
         
         # 序列化评论，包括回复
         result = []
         for comment in comments:
-            comment_data = comment_schema.dump(comment)
+            comment_data = dump_comment_tree(comment, children)
             # 计算回复数量
-            comment_data['reply_count'] = len(comment.replies)
-            
-            # 获取评论点赞数
-            likes_count = Like.query.filter_by(
-                target_type='comment',
-                target_id=comment.id
-            ).count()
-            comment_data['likes_count'] = likes_count
+            comment_data['reply_count'] = len(comment_data['replies'])
             
-            # 检查当前用户是否点赞
-            is_liked = False
-            if user:
-                is_liked = Like.query.filter_by(
-                    user_id=user.id,
-                    target_type='comment',
-                    target_id=comment.id
-                ).first() is not None
-            comment_data['is_liked'] = is_liked
+            comment_data['likes_count'] = comment.likes_count
+            comment_data['is_liked'] = comment.id in liked_ids
             
             result.append(comment_data)
         
+        if cursor is not None:
+            return {
+                'comments': result,
+                'next_cursor': next_cursor,
+                'per_page': per_page
+            }, 200
+        
         return {
             'comments': result,
             'total': pagination.total,
@@ -88,6 +105,8 @@ class CommentsResource(Resource):
             # 确保父评论属于同一课程
             if parent_comment.course_id != data['course_id']:
                 return {'error': 'Parent comment belongs to a different course'}, 400
+            if not can_reply_to(parent_comment):
+                return {'error': '回复层级过深'}, 400
         
         # 获取当前登录用户
         user = get_current_user()
@@ -102,7 +121,11 @@ class CommentsResource(Resource):
         )
         
         db.session.add(new_comment)
+        db.session.flush()
+        assign_comment_path(new_comment)
+        apply_comment(new_comment)
         db.session.commit()
+        cache.invalidate('course:%d' % new_comment.course_id)
         
         result = comment_schema.dump(new_comment)
         result['is_liked'] = False  # 新创建的评论默认未点赞
@@ -110,9 +133,19 @@ class CommentsResource(Resource):
 
 class CommentResource(Resource):
     def get(self, comment_id):
-        # 获取单个评论详情，包括所有回复
+        # 获取单个评论详情，包括第一页回复及各自的前几条回复，更多回复通过 next_cursor 翻页
         comment = Comment.query.get_or_404(comment_id)
-        result = comment_schema.dump(comment)
+        try:
+            limit, depth = reply_page_args(request.args, default_depth=2)
+        except ValueError:
+            return {'error': '无效的limit或depth参数'}, 400
+        try:
+            children, counts, next_cursor = load_reply_page(comment, limit, request.args.get('cursor'), depth)
+        except ValueError:
+            return {'error': '无效的cursor参数'}, 400
+        
+        result = dump_comment_tree(comment, children, counts=counts)
+        result['next_cursor'] = next_cursor
         return result, 200
     
     def put(self, comment_id):
@@ -138,6 +171,7 @@ class CommentResource(Resource):
             comment.updated_at = datetime.utcnow()
 
         db.session.commit()
+        cache.invalidate('course:%d' % comment.course_id)
 
         result = comment_schema.dump(comment)
         return result, 200
@@ -155,27 +189,34 @@ class CommentResource(Resource):
         if comment.user_id != user.id:
             return {'error': 'Unauthorized to delete this comment'}, 403
 
-        # 删除评论及其所有回复（级联删除）
-        def delete_comment_tree(comment):
-            # 删除该评论的所有点赞
-            Like.query.filter_by(target_type='comment', target_id=comment.id).delete()
-            # 递归删除所有回复
-            for reply in comment.replies:
-                delete_comment_tree(reply)
-            db.session.delete(comment)
-
+        # 按物化路径批量删除评论、其所有回复及这些评论的点赞
+        course_id = comment.course_id
         delete_comment_tree(comment)
         db.session.commit()
+        cache.invalidate('course:%d' % course_id)
 
         return {'message': 'Comment deleted successfully'}, 200
 
 class CommentRepliesResource(Resource):
     def get(self, comment_id):
-        # 获取评论的所有回复
+        # 获取评论的回复，每页 limit 条，depth 控制向下展开的层数；
+        # 总是返回游标分页结构，不传cursor时为第一页
         comment = Comment.query.get_or_404(comment_id)
-        replies = comment.replies
-        result = comments_schema.dump(replies)
-        return jsonify(result), 200
+        cursor = request.args.get('cursor')
+        try:
+            limit, depth = reply_page_args(request.args)
+        except ValueError:
+            return {'error': '无效的limit或depth参数'}, 400
+        try:
+            children, counts, next_cursor = load_reply_page(comment, limit, cursor, depth)
+        except ValueError:
+            return {'error': '无效的cursor参数'}, 400
+        
+        return {
+            'replies': [dump_comment_tree(reply, children, counts=counts) for reply in children[comment.id]],
+            'next_cursor': next_cursor,
+            'replies_count': counts.get(comment.id, 0)
+        }, 200
 
 class CommentLikeResource(Resource):
     def post(self, comment_id):
@@ -187,34 +228,10 @@ class CommentLikeResource(Resource):
         # 获取评论
         comment = Comment.query.get_or_404(comment_id)
         
-        # 检查用户是否已经点赞
-        existing_like = Like.query.filter_by(
-            user_id=user.id,
-            target_type='comment',
-            target_id=comment_id
-        ).first()
-        
-        if existing_like:
-            # 如果已经点赞，则取消点赞
-            db.session.delete(existing_like)
-            db.session.commit()
-            is_liked = False
-        else:
-            # 如果未点赞，则添加点赞
-            new_like = Like(
-                user_id=user.id,
-                target_type='comment',
-                target_id=comment_id
-            )
-            db.session.add(new_like)
-            db.session.commit()
-            is_liked = True
-        
-        # 获取点赞数量
-        likes_count = Like.query.filter_by(
-            target_type='comment',
-            target_id=comment_id
-        ).count()
+        # 切换点赞状态，点赞计数在同一事务内原子更新
+        is_liked, likes_count = toggle_like(user.id, 'comment', comment_id)
+        db.session.commit()
+        cache.invalidate('course:%d' % comment.course_id)
         
         return { 
             'message': '操作成功',
@@ -1,12 +1,33 @@
 from flask import request, jsonify
 from flask_restful import Resource
 from app import db
-from app.models import Course, Teacher, Evaluation
-from app.schemas import CourseSchema
-from sqlalchemy import desc, func
+from app.models import Course, Teacher, Evaluation, Comment, CourseStats, CourseDailyStats
+from app.schemas import CourseSchema, EvaluationSchema
+from app.utils.auth import get_current_user
+from app.utils.cache import cache, cached
+from app.utils.comments import dump_discussion_feed
+from app.utils.likes import liked_target_ids
+from app.utils.loading import list_load_options
+from app.utils.pagination import apply_order, cursor_paginate
+from app.utils.search import search_index
+from app.utils.suggest import suggest_index
+from app.utils.stats import (
+    DIMENSIONS, course_stats_map, course_score_fields, ensure_course_stats, rating_distribution
+)
+from app.utils.tags import popular_tags, shift_course_tag_stats
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 
 course_schema = CourseSchema()
 courses_schema = CourseSchema(many=True)
+evaluations_schema = EvaluationSchema(many=True)
+
+# 批量获取课程接口一次最多查询的课程数
+MAX_BATCH_IDS = 500
+
+# 课程页聚合接口中评价和讨论第一页的默认条数与上限
+PAGE_SECTION_SIZE = 10
+MAX_PAGE_SECTION_SIZE = 50
 
 class CoursesResource(Resource):
     def get(self):
@@ -16,16 +37,16 @@ class CoursesResource(Resource):
         # 新增支持多个学院筛选的departments参数
         departments = request.args.get('departments')
         keyword = request.args.get('keyword')
-        # 支持default排序（等同于created_at）
+        # 支持default排序：有关键词时按相关度，否则等同于created_at
         sort_by = request.args.get('sort_by', 'default')
-        if sort_by == 'default':
-            sort_by = 'created_at'
         page = int(request.args.get('page', 1))
         # 兼容page_size参数，适配前端请求
         per_page = int(request.args.get('page_size', request.args.get('per_page', 20)))
+        # 传入cursor参数（第一页为空字符串）时使用游标分页
+        cursor = request.args.get('cursor')
         
-        # 构建查询
-        query = Course.query
+        # 构建查询（教师随课程一次取回）
+        query = Course.query.options(*list_load_options(joinedload(Course.teacher)))
         
         # 筛选条件
         if semester:
@@ -42,83 +63,62 @@ class CoursesResource(Resource):
             # 筛选属于任一指定学院的课程
             query = query.join(Teacher).filter(Teacher.department.in_(department_list))
         
+        # 关键词搜索课程名、课程代码、简介和教师姓名（走搜索索引，见 app/utils/search.py）
+        relevance = None
         if keyword:
-            query = query.filter(
-                (Course.name.contains(keyword)) | 
-                (Course.course_code.contains(keyword)) |
-                (Course.description.contains(keyword)) |
-                (Course.teacher.has(Teacher.name.contains(keyword)))
-            )
+            query, relevance = search_index.apply(query, keyword)
+        if sort_by == 'default':
+            sort_by = 'relevance' if relevance is not None else 'created_at'
         
-        # 排序
-        if sort_by in ['score', 'score_desc', 'score_asc']:
-            # 按评分排序，需要进行复杂查询
-            courses = []
-            all_courses = query.all()
-            # 计算每个课程的平均评分并排序
-            course_scores = []
-            for course in all_courses:
-                if course.evaluations:
-                    avg_score = sum(e.score for e in course.evaluations) / len(course.evaluations)
-                    course_scores.append((course, avg_score))
-                else:
-                    course_scores.append((course, 0))
-            
-            # 根据排序类型决定升序或降序
-            reverse = sort_by != 'score_asc'
-            course_scores.sort(key=lambda x: x[1], reverse=reverse)
-            courses = [c[0] for c in course_scores]
-            
-            # 手动分页
-            start = (page - 1) * per_page
-            end = start + per_page
-            paginated_courses = courses[start:end]
-            total = len(courses)
+        # 排序键（评分和评价数排序通过外连接课程评分统计表在数据库中完成）
+        # 每项为 (排序表达式, 是否降序)，以课程ID结尾保证顺序稳定
+        if sort_by == 'relevance' and relevance is not None:
+            order_by = [(relevance, True), (Course.id, True)]
+        elif sort_by in ['score', 'score_desc', 'score_asc']:
+            avg_score = func.coalesce(
+                CourseStats.score_sum / func.nullif(CourseStats.evaluation_count, 0), 0
+            )
+            query = query.outerjoin(CourseStats, CourseStats.course_id == Course.id)
+            descending = sort_by != 'score_asc'
+            order_by = [(avg_score, descending), (Course.id, descending)]
         elif sort_by == 'comments_desc':
             # 按评论数量降序排序
-            courses = []
-            all_courses = query.all()
-            # 计算每个课程的评论数量并排序
-            course_comments = []
-            for course in all_courses:
-                comment_count = len(course.evaluations)
-                course_comments.append((course, comment_count))
-            
-            # 按评论数量降序排序
-            course_comments.sort(key=lambda x: x[1], reverse=True)
-            courses = [c[0] for c in course_comments]
-            
-            # 手动分页
-            start = (page - 1) * per_page
-            end = start + per_page
-            paginated_courses = courses[start:end]
-            total = len(courses)
+            query = query.outerjoin(CourseStats, CourseStats.course_id == Course.id)
+            order_by = [(func.coalesce(CourseStats.evaluation_count, 0), True), (Course.id, True)]
+        elif sort_by in ('created_at', 'relevance'):
+            order_by = [(Course.created_at, True), (Course.id, True)]
+        elif sort_by == 'name':
+            order_by = [(Course.name, False), (Course.id, False)]
+        else:
+            order_by = [(Course.id, False)]
+        
+        if cursor is not None:
+            # 游标分页：不统计总数
+            try:
+                paginated_courses, next_cursor = cursor_paginate(query, order_by, cursor, per_page)
+            except ValueError:
+                return {'error': '无效的cursor参数'}, 400
         else:
-            # 简单排序
-            if sort_by == 'created_at':
-                query = query.order_by(desc(Course.created_at))
-            elif sort_by == 'name':
-                query = query.order_by(Course.name)
-            
             # 分页
-            pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+            pagination = apply_order(query, order_by).paginate(page=page, per_page=per_page, error_out=False)
             paginated_courses = pagination.items
             total = pagination.total
         
-        # 序列化并添加平均评分
+        # 序列化并添加平均评分（一次查询取出本页所有课程的统计）
+        stats_map = course_stats_map(course.id for course in paginated_courses)
         result = []
         for course in paginated_courses:
             course_data = course_schema.dump(course)
-            # 计算平均评分
-            if course.evaluations:
-                avg_score = sum(e.score for e in course.evaluations) / len(course.evaluations)
-                course_data['avg_score'] = round(avg_score, 1)
-                course_data['evaluation_count'] = len(course.evaluations)
-            else:
-                course_data['avg_score'] = 0
-                course_data['evaluation_count'] = 0
+            course_data.update(course_score_fields(stats_map.get(course.id)))
             result.append(course_data)
         
+        if cursor is not None:
+            return {
+                'courses': result,
+                'next_cursor': next_cursor,
+                'per_page': per_page
+            }, 200
+        
         return {
             'courses': result,
             'total': total,
@@ -152,106 +152,148 @@ class CoursesResource(Resource):
         )
         
         db.session.add(new_course)
+        db.session.flush()
+        ensure_course_stats(new_course.id)
+        search_index.index_course(new_course)
         db.session.commit()
+        # 院系排行榜统计课程数；新课程归属的教师相关缓存一并失效
+        cache.invalidate('rankings', 'teachers')
+        suggest_index.index_course(new_course)
         
         result = course_schema.dump(new_course)
         return result, 201
 
+def parse_batch_ids(values):
+    """
+    解析批量接口的课程ID，去重并保持首次出现的顺序
+
+    Args:
+        values: ID列表，元素可为整数或数字字符串
+
+    Raises:
+        ValueError: 含有非整数ID或数量超过 MAX_BATCH_IDS
+    """
+    ids = []
+    seen = set()
+    for value in values:
+        # JSON 中的布尔值和小数不视为ID
+        if isinstance(value, str):
+            course_id = int(value.strip())
+        elif isinstance(value, int) and not isinstance(value, bool):
+            course_id = value
+        else:
+            raise ValueError('invalid id')
+        if course_id not in seen:
+            seen.add(course_id)
+            ids.append(course_id)
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValueError('too many ids')
+    return ids
+
+def dump_course_batch(course_ids):
+    """按输入顺序返回课程及平均评分、评价数量，两次查询，与课程数量无关"""
+    courses = Course.query.options(*list_load_options(joinedload(Course.teacher))).filter(
+        Course.id.in_(course_ids)
+    ).all() if course_ids else []
+    by_id = {course.id: course for course in courses}
+    stats_map = course_stats_map(list(by_id))
+    
+    result = []
+    for course_id in course_ids:
+        course = by_id.get(course_id)
+        if course is None:
+            continue
+        course_data = course_schema.dump(course)
+        course_data.update(course_score_fields(stats_map.get(course_id)))
+        result.append(course_data)
+    
+    return {
+        'courses': result,
+        'missing_ids': [course_id for course_id in course_ids if course_id not in by_id]
+    }
+
+class CourseBatchResource(Resource):
+    def get(self):
+        # 批量获取课程（收藏、浏览历史、课程对比），ids 为逗号分隔的课程ID
+        try:
+            course_ids = parse_batch_ids(value for value in request.args.get('ids', '').split(',') if value.strip())
+        except ValueError:
+            return {'error': 'ids参数应为逗号分隔的课程ID，最多%d个' % MAX_BATCH_IDS}, 400
+        return dump_course_batch(course_ids), 200
+    
+    def post(self):
+        # ID较多、超出URL长度时使用：请求体为 {"ids": [1, 2, 3]}
+        data = request.get_json(silent=True) or {}
+        ids = data.get('ids') if isinstance(data, dict) else None
+        if not isinstance(ids, list):
+            return {'error': '请求体应为 {"ids": [课程ID, ...]}'}, 400
+        try:
+            course_ids = parse_batch_ids(ids)
+        except ValueError:
+            return {'error': 'ids应为课程ID列表，最多%d个' % MAX_BATCH_IDS}, 400
+        return dump_course_batch(course_ids), 200
+
+def course_cache_tags(course_id):
+    # 课程相关缓存的标签；教师信息变更时按 courses 整体失效
+    return ['courses', 'course:%d' % course_id]
+
+def dump_course_detail(course, tags=None):
+    """
+    课程详情：课程字段、平均评分、各维度平均评分和热门标签
+
+    Args:
+        tags: 已查询的 popular_tags 结果，为None时在有评价时查询
+    """
+    course_data = course_schema.dump(course)
+    
+    # 读取平均评分和评价数量
+    stats = course.stats
+    course_data.update(course_score_fields(stats))
+    if course_data['evaluation_count']:
+        # 各维度平均评分
+        for name in DIMENSIONS:
+            avg = stats.avg_dimension(name)
+            if avg is not None:
+                course_data['avg_%s_score' % name] = avg
+            
+        # 统计标签
+        course_data['popular_tags'] = tags if tags is not None else popular_tags(course_id=course.id, limit=10)
+    
+    return course_data
+
 class CourseResource(Resource):
+    @cached(tags=course_cache_tags)
     def get(self, course_id):
         # 获取单个课程详情
         course = Course.query.get_or_404(course_id)
-        course_data = course_schema.dump(course)
-        
-        # 计算平均评分和评价数量
-        if course.evaluations:
-            avg_score = sum(e.score for e in course.evaluations) / len(course.evaluations)
-            course_data['avg_score'] = round(avg_score, 1)
-            course_data['evaluation_count'] = len(course.evaluations)
-            
-            # 计算各维度平均评分
-            workload_scores = [e.workload_score for e in course.evaluations if e.workload_score]
-            content_scores = [e.content_score for e in course.evaluations if e.content_score]
-            teaching_scores = [e.teaching_score for e in course.evaluations if e.teaching_score]
-            
-            if workload_scores:
-                course_data['avg_workload_score'] = round(sum(workload_scores) / len(workload_scores), 1)
-            if content_scores:
-                course_data['avg_content_score'] = round(sum(content_scores) / len(content_scores), 1)
-            if teaching_scores:
-                course_data['avg_teaching_score'] = round(sum(teaching_scores) / len(teaching_scores), 1)
-                
-            # 统计标签
-            all_tags = []
-            for eval in course.evaluations:
-                if eval.tags:
-                    tags = [tag.strip() for tag in eval.tags.split(',')]
-                    all_tags.extend(tags)
-            
-            # 计算标签频率
-            tag_counts = {}
-            for tag in all_tags:
-                if tag:
-                    tag_counts[tag] = tag_counts.get(tag, 0) + 1
-            
-            course_data['popular_tags'] = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-        else:
-            course_data['avg_score'] = 0
-            course_data['evaluation_count'] = 0
-        
-        return course_data, 200
+        return dump_course_detail(course), 200
 
 
 class CoursePopularTagsResource(Resource):
+    @cached(tags=course_cache_tags)
     def get(self, course_id):
         # 获取课程热门标签
         course = Course.query.get_or_404(course_id)
         
-        # 统计标签
-        all_tags = []
-        for eval in course.evaluations:
-            if eval.tags:
-                tags = [tag.strip() for tag in eval.tags.split(',')]
-                all_tags.extend(tags)
-        
-        # 计算标签频率
-        tag_counts = {}
-        for tag in all_tags:
-            if tag:
-                tag_counts[tag] = tag_counts.get(tag, 0) + 1
-        
-        # 转换为前端期望的格式
-        popular_tags = []
-        for tag, count in sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:10]:
-            popular_tags.append({
+        # 按标签索引统计并转换为前端期望的格式
+        tags = []
+        for tag, count in popular_tags(course_id=course.id, limit=10):
+            tags.append({
                 'name': tag,
                 'count': count
             })
         
-        return {'tags': popular_tags}, 200
+        return {'tags': tags}, 200
 
 
 class CourseRatingDistributionResource(Resource):
+    @cached(tags=course_cache_tags)
     def get(self, course_id):
         # 获取课程评分分布
         course = Course.query.get_or_404(course_id)
         
-        # 初始化评分分布
-        distribution = {
-            '5': 0,
-            '4': 0,
-            '3': 0,
-            '2': 0,
-            '1': 0
-        }
-        
-        # 统计各评分数量
-        for eval in course.evaluations:
-            score_key = str(int(eval.score))
-            if score_key in distribution:
-                distribution[score_key] += 1
-        
-        return {'distribution': distribution}, 200
+        # 读取课程统计中的五档计数
+        return {'distribution': rating_distribution(course.stats)}, 200
     
     def put(self, course_id):
         # 更新课程信息
@@ -269,11 +311,24 @@ class CourseRatingDistributionResource(Resource):
             if not teacher:
                 return {'error': 'Teacher not found'}, 404
         
+        # 学期或授课教师变更时，课程的标签计数需要迁移到新的学期/学院范围
+        scope_changed = 'semester' in data or 'teacher_id' in data
+        if scope_changed:
+            shift_course_tag_stats(course.id, -1)
+        
         # 更新字段
         for key, value in data.items():
             setattr(course, key, value)
         
+        if scope_changed:
+            db.session.flush()
+            shift_course_tag_stats(course.id)
+        
+        db.session.flush()
+        search_index.index_course(course)
         db.session.commit()
+        cache.invalidate('course:%d' % course_id, 'rankings')
+        suggest_index.index_course(course)
         
         result = course_schema.dump(course)
         return result, 200
@@ -286,16 +341,101 @@ class CourseRatingDistributionResource(Resource):
         if course.evaluations or course.comments:
             return {'error': 'Cannot delete course with associated evaluations or comments'}, 400
         
+        CourseStats.query.filter_by(course_id=course_id).delete()
+        CourseDailyStats.query.filter_by(course_id=course_id).delete()
         db.session.delete(course)
+        search_index.remove_course(course_id)
         db.session.commit()
+        cache.invalidate('course:%d' % course_id, 'rankings')
+        suggest_index.remove_course(course_id)
         
         return {'message': 'Course deleted successfully'}, 200
 
+@cached(tags=lambda course_id, per_page: course_cache_tags(course_id))
+def course_page_data(course_id, per_page):
+    """
+    课程页中与当前用户无关的部分，作为一个整体缓存；课程、评价、讨论及其点赞的写接口按 course:<id> 标签失效。
+    点赞状态因用户而异，由调用方按用户补上。
+    """
+    # 授课教师和评分统计随课程一次取回
+    course = Course.query.options(joinedload(Course.teacher), joinedload(Course.stats)).filter(
+        Course.id == course_id
+    ).first_or_404()
+    
+    # 热门标签只查一次，同时用于课程详情和标签区块
+    tags = popular_tags(course_id=course.id, limit=10)
+    # 先序列化课程：之后的列表查询在严格加载模式下会把课程对象上未加载的关系标记为 raiseload
+    course_data = dump_course_detail(course, tags)
+    
+    # 评价和讨论的第一页与对应列表接口的游标分页一致，客户端用 next_cursor 继续翻页
+    evaluation_query = Evaluation.query.options(*list_load_options(joinedload(Evaluation.course))).filter(
+        Evaluation.course_id == course.id
+    )
+    evaluations, evaluations_cursor = cursor_paginate(
+        evaluation_query, [(Evaluation.created_at, True), (Evaluation.id, True)], '', per_page
+    )
+    discussion_query = Comment.query.options(*list_load_options(joinedload(Comment.course))).filter(
+        Comment.course_id == course.id,
+        Comment.parent_id.is_(None)
+    )
+    discussions, discussions_cursor = cursor_paginate(
+        discussion_query, [(Comment.created_at, True), (Comment.id, True)], '', per_page
+    )
+    
+    return {
+        'course': course_data,
+        'popular_tags': [{'name': tag, 'count': count} for tag, count in tags],
+        'rating_distribution': rating_distribution(course.stats),
+        'evaluations': {
+            'evaluations': evaluations_schema.dump(evaluations),
+            'next_cursor': evaluations_cursor,
+        },
+        'discussions': {
+            'discussions': dump_discussion_feed(discussions, None),
+            'next_cursor': discussions_cursor,
+        },
+    }, 200
+
+class CoursePageResource(Resource):
+    def get(self, course_id):
+        # 课程页聚合接口：一次请求返回课程详情、各维度平均分、评分分布、热门标签、评价和讨论的第一页
+        try:
+            per_page = int(request.args.get('per_page', PAGE_SECTION_SIZE))
+        except ValueError:
+            return {'error': '无效的per_page参数'}, 400
+        per_page = max(1, min(per_page, MAX_PAGE_SECTION_SIZE))
+        
+        data, status = course_page_data(course_id=course_id, per_page=per_page)
+        if status != 200:
+            return data, status
+        
+        # 在共享的缓存数据上按当前用户补充点赞状态，不修改缓存中的对象
+        user = get_current_user()
+        evaluations = data['evaluations']['evaluations']
+        discussions = data['discussions']['discussions']
+        liked_evaluations = liked_target_ids(user, 'evaluation', [item['id'] for item in evaluations])
+        liked_comments = liked_target_ids(user, 'comment', [
+            item['id'] for discussion in discussions for item in [discussion] + discussion['replies']
+        ])
+        
+        result = dict(data)
+        result['evaluations'] = dict(data['evaluations'], evaluations=[
+            dict(item, is_liked=item['id'] in liked_evaluations) for item in evaluations
+        ])
+        result['discussions'] = dict(data['discussions'], discussions=[
+            dict(discussion, is_liked=discussion['id'] in liked_comments, replies=[
+                dict(reply, is_liked=reply['id'] in liked_comments) for reply in discussion['replies']
+            ]) for discussion in discussions
+        ])
+        return result, 200
+
 # 注册路由
 # 延迟导入api对象以避免循环导入
 from app.api import api
 # 直接注册路由，确保路径正确
 api.add_resource(CoursesResource, '/api/courses')
+api.add_resource(CourseBatchResource, '/api/courses/batch')
 api.add_resource(CourseResource, '/api/courses/<int:course_id>')
 api.add_resource(CoursePopularTagsResource, '/api/courses/<int:course_id>/popular_tags')
-api.add_resource(CourseRatingDistributionResource, '/api/courses/<int:course_id>/rating_distribution')
\ No newline at end of file
+api.add_resource(CourseRatingDistributionResource, '/api/courses/<int:course_id>/rating_distribution')
+api.add_resource(CoursePageResource, '/api/courses/<int:course_id>/page')
\ No newline at end of file
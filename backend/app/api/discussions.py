@@ -1,10 +1,19 @@
 from flask import request, jsonify
 from flask_restful import Resource
 from app import db
-from app.models import Comment, Course, Like, User
+from app.models import Comment, Course, User
 from app.schemas import CommentSchema
 from app.utils.auth import get_current_user
-from sqlalchemy import desc
+from app.utils.cache import cache
+from app.utils.comments import (
+    assign_comment_path, can_reply_to, delete_comment_tree, dump_comment_tree, dump_discussion_feed, feed_schema,
+    load_reply_page, reply_page_args
+)
+from app.utils.pagination import apply_order, cursor_paginate
+from app.utils.likes import liked_target_ids, toggle_like
+from app.utils.loading import list_load_options
+from app.utils.user_stats import apply_comment
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 
 comment_schema = CommentSchema()
@@ -16,80 +25,40 @@ class DiscussionsResource(Resource):
         course_id = request.args.get('course_id')
         page = int(request.args.get('page', 1))
         page_size = int(request.args.get('page_size', 10))
+        # 传入cursor参数（第一页为空字符串）时使用游标分页
+        cursor = request.args.get('cursor')
         
         # 获取当前登录用户
         user = get_current_user()
         
-        # 构建查询，只获取顶级评论（非回复）
-        query = Comment.query.filter(Comment.parent_id.is_(None))
+        # 构建查询，只获取顶级评论（非回复），所属课程随评论一次取回
+        query = Comment.query.options(*list_load_options(joinedload(Comment.course))).filter(Comment.parent_id.is_(None))
         
         if course_id:
             query = query.filter(Comment.course_id == course_id)
         
         # 按创建时间降序排序
-        query = query.order_by(desc(Comment.created_at))
+        order_by = [(Comment.created_at, True), (Comment.id, True)]
         
-        # 分页
-        pagination = query.paginate(page=page, per_page=page_size, error_out=False)
-        comments = pagination.items
+        if cursor is not None:
+            # 游标分页：不统计总数
+            try:
+                comments, next_cursor = cursor_paginate(query, order_by, cursor, page_size)
+            except ValueError:
+                return {'error': '无效的cursor参数'}, 400
+        else:
+            # 分页
+            pagination = apply_order(query, order_by).paginate(page=page, per_page=page_size, error_out=False)
+            comments = pagination.items
+        
+        # 序列化讨论，包括前3条回复
+        result = dump_discussion_feed(comments, user)
         
-        # 序列化评论，包括回复
-        result = []
-        for comment in comments:
-            comment_data = comment_schema.dump(comment)
-            
-            # 获取评论点赞数
-            likes_count = Like.query.filter_by(
-                target_type='comment',
-                target_id=comment.id
-            ).count()
-            
-            # 检查当前用户是否点赞
-            is_liked = False
-            if user:
-                is_liked = Like.query.filter_by(
-                    user_id=user.id,
-                    target_type='comment',
-                    target_id=comment.id
-                ).first() is not None
-            
-            # 获取前3条回复
-            comment_data['replies'] = []
-            for reply in comment.replies[:3]:
-                reply_data = comment_schema.dump(reply)
-                
-                # 获取回复点赞数
-                reply_likes_count = Like.query.filter_by(
-                    target_type='comment',
-                    target_id=reply.id
-                ).count()
-                
-                # 检查当前用户是否点赞回复
-                reply_is_liked = False
-                if user:
-                    reply_is_liked = Like.query.filter_by(
-                        user_id=user.id,
-                        target_type='comment',
-                        target_id=reply.id
-                    ).first() is not None
-                
-                # 为回复设置author字段，与主评论处理方式一致
-                reply_data['author'] = reply_data['user_name']
-                reply_data['likes_count'] = reply_likes_count
-                reply_data['is_liked'] = reply_is_liked
-                comment_data['replies'].append(reply_data)
-            
-            # 回复总数
-            comment_data['replies_count'] = len(comment.replies)
-            # 重命名字段以匹配前端
-            comment_data['id'] = comment_data['id']
-            comment_data['author'] = comment_data['user_name']
-            comment_data['content'] = comment_data['content']
-            comment_data['created_at'] = comment_data['created_at']
-            comment_data['likes_count'] = likes_count
-            comment_data['is_liked'] = is_liked
-            
-            result.append(comment_data)
+        if cursor is not None:
+            return {
+                'discussions': result,
+                'next_cursor': next_cursor
+            }, 200
         
         return {
             'discussions': result,
@@ -117,7 +86,11 @@ class DiscussionsResource(Resource):
         )
         
         db.session.add(new_comment)
+        db.session.flush()
+        assign_comment_path(new_comment)
+        apply_comment(new_comment)
         db.session.commit()
+        cache.invalidate('course:%d' % new_comment.course_id)
         
         # 返回创建的讨论
         result = comment_schema.dump(new_comment)
@@ -131,26 +104,40 @@ class DiscussionsResource(Resource):
 
 class DiscussionResource(Resource):
     def get(self, discussion_id):
-        # 获取单个讨论详情
+        # 获取单个讨论详情，包括第一页回复，更多回复通过 next_cursor 翻页
         comment = Comment.query.get_or_404(discussion_id)
+        try:
+            limit, depth = reply_page_args(request.args)
+        except ValueError:
+            return {'error': '无效的limit或depth参数'}, 400
+        try:
+            children, counts, next_cursor = load_reply_page(comment, limit, request.args.get('cursor'), depth)
+        except ValueError:
+            return {'error': '无效的cursor参数'}, 400
+        direct_replies = children[comment.id]
 
-        result = comment_schema.dump(comment)
+        # 一次查询得到当前用户对讨论及本页回复的点赞状态
+        user = get_current_user()
+        liked_ids = liked_target_ids(user, 'comment', [comment.id] + [reply.id for reply in direct_replies])
+
+        result = feed_schema.dump(comment)
         # 转换格式
         result['author'] = result['user_name']
         result['likes_count'] = result['likes']
-        result['is_liked'] = False
+        result['is_liked'] = comment.id in liked_ids
 
-        # 获取所有回复
+        # 本页回复
         replies = []
-        for reply in comment.replies:
-            reply_data = comment_schema.dump(reply)
+        for reply in direct_replies:
+            reply_data = dump_comment_tree(reply, children, counts=counts)
             reply_data['author'] = reply_data['user_name']
             reply_data['likes_count'] = reply_data['likes']
-            reply_data['is_liked'] = False
+            reply_data['is_liked'] = reply.id in liked_ids
             replies.append(reply_data)
 
         result['replies'] = replies
-        result['replies_count'] = len(replies)
+        result['replies_count'] = counts.get(comment.id, 0)
+        result['next_cursor'] = next_cursor
 
         return result, 200
 
@@ -181,6 +168,7 @@ class DiscussionResource(Resource):
             comment.updated_at = datetime.utcnow()
 
         db.session.commit()
+        cache.invalidate('course:%d' % comment.course_id)
 
         # 返回格式化的数据
         result = comment_schema.dump(comment)
@@ -205,17 +193,11 @@ class DiscussionResource(Resource):
         if comment.user_id != user.id:
             return {'error': 'Unauthorized to delete this discussion'}, 403
 
-        # 删除讨论及其所有回复（级联删除）
-        def delete_comment_tree(comment):
-            # 删除该评论的所有点赞
-            Like.query.filter_by(target_type='comment', target_id=comment.id).delete()
-            # 递归删除所有回复
-            for reply in comment.replies:
-                delete_comment_tree(reply)
-            db.session.delete(comment)
-
+        # 按物化路径批量删除讨论、其所有回复及这些评论的点赞
+        course_id = comment.course_id
         delete_comment_tree(comment)
         db.session.commit()
+        cache.invalidate('course:%d' % course_id)
 
         return {'message': 'Discussion deleted successfully'}, 200
 
@@ -229,6 +211,8 @@ class DiscussionRepliesResource(Resource):
         
         # 验证讨论是否存在
         parent_comment = Comment.query.get_or_404(discussion_id)
+        if not can_reply_to(parent_comment):
+            return {'error': '回复层级过深'}, 400
         
         # 获取当前登录用户
         user = get_current_user()
@@ -243,7 +227,11 @@ class DiscussionRepliesResource(Resource):
         )
         
         db.session.add(new_reply)
+        db.session.flush()
+        assign_comment_path(new_reply)
+        apply_comment(new_reply)
         db.session.commit()
+        cache.invalidate('course:%d' % new_reply.course_id)
         
         # 返回创建的回复
         result = comment_schema.dump(new_reply)
@@ -263,34 +251,10 @@ class DiscussionLikeResource(Resource):
         # 获取讨论
         comment = Comment.query.get_or_404(discussion_id)
         
-        # 检查用户是否已经点赞
-        existing_like = Like.query.filter_by(
-            user_id=user.id,
-            target_type='comment',
-            target_id=discussion_id
-        ).first()
-        
-        if existing_like:
-            # 如果已经点赞，则取消点赞
-            db.session.delete(existing_like)
-            db.session.commit()
-            is_liked = False
-        else:
-            # 如果未点赞，则添加点赞
-            new_like = Like(
-                user_id=user.id,
-                target_type='comment',
-                target_id=discussion_id
-            )
-            db.session.add(new_like)
-            db.session.commit()
-            is_liked = True
-        
-        # 获取点赞数量
-        likes_count = Like.query.filter_by(
-            target_type='comment',
-            target_id=discussion_id
-        ).count()
+        # 切换点赞状态，点赞计数在同一事务内原子更新
+        is_liked, likes_count = toggle_like(user.id, 'comment', discussion_id)
+        db.session.commit()
+        cache.invalidate('course:%d' % comment.course_id)
         
         return { 
             'message': '操作成功', 
@@ -308,34 +272,10 @@ class ReplyLikeResource(Resource):
         # 获取回复
         reply = Comment.query.get_or_404(reply_id)
         
-        # 检查用户是否已经点赞
-        existing_like = Like.query.filter_by(
-            user_id=user.id,
-            target_type='comment',
-            target_id=reply_id
-        ).first()
-        
-        if existing_like:
-            # 如果已经点赞，则取消点赞
-            db.session.delete(existing_like)
-            db.session.commit()
-            is_liked = False
-        else:
-            # 如果未点赞，则添加点赞
-            new_like = Like(
-                user_id=user.id,
-                target_type='comment',
-                target_id=reply_id
-            )
-            db.session.add(new_like)
-            db.session.commit()
-            is_liked = True
-        
-        # 获取点赞数量
-        likes_count = Like.query.filter_by(
-            target_type='comment',
-            target_id=reply_id
-        ).count()
+        # 切换点赞状态，点赞计数在同一事务内原子更新
+        is_liked, likes_count = toggle_like(user.id, 'comment', reply_id)
+        db.session.commit()
+        cache.invalidate('course:%d' % reply.course_id)
         
         return {
             'message': '操作成功', 
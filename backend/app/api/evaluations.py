@@ -4,12 +4,27 @@ from app import db
 from app.models import Evaluation, Course, Like, User
 from app.schemas import EvaluationSchema
 from app.utils.auth import get_current_user
-from sqlalchemy import desc
+from app.utils.cache import cache
+from app.utils.loading import list_load_options
+from app.utils.pagination import apply_order, cursor_paginate
+from app.utils.stats import apply_evaluation
+from app.utils.tags import index_evaluation_tags, unindex_evaluation_tags
+from app.utils.user_stats import shift_user_stats
+from app.utils.likes import liked_target_ids, toggle_like
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 
 evaluation_schema = EvaluationSchema()
 evaluations_schema = EvaluationSchema(many=True)
 
+def dump_evaluations(evaluations, user):
+    """序列化一页评价，并附带当前用户的点赞状态（一次查询）"""
+    liked_ids = liked_target_ids(user, 'evaluation', [evaluation.id for evaluation in evaluations])
+    result = evaluations_schema.dump(evaluations)
+    for evaluation_data in result:
+        evaluation_data['is_liked'] = evaluation_data['id'] in liked_ids
+    return result
+
 class EvaluationsResource(Resource):
     def get(self):
         # 获取评价列表，可以按课程筛选
@@ -18,9 +33,14 @@ class EvaluationsResource(Resource):
         per_page = int(request.args.get('per_page', 20))
         sort_by = request.args.get('sort_by', 'created_at')
         score = request.args.get('score')
+        # 传入cursor参数（第一页为空字符串）时使用游标分页
+        cursor = request.args.get('cursor')
+        
+        # 获取当前登录用户
+        user = get_current_user()
         
-        # 构建查询
-        query = Evaluation.query
+        # 构建查询（所属课程随评价一次取回）
+        query = Evaluation.query.options(*list_load_options(joinedload(Evaluation.course)))
         
         if course_id:
             query = query.filter(Evaluation.course_id == course_id)
@@ -29,21 +49,33 @@ class EvaluationsResource(Resource):
         if score:
             query = query.filter(Evaluation.score == int(score))
         
-        # 排序
-        if sort_by == 'created_at':
-            query = query.order_by(desc(Evaluation.created_at))
-        elif sort_by == 'score_desc':
-            query = query.order_by(desc(Evaluation.score))
+        # 排序键：(排序表达式, 是否降序)，以评价ID结尾保证顺序稳定
+        if sort_by == 'score_desc':
+            order_by = [(Evaluation.score, True), (Evaluation.id, True)]
         elif sort_by == 'score_asc':
-            query = query.order_by(Evaluation.score)
+            order_by = [(Evaluation.score, False), (Evaluation.id, False)]
         elif sort_by == 'likes':
-            query = query.order_by(desc(Evaluation.likes))
+            order_by = [(Evaluation.likes_count, True), (Evaluation.id, True)]
+        else:
+            order_by = [(Evaluation.created_at, True), (Evaluation.id, True)]
+        
+        if cursor is not None:
+            # 游标分页：不统计总数
+            try:
+                evaluations, next_cursor = cursor_paginate(query, order_by, cursor, per_page)
+            except ValueError:
+                return {'error': '无效的cursor参数'}, 400
+            return {
+                'evaluations': dump_evaluations(evaluations, user),
+                'next_cursor': next_cursor,
+                'per_page': per_page
+            }, 200
         
         # 分页
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        pagination = apply_order(query, order_by).paginate(page=page, per_page=per_page, error_out=False)
         evaluations = pagination.items
         
-        result = evaluations_schema.dump(evaluations)
+        result = dump_evaluations(evaluations, user)
         
         return {
             'evaluations': result,
@@ -104,7 +136,13 @@ class EvaluationsResource(Resource):
         )
 
         db.session.add(new_evaluation)
+        db.session.flush()
+        # 同一事务内更新课程评分统计、标签索引和用户统计
+        apply_evaluation(new_evaluation)
+        index_evaluation_tags(new_evaluation)
+        shift_user_stats(user.id, evaluation_count=1)
         db.session.commit()
+        cache.invalidate('course:%d' % new_evaluation.course_id, 'rankings')
 
         result = evaluation_schema.dump(new_evaluation)
         return result, 201
@@ -136,6 +174,10 @@ class EvaluationResource(Resource):
         if errors:
             return {'error': errors}, 400
 
+        # 先从课程统计和标签索引中移出旧的数据，字段更新后再计入
+        apply_evaluation(evaluation, -1)
+        unindex_evaluation_tags(evaluation)
+
         # 更新字段（不允许更改user_id和course_id）
         allowed_fields = ['score', 'workload_score', 'content_score',
                           'teaching_score', 'tags', 'comment', 'anonymous']
@@ -151,7 +193,10 @@ class EvaluationResource(Resource):
                     setattr(evaluation, key, value)
 
         evaluation.updated_at = datetime.utcnow()
+        apply_evaluation(evaluation)
+        index_evaluation_tags(evaluation)
         db.session.commit()
+        cache.invalidate('course:%d' % evaluation.course_id, 'rankings')
 
         result = evaluation_schema.dump(evaluation)
         return result, 200
@@ -172,8 +217,15 @@ class EvaluationResource(Resource):
         # 删除相关的点赞记录
         Like.query.filter_by(target_type='evaluation', target_id=evaluation_id).delete()
 
+        # 从课程评分统计、标签索引和用户统计中移出（评价收到的点赞随之删除）
+        apply_evaluation(evaluation, -1)
+        unindex_evaluation_tags(evaluation)
+        shift_user_stats(evaluation.user_id, evaluation_count=-1, likes_received=-evaluation.likes_count)
+
+        course_id = evaluation.course_id
         db.session.delete(evaluation)
         db.session.commit()
+        cache.invalidate('course:%d' % course_id, 'rankings')
 
         return {'message': 'Evaluation deleted successfully'}, 200
 
@@ -187,34 +239,10 @@ class EvaluationLikeResource(Resource):
         # 获取评价
         evaluation = Evaluation.query.get_or_404(evaluation_id)
         
-        # 检查用户是否已经点赞
-        existing_like = Like.query.filter_by(
-            user_id=user.id,
-            target_type='evaluation',
-            target_id=evaluation_id
-        ).first()
-        
-        if existing_like:
-            # 如果已经点赞，则取消点赞
-            db.session.delete(existing_like)
-            db.session.commit()
-            is_liked = False
-        else:
-            # 如果未点赞，则添加点赞
-            new_like = Like(
-                user_id=user.id,
-                target_type='evaluation',
-                target_id=evaluation_id
-            )
-            db.session.add(new_like)
-            db.session.commit()
-            is_liked = True
-        
-        # 获取点赞数量
-        likes_count = Like.query.filter_by(
-            target_type='evaluation',
-            target_id=evaluation_id
-        ).count()
+        # 切换点赞状态，点赞计数在同一事务内原子更新
+        is_liked, likes_count = toggle_like(user.id, 'evaluation', evaluation_id)
+        db.session.commit()
+        cache.invalidate('course:%d' % evaluation.course_id)
         
         return { 
             'message': '操作成功',
@@ -1,148 +1,150 @@
 from flask import request
 from flask_restful import Resource
 from app import db
-from app.models import Course, Teacher, Evaluation
+from app.models import Course, Teacher, CourseStats
 from app.schemas import RankingSchema
-from datetime import datetime, timedelta
+from app.utils.cache import cached
+from app.utils.stats import course_score_source
+from app.utils.tags import ranked_tags
+from sqlalchemy import desc, func
+from datetime import date, datetime, timedelta
+
+# 排行榜缓存过期后仍可先返回旧数据、后台重新计算的秒数
+RANKINGS_STALE_TTL = 300
 
 ranking_schema = RankingSchema()
 rankings_schema = RankingSchema(many=True)
 
+def get_time_window(args):
+    """
+    解析排行榜的时间范围参数
+
+    支持 time_range=week|month|year，或自定义 from / to（YYYY-MM-DD，包含两端，优先于time_range）。
+    时间范围按UTC自然日对齐。
+
+    Returns:
+        tuple: (起始日期, 结束日期)，不限的一端为None
+
+    Raises:
+        ValueError: 日期格式错误
+    """
+    start = args.get('from')
+    end = args.get('to')
+    if start or end:
+        return (date.fromisoformat(start) if start else None,
+                date.fromisoformat(end) if end else None)
+    
+    days = {'week': 7, 'month': 30, 'year': 365}.get(args.get('time_range'))
+    if days is None:
+        return None, None
+    return (datetime.utcnow() - timedelta(days=days)).date(), None
+
 class CourseRankingResource(Resource):
+    @cached(tags=['rankings'], stale_ttl=RANKINGS_STALE_TTL)
     def get(self):
         # 获取课程排行榜
         semester = request.args.get('semester')
         department = request.args.get('department')
         limit = int(request.args.get('limit', 10))
-        time_range = request.args.get('time_range')  # 'week', 'month', 'year', 'all'
-        
-        # 构建课程查询
-        course_query = Course.query
+        try:
+            # time_range: 'week', 'month', 'year', 'all'，或 from / to
+            start_day, end_day = get_time_window(request.args)
+        except ValueError:
+            return {'error': '无效的日期参数'}, 400
+        
+        # 不限时间时读取课程评分统计表，否则汇总时间范围内的每日分桶
+        scores = course_score_source(start_day, end_day)
+        query = db.session.query(
+            Course, Teacher.name.label('teacher_name'),
+            scores.c.evaluation_count, scores.c.score_sum
+        ).join(
+            scores, scores.c.course_id == Course.id
+        ).outerjoin(
+            Teacher, Course.teacher_id == Teacher.id
+        ).filter(scores.c.evaluation_count > 0)
         if semester:
-            course_query = course_query.filter(Course.semester == semester)
+            query = query.filter(Course.semester == semester)
         
         # 按学院筛选
         if department:
-            course_query = course_query.join(Teacher).filter(Teacher.department == department)
-        
-        all_courses = course_query.all()
-        
-        # 计算评分并排序
-        course_scores = []
-        for course in all_courses:
-            # 根据时间范围筛选评价
-            evaluations = course.evaluations
-            if time_range:
-                now = datetime.utcnow()
-                if time_range == 'week':
-                    start_time = now - timedelta(days=7)
-                elif time_range == 'month':
-                    start_time = now - timedelta(days=30)
-                elif time_range == 'year':
-                    start_time = now - timedelta(days=365)
-                else:
-                    start_time = datetime.min
-                evaluations = [e for e in evaluations if e.created_at >= start_time]
-            
-            # 计算平均评分
-            if evaluations:
-                avg_score = sum(e.score for e in evaluations) / len(evaluations)
-                course_scores.append({
-                    'course_id': course.id,
-                    'course_name': course.name,
-                    'course_code': course.course_code,
-                    'teacher_name': course.teacher.name if course.teacher else '未知',
-                    'avg_score': round(avg_score, 1),
-                    'evaluation_count': len(evaluations)
-                })
+            query = query.filter(Teacher.department == department)
         
         # 按评分降序排序
-        course_scores.sort(key=lambda x: x['avg_score'], reverse=True)
-        
-        # 添加排名
-        for i, course in enumerate(course_scores[:limit]):
-            course['rank'] = i + 1
+        rows = query.order_by(
+            desc(scores.c.score_sum / scores.c.evaluation_count), Course.id
+        ).limit(limit).all()
+        
+        rankings = []
+        for i, (course, teacher_name, evaluation_count, score_sum) in enumerate(rows):
+            rankings.append({
+                'course_id': course.id,
+                'course_name': course.name,
+                'course_code': course.course_code,
+                'teacher_name': teacher_name or '未知',
+                'avg_score': round(score_sum / evaluation_count, 1),
+                'evaluation_count': evaluation_count,
+                'rank': i + 1
+            })
         
-        return {'rankings': course_scores[:limit]}, 200
+        return {'rankings': rankings}, 200
 
 class TeacherRankingResource(Resource):
+    @cached(tags=['rankings'], stale_ttl=RANKINGS_STALE_TTL)
     def get(self):
         # 获取教师排行榜
         department = request.args.get('department')
         limit = int(request.args.get('limit', 10))
-        time_range = request.args.get('time_range')
-        
-        # 构建教师查询
-        teacher_query = Teacher.query
+        try:
+            start_day, end_day = get_time_window(request.args)
+        except ValueError:
+            return {'error': '无效的日期参数'}, 400
+        
+        # 按教师汇总课程评分（不限时间时读取课程评分统计表，否则汇总每日分桶）
+        scores = course_score_source(start_day, end_day)
+        evaluation_count = func.sum(scores.c.evaluation_count)
+        score_sum = func.sum(scores.c.score_sum)
+        query = db.session.query(
+            Teacher,
+            evaluation_count.label('evaluation_count'),
+            score_sum.label('score_sum'),
+            func.count(scores.c.course_id).label('course_count')
+        ).join(
+            Course, Course.teacher_id == Teacher.id
+        ).join(
+            scores, scores.c.course_id == Course.id
+        ).filter(
+            scores.c.evaluation_count > 0
+        ).group_by(Teacher.id)
         if department:
-            teacher_query = teacher_query.filter(Teacher.department == department)
-        
-        all_teachers = teacher_query.all()
-        
-        # 计算教师平均评分
-        teacher_scores = []
-        for teacher in all_teachers:
-            all_evaluations = []
-            
-            # 收集教师所有课程的评价
-            for course in teacher.courses:
-                evaluations = course.evaluations
-                if time_range:
-                    now = datetime.utcnow()
-                    if time_range == 'week':
-                        start_time = now - timedelta(days=7)
-                    elif time_range == 'month':
-                        start_time = now - timedelta(days=30)
-                    elif time_range == 'year':
-                        start_time = now - timedelta(days=365)
-                    else:
-                        start_time = datetime.min
-                    evaluations = [e for e in evaluations if e.created_at >= start_time]
-                all_evaluations.extend(evaluations)
-            
-            if all_evaluations:
-                avg_score = sum(e.score for e in all_evaluations) / len(all_evaluations)
-                teacher_scores.append({
-                    'teacher_id': teacher.id,
-                    'teacher_name': teacher.name,
-                    'department': teacher.department,
-                    'title': teacher.title,
-                    'avg_score': round(avg_score, 1),
-                    'evaluation_count': len(all_evaluations),
-                    'course_count': len([c for c in teacher.courses if c.evaluations])
-                })
+            query = query.filter(Teacher.department == department)
         
         # 按评分降序排序
-        teacher_scores.sort(key=lambda x: x['avg_score'], reverse=True)
-        
-        # 添加排名
-        for i, teacher in enumerate(teacher_scores[:limit]):
-            teacher['rank'] = i + 1
+        rows = query.order_by(desc(score_sum / evaluation_count), Teacher.id).limit(limit).all()
+        
+        rankings = []
+        for i, row in enumerate(rows):
+            teacher = row.Teacher
+            rankings.append({
+                'teacher_id': teacher.id,
+                'teacher_name': teacher.name,
+                'department': teacher.department,
+                'title': teacher.title,
+                'avg_score': round(row.score_sum / row.evaluation_count, 1),
+                'evaluation_count': row.evaluation_count,
+                'course_count': row.course_count,
+                'rank': i + 1
+            })
         
-        return {'rankings': teacher_scores[:limit]}, 200
+        return {'rankings': rankings}, 200
 
 class TagRankingResource(Resource):
+    @cached(tags=['rankings'])
     def get(self):
         # 获取热门标签排行榜
         limit = int(request.args.get('limit', 20))
         
-        # 收集所有评价的标签
-        all_tags = []
-        evaluations = Evaluation.query.all()
-        
-        for eval in evaluations:
-            if eval.tags:
-                tags = [tag.strip() for tag in eval.tags.split(',')]
-                all_tags.extend(tags)
-        
-        # 统计标签频率
-        tag_counts = {}
-        for tag in all_tags:
-            if tag:
-                tag_counts[tag] = tag_counts.get(tag, 0) + 1
-        
-        # 排序并返回
-        sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:limit]
+        # 读取全站标签计数
+        sorted_tags = ranked_tags(limit=limit)
         
         result = []
         for i, (tag, count) in enumerate(sorted_tags):
@@ -155,53 +157,45 @@ class TagRankingResource(Resource):
         return {'rankings': result}, 200
 
 class DepartmentRankingResource(Resource):
+    @cached(tags=['rankings'])
     def get(self):
         # 获取各学院/系的课程平均评分排行榜
         limit = int(request.args.get('limit', 10))
         
-        # 按学院分组计算平均评分
+        # 按学院分组，一次查询得到课程数、评价数与评分总和（读取课程评分统计表）
+        evaluation_count = func.coalesce(func.sum(CourseStats.evaluation_count), 0)
+        score_sum = func.coalesce(func.sum(CourseStats.score_sum), 0)
         departments = db.session.query(
             Teacher.department,
-            db.func.count(Course.id).label('course_count'),
-            db.func.count(Evaluation.id).label('evaluation_count')
+            func.count(func.distinct(Course.id)).label('course_count'),
+            evaluation_count.label('evaluation_count'),
+            score_sum.label('score_sum')
         ).join(
             Course, Teacher.id == Course.teacher_id
         ).outerjoin(
-            Evaluation, Course.id == Evaluation.course_id
+            CourseStats, Course.id == CourseStats.course_id
         ).group_by(
             Teacher.department
-        ).all()
+        ).having(
+            evaluation_count > 0
+        ).order_by(
+            desc(score_sum / evaluation_count), Teacher.department
+        ).limit(limit).all()
         
-        # 计算每个学院的平均评分
         dept_scores = []
         for dept in departments:
-            if dept.evaluation_count > 0:
-                # 获取该学院所有课程的评价并计算平均分
-                avg_score_query = db.session.query(
-                    db.func.avg(Evaluation.score)
-                ).join(
-                    Course, Evaluation.course_id == Course.id
-                ).join(
-                    Teacher, Course.teacher_id == Teacher.id
-                ).filter(
-                    Teacher.department == dept.department
-                ).scalar()
-                
-                dept_scores.append({
-                    'department': dept.department,
-                    'avg_score': round(avg_score_query, 1),
-                    'course_count': dept.course_count,
-                    'evaluation_count': dept.evaluation_count
-                })
-        
-        # 按平均分排序
-        dept_scores.sort(key=lambda x: x['avg_score'], reverse=True)
+            dept_scores.append({
+                'department': dept.department,
+                'avg_score': round(dept.score_sum / dept.evaluation_count, 1),
+                'course_count': dept.course_count,
+                'evaluation_count': dept.evaluation_count
+            })
         
         # 添加排名
-        for i, dept in enumerate(dept_scores[:limit]):
+        for i, dept in enumerate(dept_scores):
             dept['rank'] = i + 1
         
-        return {'rankings': dept_scores[:limit]}, 200
+        return {'rankings': dept_scores}, 200
 
 # 注册路由
 # 延迟导入api对象以避免循环导入
@@ -1,14 +1,18 @@
 from flask import request
 from flask_restful import Resource
 from app import db
-from app.models import Course, Teacher, Evaluation
+from app.models import Course, Teacher, CourseStats
 from app.schemas import RankingSchema
-from datetime import datetime, timedelta
+from app.api.rankings import RANKINGS_STALE_TTL
+from app.utils.cache import cached
+from app.utils.tags import ranked_tags
+from sqlalchemy import desc, func
 
 ranking_schema = RankingSchema()
 rankings_schema = RankingSchema(many=True)
 
 class RankingsResource(Resource):
+    @cached(tags=['rankings'], stale_ttl=RANKINGS_STALE_TTL)
     def get(self):
         # 获取排行榜数据，根据type参数决定返回哪种排行榜
         ranking_type = request.args.get('type', 'courses')  # courses, teachers, tags, departments
@@ -17,104 +21,104 @@ class RankingsResource(Resource):
         limit = int(request.args.get('limit', 10))
         
         if ranking_type == 'courses':
-            # 课程排行榜
-            course_query = Course.query
+            # 课程排行榜（读取课程评分统计表，在数据库中排序）
+            course_query = db.session.query(
+                Course, Teacher.name.label('teacher_name'), CourseStats
+            ).join(
+                CourseStats, CourseStats.course_id == Course.id
+            ).outerjoin(
+                Teacher, Course.teacher_id == Teacher.id
+            ).filter(CourseStats.evaluation_count > 0)
             if semester:
                 course_query = course_query.filter(Course.semester == semester)
             if department:
-                course_query = course_query.filter(Course.department == department)
+                course_query = course_query.filter(Teacher.department == department)
             
-            all_courses = course_query.all()
-            course_scores = []
+            rows = course_query.order_by(
+                desc(CourseStats.score_sum / CourseStats.evaluation_count), Course.id
+            ).limit(limit).all()
             
-            for course in all_courses:
-                if course.evaluations:
-                    avg_score = sum(e.score for e in course.evaluations) / len(course.evaluations)
-                    course_scores.append({
-                        'id': course.id,
-                        'name': course.name,
-                        'code': course.course_code,
-                        'teacher': course.teacher.name if course.teacher else '未知',
-                        'score': round(avg_score, 1),
-                        'count': len(course.evaluations)
-                    })
+            course_scores = []
+            for course, teacher_name, stats in rows:
+                course_scores.append({
+                    'id': course.id,
+                    'name': course.name,
+                    'code': course.course_code,
+                    'teacher': teacher_name or '未知',
+                    'score': stats.avg_score,
+                    'count': stats.evaluation_count
+                })
             
-            # 按评分排序
-            course_scores.sort(key=lambda x: x['score'], reverse=True)
-            return {'list': course_scores[:limit]}, 200
+            return {'list': course_scores}, 200
             
         elif ranking_type == 'teachers':
-            # 教师排行榜
-            teacher_query = Teacher.query
+            # 教师排行榜（按教师汇总课程评分统计表）
+            evaluation_count = func.sum(CourseStats.evaluation_count)
+            score_sum = func.sum(CourseStats.score_sum)
+            teacher_query = db.session.query(
+                Teacher,
+                evaluation_count.label('evaluation_count'),
+                score_sum.label('score_sum')
+            ).join(
+                Course, Course.teacher_id == Teacher.id
+            ).join(
+                CourseStats, CourseStats.course_id == Course.id
+            ).filter(
+                CourseStats.evaluation_count > 0
+            ).group_by(Teacher.id)
             if department:
                 teacher_query = teacher_query.filter(Teacher.department == department)
             
-            all_teachers = teacher_query.all()
-            teacher_scores = []
+            rows = teacher_query.order_by(desc(score_sum / evaluation_count), Teacher.id).limit(limit).all()
             
-            for teacher in all_teachers:
-                # 收集所有课程的评价
-                all_evaluations = []
-                for course in teacher.courses:
-                    all_evaluations.extend(course.evaluations)
-                
-                if all_evaluations:
-                    avg_score = sum(e.score for e in all_evaluations) / len(all_evaluations)
-                    teacher_scores.append({
-                        'id': teacher.id,
-                        'name': teacher.name,
-                        'department': teacher.department or '未知',
-                        'score': round(avg_score, 1),
-                        'count': len(all_evaluations)
-                    })
+            teacher_scores = []
+            for row in rows:
+                teacher = row.Teacher
+                teacher_scores.append({
+                    'id': teacher.id,
+                    'name': teacher.name,
+                    'department': teacher.department or '未知',
+                    'score': round(row.score_sum / row.evaluation_count, 1),
+                    'count': row.evaluation_count
+                })
             
-            teacher_scores.sort(key=lambda x: x['score'], reverse=True)
-            return {'list': teacher_scores[:limit]}, 200
+            return {'list': teacher_scores}, 200
             
         elif ranking_type == 'tags':
-            # 标签排行榜（简化版）
-            # 这里应该从评价中提取标签并统计，但为简化先返回示例数据
-            tags = [
-                {'name': '给分好', 'count': 156},
-                {'name': '教学认真', 'count': 145},
-                {'name': '考试简单', 'count': 132},
-                {'name': '内容丰富', 'count': 128},
-                {'name': '不点名', 'count': 110},
-                {'name': '作业少', 'count': 98},
-                {'name': '有趣', 'count': 95},
-                {'name': '实用', 'count': 87}
-            ]
-            return {'list': tags[:limit]}, 200
+            # 标签排行榜（读取按学期/学院增量维护的标签计数）
+            tags = []
+            for name, count in ranked_tags(semester=semester, department=department, limit=limit):
+                tags.append({'name': name, 'count': count})
+            return {'list': tags}, 200
             
         elif ranking_type == 'departments':
-            # 学院排行榜
-            # 从所有课程中按学院分组
-            department_scores = {}
-            
-            all_courses = Course.query.all()
-            
-            for course in all_courses:
-                dept = course.department or '未知'
-                if dept not in department_scores:
-                    department_scores[dept] = {'total_score': 0, 'count': 0}
-                
-                if course.evaluations:
-                    avg_score = sum(e.score for e in course.evaluations) / len(course.evaluations)
-                    department_scores[dept]['total_score'] += avg_score
-                    department_scores[dept]['count'] += 1
+            # 学院排行榜：各学院已有评价课程的平均评分取平均，一次分组查询完成
+            course_avg = CourseStats.score_sum / CourseStats.evaluation_count
+            rows = db.session.query(
+                Teacher.department,
+                func.avg(course_avg).label('score'),
+                func.count(Course.id).label('count')
+            ).select_from(Course).join(
+                CourseStats, CourseStats.course_id == Course.id
+            ).outerjoin(
+                Teacher, Course.teacher_id == Teacher.id
+            ).filter(
+                CourseStats.evaluation_count > 0
+            ).group_by(
+                Teacher.department
+            ).order_by(
+                desc(func.avg(course_avg)), Teacher.department
+            ).limit(limit).all()
             
-            # 计算每个学院的平均评分
             result = []
-            for dept, data in department_scores.items():
-                if data['count'] > 0:
-                    result.append({
-                        'name': dept,
-                        'score': round(data['total_score'] / data['count'], 1),
-                        'count': data['count']
-                    })
+            for row in rows:
+                result.append({
+                    'name': row.department or '未知',
+                    'score': round(row.score, 1),
+                    'count': row.count
+                })
             
-            result.sort(key=lambda x: x['score'], reverse=True)
-            return {'list': result[:limit]}, 200
+            return {'list': result}, 200
             
         else:
             return {'message': '无效的排行榜类型'}, 400
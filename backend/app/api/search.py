@@ -0,0 +1,26 @@
+from flask import request
+from flask_restful import Resource
+from app.utils.suggest import suggest_index
+
+# 每次联想返回的最多条数
+SUGGEST_MAX_LIMIT = 20
+
+class SearchSuggestResource(Resource):
+    def get(self):
+        # 搜索框输入联想：按前缀匹配课程名、课程代码、拼音首字母和教师姓名，不访问数据库
+        query = request.args.get('q', '')
+        try:
+            limit = int(request.args.get('limit', 10))
+        except ValueError:
+            return {'error': '无效的limit参数'}, 400
+        limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+        
+        return {
+            'query': query,
+            'suggestions': suggest_index.suggest(query, limit)
+        }, 200
+
+# 注册路由
+# 延迟导入api对象以避免循环导入
+from app.api import api
+api.add_resource(SearchSuggestResource, '/api/search/suggest')
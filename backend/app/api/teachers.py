@@ -3,6 +3,12 @@ from flask_restful import Resource
 from app import db
 from app.models import Teacher, Course
 from app.schemas import TeacherSchema, CourseSchema
+from app.utils.cache import cache, cached
+from app.utils.loading import list_load_options
+from app.utils.stats import course_stats_map, course_score_fields, rating_summary
+from app.utils.search import search_index
+from app.utils.suggest import suggest_index
+from app.utils.tags import shift_course_tag_stats
 from sqlalchemy import desc
 
 teacher_schema = TeacherSchema()
@@ -10,9 +16,10 @@ teachers_schema = TeacherSchema(many=True)
 course_schema = CourseSchema()
 
 class TeachersResource(Resource):
+    @cached(tags=['teachers'])
     def get(self):
         # 获取教师列表
-        teachers = Teacher.query.all()
+        teachers = Teacher.query.options(*list_load_options()).all()
         result = teachers_schema.dump(teachers)
         return result, 200
     
@@ -35,11 +42,14 @@ class TeachersResource(Resource):
         
         db.session.add(new_teacher)
         db.session.commit()
+        cache.invalidate('teachers')
+        suggest_index.index_teacher(new_teacher)
         
         result = teacher_schema.dump(new_teacher)
         return result, 201
 
 class TeacherResource(Resource):
+    @cached(tags=['teachers'])
     def get(self, teacher_id):
         # 获取单个教师信息
         teacher = Teacher.query.get_or_404(teacher_id)
@@ -56,11 +66,29 @@ class TeacherResource(Resource):
         if errors:
             return {'error': errors}, 400
         
+        # 学院变更时，该教师课程的标签计数需要迁移到新的学院范围
+        course_ids = [course.id for course in teacher.courses] if 'department' in data else []
+        for course_id in course_ids:
+            shift_course_tag_stats(course_id, -1)
+        
         # 更新字段
         for key, value in data.items():
             setattr(teacher, key, value)
         
+        if course_ids:
+            db.session.flush()
+            for course_id in course_ids:
+                shift_course_tag_stats(course_id)
+        
+        # 教师姓名参与课程搜索
+        if 'name' in data:
+            db.session.flush()
+            search_index.index_teacher_courses(teacher)
+        
         db.session.commit()
+        # 教师信息嵌套在课程详情和排行榜中
+        cache.invalidate('teachers', 'courses', 'rankings')
+        suggest_index.index_teacher(teacher)
         
         result = teacher_schema.dump(teacher)
         return result, 200
@@ -75,6 +103,8 @@ class TeacherResource(Resource):
         
         db.session.delete(teacher)
         db.session.commit()
+        cache.invalidate('teachers')
+        suggest_index.remove_teacher(teacher_id)
         
         return {'message': 'Teacher deleted successfully'}, 200
 
@@ -82,27 +112,44 @@ class TeacherCoursesResource(Resource):
     def get(self, teacher_id):
         # 获取教师的所有课程
         teacher = Teacher.query.get_or_404(teacher_id)
-        courses = Course.query.filter_by(teacher_id=teacher_id).all()
+        # 课程的 teacher 关系直接取自会话中已加载的教师，不再查询
+        courses = Course.query.options(*list_load_options()).filter_by(teacher_id=teacher_id).all()
         
-        # 计算每个课程的平均评分
+        # 读取每个课程的平均评分
+        stats_map = course_stats_map(course.id for course in courses)
         result = []
         for course in courses:
             course_data = course_schema.dump(course)
-            # 计算平均评分
-            if course.evaluations:
-                avg_score = sum(e.score for e in course.evaluations) / len(course.evaluations)
-                course_data['avg_score'] = round(avg_score, 1)
-                course_data['evaluation_count'] = len(course.evaluations)
-            else:
-                course_data['avg_score'] = 0
-                course_data['evaluation_count'] = 0
+            course_data.update(course_score_fields(stats_map.get(course.id)))
             result.append(course_data)
         
         return result, 200
 
+class TeacherRatingSummaryResource(Resource):
+    # 评价的增删改、课程换教师、教师换学院都会使 rankings 标签失效
+    @cached(tags=['rankings'])
+    def get(self, teacher_id):
+        # 教师全部课程的评分分布和各维度平均分（由课程统计汇总）
+        teacher = Teacher.query.get_or_404(teacher_id)
+        result = rating_summary(Course.teacher_id == teacher.id)
+        result['teacher_id'] = teacher.id
+        return result, 200
+
+class DepartmentRatingSummaryResource(Resource):
+    @cached(tags=['rankings'])
+    def get(self, department):
+        # 学院全部课程的评分分布和各维度平均分（由课程统计汇总）
+        if Teacher.query.filter_by(department=department).first() is None:
+            return {'error': 'Department not found'}, 404
+        result = rating_summary(Teacher.department == department)
+        result['department'] = department
+        return result, 200
+
 # 注册路由
 # 延迟导入api对象以避免循环导入
 from app.api import api
 api.add_resource(TeachersResource, '/api/teachers')
 api.add_resource(TeacherResource, '/api/teachers/<int:teacher_id>')
-api.add_resource(TeacherCoursesResource, '/api/teachers/<int:teacher_id>/courses')
\ No newline at end of file
+api.add_resource(TeacherCoursesResource, '/api/teachers/<int:teacher_id>/courses')
+api.add_resource(TeacherRatingSummaryResource, '/api/teachers/<int:teacher_id>/rating_summary')
+api.add_resource(DepartmentRatingSummaryResource, '/api/departments/<department>/rating_summary')
\ No newline at end of file
@@ -50,6 +50,7 @@ class Course(db.Model):
     # 关系
     evaluations = db.relationship('Evaluation', backref='course', lazy=True)
     comments = db.relationship('Comment', backref='course', lazy=True)
+    stats = db.relationship('CourseStats', backref='course', uselist=False, lazy=True)
 
 # 评价表
 class Evaluation(db.Model):
@@ -66,15 +67,112 @@ class Evaluation(db.Model):
     comment = db.Column(db.Text)  # 评价内容
     is_anonymous = db.Column(db.Boolean, default=False)  # 是否匿名评价
     user_name = db.Column(db.String(100))  # 用户昵称或"匿名用户"
+    likes_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 点赞数，随点赞/取消点赞原子更新
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_evaluations_course_likes', 'course_id', 'likes_count'),
+    )
+    
     # 点赞关系
     likes = db.relationship('Like', secondary='likes',
                            primaryjoin='Evaluation.id == Like.target_id',
                            secondaryjoin="and_(Like.target_id == Evaluation.id, Like.target_type == 'evaluation')",
                            viewonly=True)
 
+# 标签表（评价标签的规范化存储）
+class Tag(db.Model):
+    __tablename__ = 'tags'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# 评价-标签关联表（冗余course_id，便于按课程统计热门标签）
+class EvaluationTag(db.Model):
+    __tablename__ = 'evaluation_tags'
+
+    evaluation_id = db.Column(db.Integer, db.ForeignKey('evaluations.id'), primary_key=True)
+    tag_id = db.Column(db.Integer, db.ForeignKey('tags.id'), primary_key=True, index=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_evaluation_tags_course_tag', 'course_id', 'tag_id'),
+    )
+
+# 标签计数表（按学期、学院汇总标签使用次数，空字符串表示不限）
+class TagStats(db.Model):
+    __tablename__ = 'tag_stats'
+
+    tag_id = db.Column(db.Integer, db.ForeignKey('tags.id'), primary_key=True)
+    semester = db.Column(db.String(20), primary_key=True, default='')
+    department = db.Column(db.String(100), primary_key=True, default='')
+    usage_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_tag_stats_scope_count', 'semester', 'department', 'usage_count'),
+    )
+
+# 课程评分统计表（由评价的增删改维护，读取时无需加载全部评价）
+class CourseStats(db.Model):
+    __tablename__ = 'course_stats'
+
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), primary_key=True)
+    evaluation_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0)
+    workload_sum = db.Column(db.Float, nullable=False, default=0)
+    workload_count = db.Column(db.Integer, nullable=False, default=0)
+    content_sum = db.Column(db.Float, nullable=False, default=0)
+    content_count = db.Column(db.Integer, nullable=False, default=0)
+    teaching_sum = db.Column(db.Float, nullable=False, default=0)
+    teaching_count = db.Column(db.Integer, nullable=False, default=0)
+    # 评分分布：按评分整数部分分为1-5星五档（4.5分计入4星），见 app/utils/stats.py
+    score_1_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    score_2_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    score_3_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    score_4_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    score_5_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_evaluated_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def avg_score(self):
+        if not self.evaluation_count:
+            return 0
+        return round(self.score_sum / self.evaluation_count, 1)
+
+    def avg_dimension(self, name):
+        # name 取值：workload / content / teaching，没有数据时返回None
+        count = getattr(self, name + '_count')
+        if not count:
+            return None
+        return round(getattr(self, name + '_sum') / count, 1)
+
+# 课程每日评分统计表（按评价创建日期分桶，用于按时间范围的排行榜）
+class CourseDailyStats(db.Model):
+    __tablename__ = 'course_daily_stats'
+
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    evaluation_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_course_daily_stats_day_course', 'day', 'course_id'),
+    )
+
+# 用户活动统计表（由评价、评论、点赞的写接口同步维护，/api/me 只需按主键读取一行）
+class UserStats(db.Model):
+    __tablename__ = 'user_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    evaluation_count = db.Column(db.Integer, nullable=False, default=0)  # 发表的评价数
+    discussion_count = db.Column(db.Integer, nullable=False, default=0)  # 发起的讨论数（顶级评论）
+    reply_count = db.Column(db.Integer, nullable=False, default=0)  # 发表的回复数
+    likes_received = db.Column(db.Integer, nullable=False, default=0)  # 评价和评论收到的点赞数
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 # 点赞表（通用，支持评论和评价的点赞）
 class Like(db.Model):
     __tablename__ = 'likes'
@@ -99,7 +197,11 @@ class Comment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     user_name = db.Column(db.String(100))  # 保留用户昵称，用于兼容旧数据
     content = db.Column(db.Text, nullable=False)
-    parent_id = db.Column(db.Integer, db.ForeignKey('comments.id'), nullable=True)  # 父评论ID，用于回复
+    parent_id = db.Column(db.Integer, db.ForeignKey('comments.id'), nullable=True, index=True)  # 父评论ID，用于回复
+    # 物化路径：祖先及自身ID补零到定长后以'/'连接，如 '0000000001/0000000005/'，
+    # 按路径排序即为树的先序遍历，整棵子树是一段连续的路径区间（见 app/utils/comments.py）
+    path = db.Column(db.String(512), index=True)
+    likes_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 点赞数，随点赞/取消点赞原子更新
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -1,12 +1,126 @@
 """
 统一的JWT认证工具模块
+
+get_current_user 的结果按以下三级缓存，已登录请求通常不再重复解析token或查询用户表：
+- 请求内：解析结果缓存在 flask.g 上，同一请求多次调用只解析一次
+- token：进程内有上限的 LRU，缓存已验证的 token -> user_id，token 的过期时间到达后失效
+- 用户：进程内有上限的 LRU，按用户ID缓存用户行的字段值，AUTH_USER_CACHE_TTL 秒后重新查询；
+  修改用户信息的接口提交后应调用 invalidate_user
+
+配置项（环境变量 / app.config，在 create_app 中调用 init_app 生效）：
+    AUTH_TOKEN_CACHE_SIZE  token缓存的最大条目数，默认4096，0表示不缓存
+    AUTH_USER_CACHE_SIZE   用户缓存的最大条目数，默认4096，0表示不缓存
+    AUTH_USER_CACHE_TTL    用户行缓存秒数，默认60，0表示不缓存
 """
 import jwt
 import os
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
-from flask import request, jsonify
+from flask import g, request, jsonify
+from sqlalchemy.orm import make_transient_to_detached
+from app import db
 from app.models import User
 
+
+class _LRUCache:
+    """进程内有上限的 LRU，每个条目带过期时刻（None 表示不过期）"""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_token_cache = _LRUCache()  # token -> user_id
+_user_cache = _LRUCache()  # user_id -> 字段值
+_user_cache_ttl = 60
+
+
+def init_app(app):
+    """按 app.config 设置缓存大小和时长，并清空已有缓存"""
+    global _user_cache_ttl
+    _token_cache.max_entries = int(app.config.get('AUTH_TOKEN_CACHE_SIZE', 4096))
+    _user_cache.max_entries = int(app.config.get('AUTH_USER_CACHE_SIZE', 4096))
+    _user_cache_ttl = int(app.config.get('AUTH_USER_CACHE_TTL', 60))
+    _token_cache.clear()
+    _user_cache.clear()
+
+
+def _decode_token(token):
+    """验证token并返回 user_id，无效或已过期时抛出异常"""
+    user_id = _token_cache.get(token)
+    if user_id is not None:
+        return user_id
+
+    secret_key = os.getenv('SECRET_KEY', 'default_secret_key')
+    payload = jwt.decode(token, secret_key, algorithms=['HS256'])
+    user_id = payload.get('user_id')
+    if user_id is not None:
+        _token_cache.set(token, user_id, payload.get('exp'))
+    return user_id
+
+
+def _load_user(user_id):
+    """按ID获取用户，命中缓存时不查询数据库，返回的对象属于当前会话"""
+    if _user_cache_ttl <= 0:
+        return User.query.get(user_id)
+
+    values = _user_cache.get(user_id)
+    if values is not None:
+        user = User(**values)
+        make_transient_to_detached(user)
+        # load=False：直接并入当前会话，不发出查询；之后的修改仍会正常提交
+        return db.session.merge(user, load=False)
+
+    user = User.query.get(user_id)
+    if user is not None:
+        values = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        _user_cache.set(user_id, values, time.time() + _user_cache_ttl)
+    return user
+
+
+def invalidate_user(user_id):
+    """修改用户信息后使该用户的缓存失效"""
+    _user_cache.pop(user_id)
+    cached = g.get('_current_user')
+    if cached is not None and cached.id == user_id:
+        g.pop('_current_user', None)
+
+
 def get_current_user():
     """
     从请求头中获取当前用户信息
@@ -14,19 +128,20 @@ def get_current_user():
     Returns:
         User: 当前登录的用户对象，如果未登录或token无效则返回None
     """
+    if '_current_user' in g:
+        return g._current_user
+
+    user = None
     auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-
-    token = auth_header.split(' ')[1]
-    try:
-        secret_key = os.getenv('SECRET_KEY', 'default_secret_key')
-        payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-        user_id = payload.get('user_id')
-        user = User.query.get(user_id)
-        return user
-    except Exception:
-        return None
+    if auth_header and auth_header.startswith('Bearer '):
+        token = auth_header.split(' ')[1]
+        try:
+            user = _load_user(_decode_token(token))
+        except Exception:
+            user = None
+
+    g._current_user = user
+    return user
 
 def login_required(f):
     """
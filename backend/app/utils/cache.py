@@ -0,0 +1,340 @@
+"""
+接口响应缓存模块
+
+为 flask_restful 资源的 GET 方法提供响应缓存：
+- 缓存键由请求路径与规范化（排序）后的查询参数组成
+- 每个缓存项带有若干标签（如 course:<id>、rankings），写接口提交后按标签失效
+- 后端可选进程内 LRU+TTL（开发环境默认）或 Redis 协议后端。生产环境（gunicorn 多 worker）应使用 Redis：
+  进程内后端的失效只作用于当前进程，其他进程的缓存只能等TTL过期，
+  因此多 worker 下使用进程内后端时缓存时间被限制为 CACHE_MEMORY_MULTI_WORKER_TTL 秒
+
+配置项（环境变量 / app.config）：
+    CACHE_BACKEND                  memory（默认） / redis / none，生产环境使用 redis
+    CACHE_REDIS_URL                Redis地址，CACHE_BACKEND=redis 时使用
+    CACHE_DEFAULT_TTL              默认缓存秒数，默认60
+    CACHE_MAX_ENTRIES              进程内后端的最大缓存项数，默认1024
+    CACHE_WORKERS                  工作进程数，取自 WEB_CONCURRENCY（gunicorn 的 worker 数），默认1
+    CACHE_MEMORY_MULTI_WORKER_TTL  多 worker 使用进程内后端时的最长缓存秒数，默认5
+
+排行榜等计算代价高的接口可启用 stale-while-revalidate：缓存过期后的一段时间内
+先返回旧数据，同时在后台线程重新计算；同一缓存键在一个进程内同时只有一次计算
+（single-flight），并发未命中的请求等待这次计算的结果。这类缓存项按标签失效时不删除，
+只标记为过期（fresh_until 置0），读请求继续拿到旧数据并触发一次后台刷新。
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from flask import copy_current_request_context, request
+
+
+def mark_stale(value):
+    """
+    stale-while-revalidate 缓存项失效时保留的值
+
+    Returns:
+        dict: fresh_until 置0后的缓存项；value 不是这类缓存项时返回None（应直接删除）
+    """
+    if isinstance(value, dict) and value.keys() == {'value', 'fresh_until'}:
+        return {'value': value['value'], 'fresh_until': 0}
+    return None
+
+
+class MemoryBackend:
+    """进程内 LRU + TTL 缓存后端"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, expires_at, tags)
+        self._tags = {}  # tag -> set(key)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, _ = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, tags=()):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.time() + ttl, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    value, expires_at, entry_tags = self._entries[key]
+                    stale = mark_stale(value)
+                    if stale is None:
+                        self._remove(key)
+                    else:
+                        self._entries[key] = (stale, expires_at, entry_tags)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisBackend:
+    """
+    Redis 协议缓存后端
+
+    client 只需实现 get / set(ex=) / sadd / smembers / expire / ttl / delete，
+    测试或压测时可传入本地的假实现。Redis 不可用时按未命中处理，不影响接口。
+    """
+
+    def __init__(self, client, prefix='pingke:cache:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis  # 可选依赖，仅在使用Redis后端时需要
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _tag_key(self, tag):
+        return self.prefix + 'tag:' + tag
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            print(f"读取缓存失败: {e}")
+            return None
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8')
+        return json.loads(raw)
+
+    def set(self, key, value, ttl, tags=()):
+        try:
+            self.client.set(self.prefix + key, json.dumps(value), ex=ttl)
+            for tag in tags:
+                tag_key = self._tag_key(tag)
+                self.client.sadd(tag_key, self.prefix + key)
+                # 标签集合不能早于其中的缓存项过期，否则这些缓存项将无法按标签失效
+                if self.client.ttl(tag_key) < ttl:
+                    self.client.expire(tag_key, ttl)
+        except Exception as e:
+            print(f"写入缓存失败: {e}")
+
+    def invalidate(self, tags):
+        try:
+            for tag in tags:
+                tag_key = self._tag_key(tag)
+                deleted = []
+                kept = False
+                for key in self.client.smembers(tag_key):
+                    if self._mark_stale(key):
+                        kept = True
+                    else:
+                        deleted.append(key)
+                if deleted:
+                    self.client.delete(*deleted)
+                if not kept:
+                    self.client.delete(tag_key)
+        except Exception as e:
+            print(f"清除缓存失败: {e}")
+
+    def _mark_stale(self, key):
+        """把 stale-while-revalidate 缓存项标记为过期并保留剩余的存活时间；不是这类缓存项时返回False"""
+        key = key.decode('utf-8') if isinstance(key, bytes) else key
+        raw = self.client.get(key)
+        if raw is None:
+            return False
+        stale = mark_stale(json.loads(raw.decode('utf-8') if isinstance(raw, bytes) else raw))
+        remaining = self.client.ttl(key)
+        if stale is None or remaining <= 0:
+            return False
+        self.client.set(key, json.dumps(stale), ex=remaining)
+        return True
+
+    def clear(self):
+        # Redis 后端依赖TTL与标签失效，不提供全量清空
+        pass
+
+
+class ResponseCache:
+    """响应缓存，使用方式与 db = SQLAlchemy() 相同：先创建，再在 create_app 中 init_app"""
+
+    def __init__(self):
+        self.backend = None
+        self.default_ttl = 60
+        self.max_ttl = None  # 缓存时间上限，None 表示不限
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        self.default_ttl = int(app.config.get('CACHE_DEFAULT_TTL', 60))
+        self.max_ttl = None
+        if backend == 'redis':
+            self.backend = RedisBackend.from_url(app.config['CACHE_REDIS_URL'])
+        elif backend == 'memory':
+            self.backend = MemoryBackend(int(app.config.get('CACHE_MAX_ENTRIES', 1024)))
+            if int(app.config.get('CACHE_WORKERS', 1)) > 1:
+                # 其他 worker 的写入无法使本进程的缓存失效，缩短缓存时间以限制读到旧数据的时长
+                self.max_ttl = int(app.config.get('CACHE_MEMORY_MULTI_WORKER_TTL', 5))
+                print(f"⚠ 多 worker 部署使用进程内缓存，缓存时间限制为 {self.max_ttl} 秒；生产环境请配置 CACHE_BACKEND=redis")
+        else:
+            self.backend = None
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def make_key(self):
+        """由请求路径和排序后的查询参数生成缓存键"""
+        args = sorted(request.args.items(multi=True))
+        return request.path + '?' + urlencode(args)
+
+    def get(self, key):
+        return self.backend.get(key) if self.enabled else None
+
+    def set(self, key, value, ttl=None, tags=()):
+        if self.enabled:
+            ttl = ttl or self.default_ttl
+            if self.max_ttl is not None:
+                ttl = min(ttl, self.max_ttl)
+            self.backend.set(key, value, ttl, tags)
+
+    def invalidate(self, *tags):
+        """按标签使缓存失效，写接口在提交事务后调用"""
+        if self.enabled and tags:
+            self.backend.invalidate(tags)
+
+    def clear(self):
+        if self.enabled:
+            self.backend.clear()
+
+
+class SingleFlight:
+    """同一缓存键在进程内同时只允许一个计算，其余调用等待其完成"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> threading.Event
+
+    def begin(self, key):
+        """
+        Returns:
+            tuple: (是否由当前调用负责计算, 计算完成事件)
+        """
+        with self._lock:
+            event = self._calls.get(key)
+            if event is not None:
+                return False, event
+            event = threading.Event()
+            self._calls[key] = event
+            return True, event
+
+    def end(self, key):
+        with self._lock:
+            event = self._calls.pop(key, None)
+        if event is not None:
+            event.set()
+
+
+cache = ResponseCache()
+single_flight = SingleFlight()
+
+
+def cached(tags=None, ttl=None, stale_ttl=None):
+    """
+    缓存资源 GET 方法的 (数据, 200) 返回值
+
+    Args:
+        tags: 标签列表，或接收路由参数、返回标签列表的函数，
+              例如 lambda course_id: ['course:%d' % course_id]
+        ttl: 缓存秒数，默认使用 CACHE_DEFAULT_TTL
+        stale_ttl: 启用 stale-while-revalidate，过期后仍可返回旧数据的秒数
+    """
+    def decorator(f):
+        def store(key, rv, kwargs):
+            if isinstance(rv, tuple) and len(rv) == 2 and rv[1] == 200:
+                entry_tags = tags(**kwargs) if callable(tags) else (tags or [])
+                entry_ttl = ttl or cache.default_ttl
+                if stale_ttl:
+                    value = {'value': rv[0], 'fresh_until': time.time() + entry_ttl}
+                    cache.set(key, value, entry_ttl + stale_ttl, entry_tags)
+                else:
+                    cache.set(key, rv[0], entry_ttl, entry_tags)
+
+        def compute(key, args, kwargs):
+            # 未命中：同一键只计算一次，其余请求等待结果
+            leader, event = single_flight.begin(key)
+            if not leader:
+                event.wait(30)
+                hit = cache.get(key)
+                if hit is not None:
+                    return hit['value'], 200
+                return f(*args, **kwargs)
+            try:
+                rv = f(*args, **kwargs)
+                store(key, rv, kwargs)
+                return rv
+            finally:
+                single_flight.end(key)
+
+        def revalidate(key, args, kwargs):
+            # 已有计算在进行时不再重复启动
+            leader, _ = single_flight.begin(key)
+            if not leader:
+                return
+
+            @copy_current_request_context
+            def refresh():
+                try:
+                    store(key, f(*args, **kwargs), kwargs)
+                except Exception as e:
+                    print(f"后台刷新缓存失败: {e}")
+                finally:
+                    single_flight.end(key)
+
+            threading.Thread(target=refresh, daemon=True).start()
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not cache.enabled:
+                return f(*args, **kwargs)
+
+            key = cache.make_key()
+            hit = cache.get(key)
+
+            if not stale_ttl:
+                if hit is not None:
+                    return hit, 200
+                rv = f(*args, **kwargs)
+                store(key, rv, kwargs)
+                return rv
+
+            if hit is None:
+                return compute(key, args, kwargs)
+            if hit['fresh_until'] <= time.time():
+                revalidate(key, args, kwargs)
+            return hit['value'], 200
+        return wrapper
+    return decorator
@@ -0,0 +1,363 @@
+"""
+评论回复树模块
+
+讨论列表每页只展示每条讨论的前N条回复和回复总数，
+这里对整页讨论一次性查询，查询次数与每页讨论数量无关：
+- 前N条回复：ROW_NUMBER() OVER (PARTITION BY parent_id ...) 窗口查询，
+  数据库不支持窗口函数时（SQLite < 3.25、MySQL < 8.0）退化为关联子查询
+- 回复总数：按 parent_id 分组 COUNT
+
+完整的回复树通过 Comment.path 物化路径维护：评论创建时写入路径，
+整棵子树的读取、计数、删除都是一条按路径区间的查询，无需逐层递归。
+"""
+from sqlalchemy import func, or_
+from sqlalchemy.orm import aliased, joinedload
+from app import db
+from app.models import Comment, Like
+from app.schemas import CommentSchema
+from app.utils.likes import liked_target_ids
+from app.utils.loading import list_load_options
+from app.utils.pagination import cursor_paginate
+from app.utils.user_stats import shift_user_stats
+
+# 回复分页参数：直接回复每页 limit 条，更深的层级每条评论最多预览 NESTED_REPLY_LIMIT 条，
+# 最多展开 MAX_REPLY_DEPTH 层，单次响应的回复数量有上限
+DEFAULT_REPLY_LIMIT = 20
+MAX_REPLY_LIMIT = 100
+NESTED_REPLY_LIMIT = 3
+MAX_REPLY_DEPTH = 3
+
+# 回复树的根节点与后代节点，与 CommentSchema 嵌套 replies 的输出字段一致
+tree_root_schema = CommentSchema(exclude=['replies'])
+tree_node_schema = CommentSchema(exclude=['replies', 'parent_id', 'course_id'])
+# 讨论列表中的讨论和回复单独组装回复，不递归序列化 replies 关系
+feed_schema = CommentSchema(exclude=['replies'])
+
+# 讨论列表中每条讨论预览的回复数量
+PREVIEW_REPLIES = 3
+
+
+def reply_query():
+    """批量加载回复的查询，序列化需要的所属课程随回复一次取回"""
+    return Comment.query.options(*list_load_options(joinedload(Comment.course)))
+
+
+def supports_window_functions():
+    """当前数据库是否支持 ROW_NUMBER() 等窗口函数"""
+    dialect = db.engine.dialect
+    version = dialect.server_version_info or ()
+    if dialect.name == 'sqlite':
+        return version >= (3, 25)
+    if dialect.name == 'mysql':
+        if getattr(dialect, 'is_mariadb', False):
+            return version >= (10, 2)
+        return version >= (8, 0)
+    return True
+
+
+def reply_counts(parent_ids):
+    """批量统计回复数量，返回 {parent_id: 回复数}"""
+    parent_ids = list(parent_ids)
+    if not parent_ids:
+        return {}
+    rows = db.session.query(Comment.parent_id, func.count(Comment.id)).filter(
+        Comment.parent_id.in_(parent_ids)
+    ).group_by(Comment.parent_id).all()
+    return dict(rows)
+
+
+def top_replies(parent_ids, limit=3):
+    """
+    批量获取每条评论最早的前 limit 条回复
+
+    Returns:
+        dict: {parent_id: [Comment, ...]}，每组按回复ID（即发布先后）升序
+    """
+    parent_ids = list(parent_ids)
+    if not parent_ids or limit <= 0:
+        return {}
+
+    if supports_window_functions():
+        row_number = func.row_number().over(
+            partition_by=Comment.parent_id,
+            order_by=Comment.id
+        ).label('row_number')
+        ranked = db.session.query(Comment.id.label('id'), row_number).filter(
+            Comment.parent_id.in_(parent_ids)
+        ).subquery()
+        query = reply_query().join(ranked, ranked.c.id == Comment.id).filter(
+            ranked.c.row_number <= limit
+        )
+    else:
+        # 排在该回复之前的同级回复数量少于 limit，即为前 limit 条
+        earlier = aliased(Comment)
+        preceding = db.session.query(func.count(earlier.id)).filter(
+            earlier.parent_id == Comment.parent_id,
+            earlier.id < Comment.id
+        ).scalar_subquery()
+        query = reply_query().filter(Comment.parent_id.in_(parent_ids), preceding < limit)
+
+    replies = {}
+    for reply in query.order_by(Comment.parent_id, Comment.id):
+        replies.setdefault(reply.parent_id, []).append(reply)
+    return replies
+
+
+# 物化路径中每一级ID补零后的宽度，足以容纳32位整数主键
+PATH_WIDTH = 10
+# path 列能容纳的最大层级（每级 PATH_WIDTH 位数字加 '/'），超过时拒绝继续回复
+MAX_COMMENT_LEVEL = Comment.__table__.c.path.type.length // (PATH_WIDTH + 1)
+
+
+def path_segment(comment_id):
+    return '%0*d/' % (PATH_WIDTH, comment_id)
+
+
+def comment_path(comment):
+    """评论的物化路径；路径尚未回填的旧评论沿父评论链计算（不写入数据库）"""
+    chain = []
+    node = comment
+    while node is not None and node.path is None:
+        chain.append(node.id)
+        node = node.parent
+    path = node.path if node is not None else ''
+    for comment_id in reversed(chain):
+        path += path_segment(comment_id)
+    return path
+
+
+def can_reply_to(parent):
+    """父评论的层级是否还允许回复（新回复的路径不能超出 path 列长度）"""
+    return len(comment_path(parent)) // (PATH_WIDTH + 1) < MAX_COMMENT_LEVEL
+
+
+def assign_comment_path(comment):
+    """为新评论写入物化路径（评论需已flush，拥有ID），在同一事务内由调用方提交"""
+    parent_path = comment_path(comment.parent) if comment.parent_id else ''
+    comment.path = parent_path + path_segment(comment.id)
+
+
+def descendant_ids(comment):
+    """沿 parent_id 逐层查找全部后代的ID，每层一次查询（用于路径尚未回填的旧评论）"""
+    ids = []
+    level = [comment.id]
+    while level:
+        level = [comment_id for (comment_id,) in db.session.query(Comment.id).filter(Comment.parent_id.in_(level))]
+        ids.extend(level)
+    return ids
+
+
+def subtree_filter(comment, include_self=True):
+    """
+    评论子树的筛选条件
+
+    子树内的路径都以该评论的路径为前缀；'/' 的下一个字符是 '0'，
+    因此用区间 [path, path末位换成'0') 表示，可以直接走 path 索引。
+    评论的路径尚未回填时退化为沿 parent_id 逐层查找的ID列表。
+    """
+    if comment.path is None:
+        ids = descendant_ids(comment)
+        return Comment.id.in_(ids + [comment.id] if include_self else ids)
+    condition = (Comment.path >= comment.path) & (Comment.path < comment.path[:-1] + '0')
+    if not include_self:
+        condition = condition & (Comment.id != comment.id)
+    return condition
+
+
+def load_subtrees(comments):
+    """
+    一次查询加载多条评论的全部后代
+
+    Returns:
+        dict: {parent_id: [子评论, ...]}，每组按ID升序
+    """
+    if not comments:
+        return {}
+    descendants = reply_query().filter(
+        or_(*[subtree_filter(comment, include_self=False) for comment in comments])
+    ).order_by(Comment.path, Comment.id).all()
+
+    children = {}
+    for descendant in descendants:
+        children.setdefault(descendant.parent_id, []).append(descendant)
+    return children
+
+
+def dump_comment_tree(comment, children, nested=False, counts=None):
+    """
+    按 load_subtrees / load_reply_page 的结果序列化评论及其回复树，不再逐层查询 replies 关系
+
+    输出与 CommentSchema 递归序列化 replies 的结果相同；
+    传入 counts（{评论ID: 直接回复数}）时每个节点另带 reply_count 字段
+    """
+    data = (tree_node_schema if nested else tree_root_schema).dump(comment)
+    data['replies'] = [
+        dump_comment_tree(child, children, nested=True, counts=counts)
+        for child in children.get(comment.id, [])
+    ]
+    if counts is not None:
+        data['reply_count'] = counts.get(comment.id, 0)
+    return data
+
+
+def dump_discussion_feed(comments, user):
+    """
+    序列化一页讨论：每条讨论附带前 PREVIEW_REPLIES 条回复、回复总数和当前用户的点赞状态
+
+    回复、回复总数、点赞状态各一次查询，与本页讨论数量无关
+    """
+    # 一次查询取本页全部讨论的前3条回复，一次分组查询得到回复总数
+    page_ids = [comment.id for comment in comments]
+    replies_by_parent = top_replies(page_ids, PREVIEW_REPLIES)
+    counts = reply_counts(page_ids)
+    
+    # 收集本页讨论及其前3条回复的ID，一次查询得到当前用户的点赞状态
+    for replies in replies_by_parent.values():
+        page_ids.extend(reply.id for reply in replies)
+    liked_ids = liked_target_ids(user, 'comment', page_ids)
+    
+    result = []
+    for comment in comments:
+        comment_data = feed_schema.dump(comment)
+        
+        # 获取前3条回复
+        comment_data['replies'] = []
+        for reply in replies_by_parent.get(comment.id, []):
+            reply_data = feed_schema.dump(reply)
+            
+            # 为回复设置author字段，与主评论处理方式一致
+            reply_data['author'] = reply_data['user_name']
+            reply_data['likes_count'] = reply.likes_count
+            reply_data['is_liked'] = reply.id in liked_ids
+            comment_data['replies'].append(reply_data)
+        
+        # 回复总数
+        comment_data['replies_count'] = counts.get(comment.id, 0)
+        # 重命名字段以匹配前端
+        comment_data['author'] = comment_data['user_name']
+        comment_data['likes_count'] = comment.likes_count
+        comment_data['is_liked'] = comment.id in liked_ids
+        
+        result.append(comment_data)
+    return result
+
+
+def reply_page_args(args, default_depth=1):
+    """
+    解析回复分页的 limit / depth 参数，超出范围的值截断到允许范围
+
+    Raises:
+        ValueError: 参数不是整数
+    """
+    limit = int(args.get('limit', DEFAULT_REPLY_LIMIT))
+    depth = int(args.get('depth', default_depth))
+    return min(max(limit, 1), MAX_REPLY_LIMIT), min(max(depth, 1), MAX_REPLY_DEPTH)
+
+
+def load_reply_page(comment, limit=DEFAULT_REPLY_LIMIT, cursor=None, depth=1):
+    """
+    加载评论的一页直接回复，并向下展开 depth-1 层、每条最多 NESTED_REPLY_LIMIT 条回复
+
+    直接回复按ID游标分页；更深的每一层用一次 top_replies 窗口查询，
+    全部节点的回复数用一次分组查询，查询次数只与 depth 有关，与回复总数无关。
+
+    Returns:
+        tuple: ({parent_id: [子评论, ...]}, {评论ID: 直接回复数}, 下一页游标)
+
+    Raises:
+        ValueError: 游标无效
+    """
+    query = reply_query().filter(Comment.parent_id == comment.id)
+    replies, next_cursor = cursor_paginate(query, [(Comment.id, False)], cursor or '', limit)
+
+    children = {comment.id: replies}
+    level = replies
+    for _ in range(depth - 1):
+        if not level:
+            break
+        nested = top_replies([reply.id for reply in level], NESTED_REPLY_LIMIT)
+        children.update(nested)
+        level = [reply for group in nested.values() for reply in group]
+
+    loaded_ids = [comment.id] + [reply.id for group in children.values() for reply in group]
+    return children, reply_counts(loaded_ids), next_cursor
+
+
+def count_descendants(comment):
+    """统计评论的全部后代数量（不含自身）"""
+    return db.session.query(func.count(Comment.id)).filter(
+        subtree_filter(comment, include_self=False)
+    ).scalar()
+
+
+def delete_comment_tree(comment):
+    """
+    批量删除评论及其全部后代和这些评论的点赞，并从作者的用户统计中移出，由调用方提交
+
+    先一次查询取出子树的ID和层级，点赞一条语句删除；
+    评论按层级从深到浅删除，不违反 parent_id 的自引用外键。
+    """
+    rows = db.session.query(
+        Comment.id, Comment.path, Comment.user_id, Comment.parent_id, Comment.likes_count
+    ).filter(subtree_filter(comment)).all()
+    ids = [row.id for row in rows]
+
+    Like.query.filter(
+        Like.target_type == 'comment', Like.target_id.in_(ids)
+    ).delete(synchronize_session=False)
+
+    # 层级按 parent_id 计算，不依赖路径（路径尚未回填时 rows 来自逐层查找）
+    parents = {row.id: row.parent_id for row in rows}
+
+    def level(comment_id):
+        depth = 0
+        while comment_id != comment.id:
+            comment_id = parents[comment_id]
+            depth += 1
+        return depth
+
+    levels = {}
+    deltas = {}
+    for row in rows:
+        levels.setdefault(level(row.id), []).append(row.id)
+        user_deltas = deltas.setdefault(row.user_id, {'discussion_count': 0, 'reply_count': 0, 'likes_received': 0})
+        user_deltas['discussion_count' if row.parent_id is None else 'reply_count'] -= 1
+        user_deltas['likes_received'] -= row.likes_count or 0
+    for depth in sorted(levels, reverse=True):
+        # evaluate：会话中已加载的这些评论同时标记为已删除
+        Comment.query.filter(Comment.id.in_(levels[depth])).delete(synchronize_session='evaluate')
+
+    for user_id, user_deltas in deltas.items():
+        shift_user_stats(user_id, **user_deltas)
+    return len(ids)
+
+
+def rebuild_comment_paths():
+    """
+    根据 parent_id 全量重建评论的物化路径（用于已有数据的回填或校正）
+
+    Returns:
+        int: 写入路径的评论数量
+    """
+    parents = dict(db.session.query(Comment.id, Comment.parent_id))
+    paths = {}
+
+    def resolve(comment_id):
+        # 沿父评论链向上，自顶向下拼接路径
+        chain = []
+        while comment_id is not None and comment_id not in paths:
+            chain.append(comment_id)
+            comment_id = parents.get(comment_id)
+        prefix = paths.get(comment_id, '')
+        for node in reversed(chain):
+            prefix += path_segment(node)
+            paths[node] = prefix
+
+    for comment_id in parents:
+        resolve(comment_id)
+
+    db.session.bulk_update_mappings(Comment, [
+        {'id': comment_id, 'path': path} for comment_id, path in paths.items()
+    ])
+    db.session.commit()
+    return len(paths)
@@ -0,0 +1,120 @@
+"""
+点赞计数维护模块
+
+Evaluation.likes_count 与 Comment.likes_count 是 likes 表的冗余计数：
+点赞/取消点赞时与 Like 行的插入/删除处于同一个事务，
+以 UPDATE ... SET likes_count = likes_count ± 1 原子更新，
+读取点赞数与按点赞数排序都不再需要 COUNT(*) 查询 likes 表。
+
+列表接口的"当前用户是否点赞"由 liked_target_ids 按页批量查询，
+一页数据只需一次 IN (...) 查询，结果在请求内缓存。
+"""
+from flask import g
+from sqlalchemy import func, update
+from app import db
+from app.models import Comment, Evaluation, Like
+from app.utils.user_stats import shift_user_stats
+
+# Like.target_type -> 带 likes_count 计数列的模型
+LIKE_TARGETS = {
+    'evaluation': Evaluation,
+    'comment': Comment,
+}
+
+
+def shift_likes_count(target_type, target_id, sign=1):
+    """将目标的点赞计数增加（sign=1）或减少（sign=-1）"""
+    model = LIKE_TARGETS[target_type]
+    db.session.execute(
+        update(model)
+        .where(model.id == target_id)
+        .values(likes_count=model.likes_count + sign)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def toggle_like(user_id, target_type, target_id):
+    """
+    切换用户对目标的点赞状态，并在同一事务内更新点赞计数和作者收到的点赞数（由调用方提交）
+
+    Returns:
+        tuple: (操作后是否已点赞, 操作后的点赞数)
+    """
+    existing_like = Like.query.filter_by(
+        user_id=user_id,
+        target_type=target_type,
+        target_id=target_id
+    ).first()
+
+    if existing_like:
+        # 如果已经点赞，则取消点赞
+        db.session.delete(existing_like)
+        sign = -1
+    else:
+        # 如果未点赞，则添加点赞
+        db.session.add(Like(user_id=user_id, target_type=target_type, target_id=target_id))
+        sign = 1
+    db.session.flush()
+    shift_likes_count(target_type, target_id, sign)
+    # 点赞状态已变化，丢弃本次请求内缓存的结果
+    g.get('_liked_targets', {}).get((user_id, target_type), {}).pop(target_id, None)
+
+    # 按主键读取更新后的计数和作者，计入作者收到的点赞数
+    model = LIKE_TARGETS[target_type]
+    likes_count, owner_id = db.session.query(model.likes_count, model.user_id).filter(model.id == target_id).one()
+    shift_user_stats(owner_id, likes_received=sign)
+    return sign > 0, likes_count or 0
+
+
+def liked_target_ids(user, target_type, target_ids):
+    """
+    批量查询当前用户点赞过哪些目标
+
+    列表接口先收集本页全部评价/评论ID再调用，一次 IN 查询得到整页的点赞状态；
+    结果缓存在 flask.g 上，同一请求内已查询过的目标不再重复查询。
+
+    Args:
+        user: 当前用户，未登录时为None
+        target_type: 'evaluation' 或 'comment'
+        target_ids: 目标ID列表
+
+    Returns:
+        set: 已点赞的目标ID集合，未登录时为空集合
+    """
+    if user is None:
+        return set()
+    known = g.setdefault('_liked_targets', {}).setdefault((user.id, target_type), {})
+    missing = {target_id for target_id in target_ids if target_id not in known}
+    if missing:
+        liked = {target_id for (target_id,) in db.session.query(Like.target_id).filter(
+            Like.user_id == user.id,
+            Like.target_type == target_type,
+            Like.target_id.in_(missing)
+        )}
+        for target_id in missing:
+            known[target_id] = target_id in liked
+    return {target_id for target_id in target_ids if known[target_id]}
+
+
+def reconcile_likes_count():
+    """
+    根据 likes 表校正全部点赞计数（用于迁移后的回填或定期对账）
+
+    Returns:
+        dict: {target_type: 被修正的行数}
+    """
+    fixed = {}
+    for target_type, model in LIKE_TARGETS.items():
+        actual = db.session.query(func.count(Like.id)).filter(
+            Like.target_type == target_type,
+            Like.target_id == model.id
+        ).scalar_subquery()
+        result = db.session.execute(
+            update(model)
+            .where(model.likes_count != actual)
+            .values(likes_count=actual)
+            .execution_options(synchronize_session=False)
+        )
+        fixed[target_type] = result.rowcount
+    db.session.commit()
+    return fixed
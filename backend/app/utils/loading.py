@@ -0,0 +1,28 @@
+"""
+列表接口的关系加载策略
+
+模型上的关系都是 lazy=True，序列化时访问 course / teacher 等嵌套字段会为每一行单独发出一条 SELECT。
+列表接口在查询上显式声明要序列化的关系：多对一用 joinedload 随主查询一次取回，
+一对多用 selectinload 按整页 IN 查询。
+
+配置项（环境变量 / app.config）：
+    STRICT_LOADING  为 1 时，列表查询中未声明的关系改为 raiseload：访问时若需要发出SQL则直接抛出异常，
+                    测试中开启后新增的 N+1 查询会立即暴露。已在会话中的对象（如按主键取到的教师）不受影响。
+"""
+from flask import current_app
+from sqlalchemy.orm import raiseload
+
+
+def list_load_options(*options):
+    """
+    列表查询的加载选项，用法：Course.query.options(*list_load_options(joinedload(Course.teacher)))
+
+    Args:
+        options: 本接口需要的 joinedload / selectinload 选项
+
+    Returns:
+        tuple: 加载选项；严格模式下追加 raiseload('*')
+    """
+    if current_app.config.get('STRICT_LOADING'):
+        options += (raiseload('*', sql_only=True),)
+    return options
@@ -0,0 +1,112 @@
+"""
+游标（keyset）分页工具
+
+列表接口传入 cursor 参数时使用游标分页：按排序键定位上一页的最后一行，
+以 WHERE (排序键) 在其之后 + LIMIT 取下一页，不执行 COUNT(*)，也不做 OFFSET 扫描，
+因此无论翻到多深，每一页的查询代价都与第一页相同。
+"""
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import DateTime, Integer, Numeric, String, and_, desc, or_
+
+
+def encode_cursor(values):
+    """将排序键的值编码为不透明的游标字符串"""
+    encoded = []
+    for value in values:
+        if isinstance(value, datetime):
+            encoded.append({'dt': value.isoformat()})
+        else:
+            encoded.append(value)
+    raw = json.dumps(encoded, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _matches_type(expr, value):
+    """游标中的值与排序表达式的类型一致（避免在SQL中比较字符串与数字，各数据库行为不同）"""
+    sql_type = getattr(expr, 'type', None)
+    if isinstance(sql_type, DateTime):
+        return isinstance(value, datetime)
+    if value is None or isinstance(value, (bool, datetime)):
+        return False
+    if isinstance(sql_type, Integer):
+        return isinstance(value, int)
+    if isinstance(sql_type, Numeric):
+        return isinstance(value, (int, float))
+    if isinstance(sql_type, String):
+        return isinstance(value, str)
+    return isinstance(value, (int, float, str))
+
+
+def decode_cursor(cursor, exprs):
+    """
+    解码游标字符串，exprs 为对应的排序表达式
+
+    Raises:
+        ValueError: 游标格式错误，或排序键数量、类型与排序表达式不匹配
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        encoded = json.loads(raw.decode('utf-8'))
+    except Exception:
+        raise ValueError('invalid cursor')
+    if not isinstance(encoded, list) or len(encoded) != len(exprs):
+        raise ValueError('invalid cursor')
+
+    values = []
+    for value in encoded:
+        if isinstance(value, dict):
+            try:
+                value = datetime.fromisoformat(value['dt'])
+            except Exception:
+                raise ValueError('invalid cursor')
+        values.append(value)
+    if not all(_matches_type(expr, value) for expr, value in zip(exprs, values)):
+        raise ValueError('invalid cursor')
+    return values
+
+
+def apply_order(query, order_by):
+    """按 [(排序表达式, 是否降序), ...] 为查询添加排序"""
+    return query.order_by(*[desc(expr) if descending else expr for expr, descending in order_by])
+
+
+def _after(order_by, values):
+    # (k1, k2, ...) 在游标之后：k1 越过，或 k1 相等且 k2 越过，依此类推
+    clauses = []
+    for i, (expr, descending) in enumerate(order_by):
+        beyond = expr < values[i] if descending else expr > values[i]
+        equal = [order_by[j][0] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
+
+
+def cursor_paginate(query, order_by, cursor, per_page):
+    """
+    游标分页
+
+    Args:
+        query: 已添加筛选条件、尚未排序的查询
+        order_by: [(排序表达式, 是否降序), ...]，最后一项必须是唯一列（如主键）
+        cursor: 上一页返回的 next_cursor，第一页传空字符串
+        per_page: 每页数量
+
+    Returns:
+        tuple: (本页对象列表, 下一页游标；没有更多数据时为None)
+
+    Raises:
+        ValueError: 游标无效
+    """
+    if cursor:
+        values = decode_cursor(cursor, [expr for expr, _ in order_by])
+        query = query.filter(_after(order_by, values))
+
+    query = apply_order(query, order_by)
+    rows = query.add_columns(*[expr for expr, _ in order_by]).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    items = [row[0] for row in rows]
+    next_cursor = encode_cursor(list(rows[-1][1:])) if has_more else None
+    return items, next_cursor
@@ -0,0 +1,408 @@
+"""
+课程关键词搜索索引
+
+课程列表的 keyword 参数原先对课程名、课程代码、简介和教师姓名做四个前导通配的 LIKE，
+每次搜索都要全表扫描。这里为这些字段维护一份面向中文的搜索索引：
+文本按连续的字母/数字/汉字切成片段，每个片段拆成相邻两字的二元组（末尾另加单字），
+例如 "数据结构" -> "数据 据结 结构 构"。查询时每个片段作为一个短语匹配，
+等价于子串匹配，单字查询按前缀匹配。
+
+后端（环境变量 / app.config SEARCH_BACKEND）：
+    auto    默认：SQLite 支持 FTS5 时用 fts5，MySQL 用 mysql，否则用 memory
+    fts5    SQLite FTS5 虚拟表 course_search，按 bm25 计算相关度
+    mysql   MySQL ngram 全文索引表 course_search，按 MATCH ... AGAINST 计算相关度
+    memory  进程内倒排索引，首次搜索时从数据库构建，SEARCH_MEMORY_TTL 秒（默认300）后重建；
+            多 worker 部署时其他进程的写入在重建前不可见
+
+课程和教师的写接口在提交前调用 index_course / remove_course / index_teacher_courses，
+索引与数据处于同一事务。已有数据或批量导入的数据用 rebuild_search_index.py 重建。
+"""
+import math
+import re
+import threading
+import time
+from sqlalchemy import Float, Integer, bindparam, case, false, literal, text
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.models import Course, Teacher
+
+# 相关度中各字段的权重
+FIELD_WEIGHTS = {
+    'name': 10.0,
+    'code': 10.0,
+    'teacher': 5.0,
+    'description': 1.0,
+}
+
+# 连续的字母、数字或汉字
+_RUN = re.compile(r'[^\W_]+')
+
+
+def text_runs(value):
+    """将文本切成小写的字母/数字/汉字片段"""
+    return _RUN.findall((value or '').lower())
+
+
+def run_tokens(run):
+    """片段的二元组，末尾另加单字，使每个字都是某个词元的首字（单字查询按前缀匹配）"""
+    return [run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]
+
+
+def index_text(value):
+    """索引中存储的词元文本，以空格分隔"""
+    return ' '.join(token for run in text_runs(value) for token in run_tokens(run))
+
+
+def course_documents(course_ids=None):
+    """
+    读取课程的可搜索字段
+
+    Returns:
+        list: [(course_id, {'name', 'code', 'teacher', 'description'}), ...]
+    """
+    query = db.session.query(
+        Course.id, Course.name, Course.course_code, Teacher.name, Course.description
+    ).outerjoin(Teacher, Teacher.id == Course.teacher_id)
+    if course_ids is not None:
+        query = query.filter(Course.id.in_(course_ids))
+    return [(course_id, {'name': name, 'code': code, 'teacher': teacher, 'description': description})
+            for course_id, name, code, teacher, description in query]
+
+
+class Fts5Backend:
+    """SQLite FTS5 后端：rowid 即课程ID，四个字段各占一列"""
+
+    name = 'fts5'
+    persistent = True
+
+    def setup(self):
+        """创建虚拟表，返回是否为新建（新建时需要回填）"""
+        existed = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'course_search'"
+        )).first() is not None
+        db.session.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS course_search "
+            "USING fts5(name, code, teacher, description, tokenize = 'unicode61')"
+        ))
+        db.session.commit()
+        return not existed
+
+    def write(self, documents, replace=True):
+        if not documents:
+            return
+        if replace:
+            self.delete([course_id for course_id, _ in documents])
+        db.session.execute(text(
+            "INSERT INTO course_search (rowid, name, code, teacher, description) "
+            "VALUES (:id, :name, :code, :teacher, :description)"
+        ), [dict({field: index_text(value) for field, value in fields.items()}, id=course_id)
+            for course_id, fields in documents])
+
+    def delete(self, course_ids):
+        db.session.execute(text("DELETE FROM course_search WHERE rowid IN :ids").bindparams(
+            bindparam('ids', expanding=True)
+        ), {'ids': list(course_ids)})
+
+    def clear(self):
+        db.session.execute(text("DELETE FROM course_search"))
+
+    def match_expression(self, runs):
+        # 多字片段为相邻二元组组成的短语（即子串），单字片段为前缀
+        phrases = []
+        for run in runs:
+            if len(run) == 1:
+                phrases.append('"%s" *' % run)
+            else:
+                phrases.append('"%s"' % ' '.join(run_tokens(run)[:-1]))
+        return ' AND '.join(phrases)
+
+    def apply(self, query, runs):
+        weights = ', '.join(str(FIELD_WEIGHTS[field]) for field in ('name', 'code', 'teacher', 'description'))
+        matched = text(
+            "SELECT rowid AS course_id, -bm25(course_search, %s) AS score "
+            "FROM course_search WHERE course_search MATCH :match" % weights
+        ).bindparams(match=self.match_expression(runs)).columns(
+            course_id=Integer, score=Float
+        ).subquery('matched')
+        return query.join(matched, matched.c.course_id == Course.id), matched.c.score
+
+
+class MysqlNgramBackend:
+    """
+    MySQL ngram 全文索引后端
+
+    ngram 解析器自行切分二元组，表中存储原文：title 列为课程名、代码和教师姓名，description 列为简介，
+    各建一个全文索引，相关度为两列 MATCH 得分的加权和。
+    """
+
+    name = 'mysql'
+    persistent = True
+
+    def setup(self):
+        existed = db.session.execute(text("SHOW TABLES LIKE 'course_search'")).first() is not None
+        db.session.execute(text(
+            "CREATE TABLE IF NOT EXISTS course_search ("
+            " course_id INT NOT NULL PRIMARY KEY,"
+            " title TEXT NOT NULL,"
+            " description TEXT,"
+            " FULLTEXT INDEX ft_course_search_title (title) WITH PARSER ngram,"
+            " FULLTEXT INDEX ft_course_search_description (description) WITH PARSER ngram"
+            ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+        ))
+        db.session.commit()
+        return not existed
+
+    def write(self, documents, replace=True):
+        if not documents:
+            return
+        db.session.execute(text(
+            "REPLACE INTO course_search (course_id, title, description) VALUES (:id, :title, :description)"
+        ), [{'id': course_id,
+             'title': ' '.join(fields[field] or '' for field in ('name', 'code', 'teacher')),
+             'description': fields['description'] or ''}
+            for course_id, fields in documents])
+
+    def delete(self, course_ids):
+        db.session.execute(text("DELETE FROM course_search WHERE course_id IN :ids").bindparams(
+            bindparam('ids', expanding=True)
+        ), {'ids': list(course_ids)})
+
+    def clear(self):
+        db.session.execute(text("DELETE FROM course_search"))
+
+    def match_expression(self, runs):
+        # 布尔模式：每个片段都必须出现，多字片段为短语，单字片段为前缀
+        return ' '.join('+%s*' % run if len(run) == 1 else '+"%s"' % run for run in runs)
+
+    def apply(self, query, runs):
+        title_weight = FIELD_WEIGHTS['name']
+        matched = text(
+            "SELECT course_id, "
+            " MATCH (title) AGAINST (:match IN BOOLEAN MODE) * %s"
+            " + MATCH (description) AGAINST (:match IN BOOLEAN MODE) * %s AS score "
+            "FROM course_search "
+            "WHERE MATCH (title) AGAINST (:match IN BOOLEAN MODE)"
+            " OR MATCH (description) AGAINST (:match IN BOOLEAN MODE)" % (title_weight, FIELD_WEIGHTS['description'])
+        ).bindparams(match=self.match_expression(runs)).columns(
+            course_id=Integer, score=Float
+        ).subquery('matched')
+        return query.join(matched, matched.c.course_id == Course.id), matched.c.score
+
+
+class MemoryBackend:
+    """
+    进程内倒排索引后端
+
+    词元（单字和二元组）-> 课程ID集合；候选为全部查询词元的交集，
+    再对候选课程的原文做子串校验和打分。只返回得分最高的 max_results 门课程。
+    """
+
+    name = 'memory'
+    persistent = False
+
+    def __init__(self, ttl=300, max_results=1000):
+        self.ttl = ttl
+        self.max_results = max_results
+        self._postings = {}  # 词元 -> set(course_id)
+        self._documents = {}  # course_id -> {字段: 小写原文}
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def setup(self):
+        return False
+
+    def _tokens(self, fields):
+        tokens = set()
+        for value in fields.values():
+            for run in text_runs(value):
+                tokens.update(run)
+                tokens.update(run_tokens(run))
+        return tokens
+
+    def _add(self, course_id, fields):
+        fields = {field: (value or '').lower() for field, value in fields.items()}
+        self._documents[course_id] = fields
+        for token in self._tokens(fields):
+            self._postings.setdefault(token, set()).add(course_id)
+
+    def _remove(self, course_id):
+        fields = self._documents.pop(course_id, None)
+        if fields is None:
+            return
+        for token in self._tokens(fields):
+            ids = self._postings.get(token)
+            if ids is not None:
+                ids.discard(course_id)
+                if not ids:
+                    del self._postings[token]
+
+    def _ensure_built(self):
+        if self._built_at is not None and time.time() - self._built_at < self.ttl:
+            return
+        documents = course_documents()
+        with self._lock:
+            self._postings = {}
+            self._documents = {}
+            for course_id, fields in documents:
+                self._add(course_id, fields)
+            self._built_at = time.time()
+
+    def write(self, documents, replace=True):
+        # 尚未构建时无需维护，首次搜索时会从数据库完整构建
+        if self._built_at is None:
+            return
+        with self._lock:
+            for course_id, fields in documents:
+                self._remove(course_id)
+                self._add(course_id, fields)
+
+    def delete(self, course_ids):
+        if self._built_at is None:
+            return
+        with self._lock:
+            for course_id in course_ids:
+                self._remove(course_id)
+
+    def clear(self):
+        with self._lock:
+            self._postings = {}
+            self._documents = {}
+            self._built_at = None
+
+    def search(self, runs):
+        """
+        Returns:
+            dict: {course_id: 相关度}
+        """
+        self._ensure_built()
+        with self._lock:
+            candidates = None
+            for run in runs:
+                for token in (run_tokens(run)[:-1] or [run]):
+                    ids = self._postings.get(token, set())
+                    candidates = set(ids) if candidates is None else candidates & ids
+                    if not candidates:
+                        return {}
+            scores = {}
+            for course_id in candidates:
+                fields = self._documents[course_id]
+                score = 0.0
+                for run in runs:
+                    run_score = sum(FIELD_WEIGHTS[field] * value.count(run) / math.sqrt(len(value))
+                                    for field, value in fields.items() if value and run in value)
+                    if not run_score:
+                        break
+                    score += run_score
+                else:
+                    scores[course_id] = score
+        if len(scores) > self.max_results:
+            top = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:self.max_results]
+            scores = dict(top)
+        return scores
+
+    def apply(self, query, runs):
+        scores = self.search(runs)
+        if not scores:
+            return query.filter(false()), literal(0.0)
+        relevance = case(scores, value=Course.id, else_=0.0)
+        return query.filter(Course.id.in_(list(scores))), relevance
+
+
+class SearchIndex:
+    """课程搜索索引，使用方式与 cache 相同：先创建，再在 create_app 中 init_app"""
+
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app):
+        """选择后端并准备索引表；索引表为新建时从课程表回填（需在应用上下文中调用）"""
+        choice = app.config.get('SEARCH_BACKEND', 'auto')
+        dialect = db.engine.dialect.name
+        if choice == 'auto':
+            choice = {'sqlite': 'fts5', 'mysql': 'mysql'}.get(dialect, 'memory')
+
+        backend = None
+        if choice == 'fts5' and dialect == 'sqlite':
+            backend = Fts5Backend()
+        elif choice == 'mysql' and dialect == 'mysql':
+            backend = MysqlNgramBackend()
+        if backend is not None:
+            try:
+                created = backend.setup()
+            except OperationalError as e:
+                db.session.rollback()
+                print(f"⚠ 全文索引不可用，改用进程内索引: {e}")
+                backend = None
+        if backend is None:
+            backend = MemoryBackend(ttl=int(app.config.get('SEARCH_MEMORY_TTL', 300)))
+            created = False
+
+        self.backend = backend
+        if created and Course.query.first() is not None:
+            print(f"✓ 已回填 {self.rebuild()} 门课程的搜索索引")
+
+    def apply(self, query, keyword):
+        """
+        为课程查询添加关键词匹配条件
+
+        Returns:
+            tuple: (查询, 相关度表达式)；关键词中没有字母/数字/汉字时按原样做子串匹配，相关度为None
+        """
+        runs = text_runs(keyword)
+        if not runs:
+            # 纯符号关键词不进入索引，数量极少，沿用 LIKE 匹配
+            return query.filter(
+                Course.name.contains(keyword) |
+                Course.course_code.contains(keyword) |
+                Course.description.contains(keyword) |
+                Course.teacher.has(Teacher.name.contains(keyword))
+            ), None
+        return self.backend.apply(query, runs)
+
+    def index_course(self, course):
+        """新增或更新一门课程的索引（课程需已flush，拥有ID），由调用方提交"""
+        teacher = Teacher.query.get(course.teacher_id) if course.teacher_id else None
+        self.backend.write([(course.id, {
+            'name': course.name,
+            'code': course.course_code,
+            'teacher': teacher.name if teacher else None,
+            'description': course.description,
+        })])
+
+    def index_teacher_courses(self, teacher):
+        """教师姓名变更后重建其全部课程的索引"""
+        self.backend.write(course_documents([course.id for course in teacher.courses]))
+
+    def remove_course(self, course_id):
+        self.backend.delete([course_id])
+
+    def rebuild(self, batch_size=1000):
+        """
+        根据课程表和教师表全量重建索引（用于已有数据的回填或校正）
+
+        Returns:
+            int: 写入索引的课程数量
+        """
+        self.backend.clear()
+        if not self.backend.persistent:
+            # 进程内索引在下次搜索时从数据库完整构建
+            return Course.query.count()
+
+        total = 0
+        last_id = 0
+        while True:
+            # 按主键分批读取，避免一次性加载全部课程
+            ids = [course_id for (course_id,) in db.session.query(Course.id).filter(
+                Course.id > last_id
+            ).order_by(Course.id).limit(batch_size)]
+            if not ids:
+                break
+            last_id = ids[-1]
+            documents = course_documents(ids)
+            self.backend.write(documents, replace=False)
+            total += len(documents)
+        db.session.commit()
+        return total
+
+
+search_index = SearchIndex()
@@ -0,0 +1,300 @@
+"""
+课程评分统计维护模块
+
+评价的新增、修改、删除都通过这里同步更新 course_stats 表。
+统计更新与评价写入处于同一个数据库事务中，由调用方统一提交；
+读取时只需按课程ID取一行统计数据，无需加载该课程的全部评价。
+
+另按评价创建日期（UTC）维护每日分桶 course_daily_stats，
+按时间范围的排行榜只需汇总窗口内有限个分桶。
+
+评分分布同样存储在 course_stats 中（score_<星级>_count 五档计数），
+课程、教师、学院的评分分布和各维度平均分都由 course_stats 汇总，代价与评价数量无关。
+"""
+from datetime import date, datetime
+from sqlalchemy import case, func, update
+from app import db
+from app.models import Course, CourseDailyStats, CourseStats, Evaluation, Teacher
+from app.utils.upsert import expire_loaded, insert_missing
+
+# 评价的分项评分维度，对应 Evaluation.<name>_score 与 CourseStats.<name>_sum/<name>_count
+DIMENSIONS = ('workload', 'content', 'teaching')
+
+# 评分分布的档位（星级），对应 CourseStats.score_<星级>_count
+SCORE_BUCKETS = (5, 4, 3, 2, 1)
+
+
+def score_bucket(score):
+    """评分所在的档位：取整数部分，4.5分计入4星；不在1-5分范围内时返回None"""
+    if score is None or score < 1 or score >= 6:
+        return None
+    return int(score)
+
+
+def bucket_column(star):
+    return 'score_%d_count' % star
+
+
+def empty_course_stats(course_id):
+    """一行全零的课程统计（列名 -> 值）"""
+    row = {'course_id': course_id, 'evaluation_count': 0, 'score_sum': 0}
+    for name in DIMENSIONS:
+        row[name + '_sum'] = 0
+        row[name + '_count'] = 0
+    for star in SCORE_BUCKETS:
+        row[bucket_column(star)] = 0
+    return row
+
+
+def ensure_course_stats(course_id):
+    """
+    确保课程有统计行，不存在时创建一行全零的统计
+
+    课程创建时即调用；评价写入时再次调用以兼容旧数据中缺少统计行的课程。
+    使用 insert_missing，并发写入同一课程的首条评价时不会因主键冲突失败。
+    """
+    insert_missing(CourseStats, [empty_course_stats(course_id)])
+
+
+def apply_evaluation(evaluation, sign=1):
+    """
+    将一条评价计入（sign=1）或移出（sign=-1）所属课程的统计
+
+    使用 UPDATE ... SET col = col ± value 的原子更新，避免并发写入时互相覆盖。
+    修改评价时应先以 sign=-1 移出旧值，修改字段后再以 sign=1 计入新值。
+    """
+    ensure_course_stats(evaluation.course_id)
+
+    values = {
+        'evaluation_count': CourseStats.evaluation_count + sign,
+        'score_sum': CourseStats.score_sum + sign * evaluation.score,
+    }
+    for name in DIMENSIONS:
+        value = getattr(evaluation, name + '_score')
+        if value is not None:
+            values[name + '_sum'] = getattr(CourseStats, name + '_sum') + sign * value
+            values[name + '_count'] = getattr(CourseStats, name + '_count') + sign
+    star = score_bucket(evaluation.score)
+    if star is not None:
+        values[bucket_column(star)] = getattr(CourseStats, bucket_column(star)) + sign
+
+    if sign > 0:
+        created_at = evaluation.created_at
+        values['last_evaluated_at'] = case(
+            (CourseStats.last_evaluated_at.is_(None), created_at),
+            (CourseStats.last_evaluated_at < created_at, created_at),
+            else_=CourseStats.last_evaluated_at
+        )
+    else:
+        # 移出时按课程ID索引取其余评价中的最新时间
+        values['last_evaluated_at'] = db.session.query(
+            func.max(Evaluation.created_at)
+        ).filter(
+            Evaluation.course_id == evaluation.course_id,
+            Evaluation.id != evaluation.id
+        ).scalar_subquery()
+
+    db.session.execute(
+        update(CourseStats)
+        .where(CourseStats.course_id == evaluation.course_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    expire_loaded(CourseStats, evaluation.course_id)
+
+    apply_evaluation_daily(evaluation, sign)
+
+
+def apply_evaluation_daily(evaluation, sign=1):
+    """将评价计入/移出其创建日期所在的每日分桶"""
+    day = evaluation.created_at.date()
+    # 计入时确保分桶存在（并发安全）；移出时分桶不存在则 UPDATE 不影响任何行
+    if sign > 0:
+        insert_missing(CourseDailyStats, [
+            {'course_id': evaluation.course_id, 'day': day, 'evaluation_count': 0, 'score_sum': 0}
+        ])
+
+    db.session.execute(
+        update(CourseDailyStats)
+        .where(CourseDailyStats.course_id == evaluation.course_id, CourseDailyStats.day == day)
+        .values(
+            evaluation_count=CourseDailyStats.evaluation_count + sign,
+            score_sum=CourseDailyStats.score_sum + sign * evaluation.score
+        )
+        .execution_options(synchronize_session=False)
+    )
+    expire_loaded(CourseDailyStats, (evaluation.course_id, day))
+
+
+def course_score_source(start_day=None, end_day=None):
+    """
+    课程评分汇总子查询，列为 course_id / evaluation_count / score_sum
+
+    不指定时间范围时直接读取 course_stats；指定时汇总 [start_day, end_day] 内的每日分桶
+    （两端均为包含的日期，任一端可为None表示不限）。
+    """
+    if start_day is None and end_day is None:
+        return db.session.query(
+            CourseStats.course_id.label('course_id'),
+            CourseStats.evaluation_count.label('evaluation_count'),
+            CourseStats.score_sum.label('score_sum')
+        ).subquery()
+
+    query = db.session.query(
+        CourseDailyStats.course_id.label('course_id'),
+        func.sum(CourseDailyStats.evaluation_count).label('evaluation_count'),
+        func.sum(CourseDailyStats.score_sum).label('score_sum')
+    )
+    if start_day is not None:
+        query = query.filter(CourseDailyStats.day >= start_day)
+    if end_day is not None:
+        query = query.filter(CourseDailyStats.day <= end_day)
+    return query.group_by(CourseDailyStats.course_id).subquery()
+
+
+def course_stats_map(course_ids):
+    """批量获取课程统计，返回 {course_id: CourseStats}"""
+    course_ids = list(course_ids)
+    if not course_ids:
+        return {}
+    rows = CourseStats.query.filter(CourseStats.course_id.in_(course_ids)).all()
+    return {stats.course_id: stats for stats in rows}
+
+
+def course_score_fields(stats):
+    """课程列表/详情中的 avg_score 与 evaluation_count 字段"""
+    if stats is None or not stats.evaluation_count:
+        return {'avg_score': 0, 'evaluation_count': 0}
+    return {
+        'avg_score': stats.avg_score,
+        'evaluation_count': stats.evaluation_count
+    }
+
+
+def rating_distribution(stats):
+    """
+    由统计行的五档计数得到评分分布
+
+    Args:
+        stats: CourseStats，或 rating_summary 中带 score_<星级>_count 列的汇总行；为None时全部为0
+
+    Returns:
+        dict: {'5': 数量, '4': 数量, '3': 数量, '2': 数量, '1': 数量}
+    """
+    return {str(star): int(getattr(stats, bucket_column(star)) or 0) if stats is not None else 0
+            for star in SCORE_BUCKETS}
+
+
+def rating_summary(*filters):
+    """
+    汇总满足条件的课程的评分统计（一次聚合查询，代价与课程数量相关，与评价数量无关）
+
+    Args:
+        filters: 作用于 Course / Teacher 的筛选条件，如 Course.teacher_id == 1、Teacher.department == '计算机学院'
+
+    Returns:
+        dict: evaluation_count、avg_score、avg_<维度>_score（没有数据的维度不返回）和 distribution
+    """
+    columns = [
+        func.coalesce(func.sum(CourseStats.evaluation_count), 0).label('evaluation_count'),
+        func.coalesce(func.sum(CourseStats.score_sum), 0).label('score_sum'),
+    ]
+    for name in DIMENSIONS:
+        columns.append(func.coalesce(func.sum(getattr(CourseStats, name + '_sum')), 0).label(name + '_sum'))
+        columns.append(func.coalesce(func.sum(getattr(CourseStats, name + '_count')), 0).label(name + '_count'))
+    for star in SCORE_BUCKETS:
+        columns.append(func.coalesce(func.sum(getattr(CourseStats, bucket_column(star))), 0).label(bucket_column(star)))
+
+    row = db.session.query(*columns).select_from(CourseStats).join(
+        Course, Course.id == CourseStats.course_id
+    ).outerjoin(Teacher, Teacher.id == Course.teacher_id).filter(*filters).one()
+
+    summary = {
+        'evaluation_count': int(row.evaluation_count),
+        'avg_score': round(row.score_sum / row.evaluation_count, 1) if row.evaluation_count else 0,
+    }
+    for name in DIMENSIONS:
+        count = getattr(row, name + '_count')
+        if count:
+            summary['avg_%s_score' % name] = round(getattr(row, name + '_sum') / count, 1)
+    summary['distribution'] = rating_distribution(row)
+    return summary
+
+
+def rebuild_course_stats():
+    """
+    根据评价表全量重建 course_stats 与每日分桶（用于已有数据的初始化或校正）
+
+    Returns:
+        int: 重建的课程统计行数
+    """
+    columns = [
+        Evaluation.course_id,
+        func.count(Evaluation.id).label('evaluation_count'),
+        func.sum(Evaluation.score).label('score_sum'),
+        func.max(Evaluation.created_at).label('last_evaluated_at'),
+    ]
+    for name in DIMENSIONS:
+        score_column = getattr(Evaluation, name + '_score')
+        columns.append(func.sum(score_column).label(name + '_sum'))
+        columns.append(func.count(score_column).label(name + '_count'))
+    # 与 score_bucket 一致：按整数部分分档，1分以下、6分及以上不计入
+    bucket = case(*[(Evaluation.score >= star, star) for star in SCORE_BUCKETS[:-1]], else_=1)
+    in_range = (Evaluation.score >= 1) & (Evaluation.score < 6)
+    for star in SCORE_BUCKETS:
+        columns.append(func.sum(case((in_range & (bucket == star), 1), else_=0)).label(bucket_column(star)))
+
+    rows = db.session.query(*columns).group_by(Evaluation.course_id).all()
+    by_course = {row.course_id: row for row in rows}
+
+    mappings = []
+    for (course_id,) in db.session.query(Course.id):
+        row = by_course.get(course_id)
+        mapping = {
+            'course_id': course_id,
+            'evaluation_count': row.evaluation_count if row else 0,
+            'score_sum': (row.score_sum or 0) if row else 0,
+            'last_evaluated_at': row.last_evaluated_at if row else None,
+        }
+        for name in DIMENSIONS:
+            mapping[name + '_sum'] = (getattr(row, name + '_sum') or 0) if row else 0
+            mapping[name + '_count'] = getattr(row, name + '_count') if row else 0
+        for star in SCORE_BUCKETS:
+            mapping[bucket_column(star)] = (getattr(row, bucket_column(star)) or 0) if row else 0
+        mappings.append(mapping)
+
+    CourseStats.query.delete()
+    db.session.bulk_insert_mappings(CourseStats, mappings)
+    rebuild_course_daily_stats()
+    db.session.commit()
+    return len(mappings)
+
+
+def rebuild_course_daily_stats():
+    """根据评价表全量重建每日分桶（由 rebuild_course_stats 调用，不单独提交）"""
+    day = func.date(Evaluation.created_at)
+    rows = db.session.query(
+        Evaluation.course_id,
+        day.label('day'),
+        func.count(Evaluation.id).label('evaluation_count'),
+        func.sum(Evaluation.score).label('score_sum')
+    ).filter(Evaluation.created_at.isnot(None)).group_by(Evaluation.course_id, day).all()
+
+    mappings = []
+    for row in rows:
+        bucket_day = row.day
+        # SQLite 的 date() 返回字符串
+        if isinstance(bucket_day, str):
+            bucket_day = date.fromisoformat(bucket_day)
+        elif isinstance(bucket_day, datetime):
+            bucket_day = bucket_day.date()
+        mappings.append({
+            'course_id': row.course_id,
+            'day': bucket_day,
+            'evaluation_count': row.evaluation_count,
+            'score_sum': row.score_sum or 0
+        })
+
+    CourseDailyStats.query.delete()
+    db.session.bulk_insert_mappings(CourseDailyStats, mappings)
+    return len(mappings)
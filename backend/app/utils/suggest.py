@@ -0,0 +1,192 @@
+"""
+搜索框输入联想（前缀补全）
+
+小程序搜索框每输入一个字都会请求一次，联想结果直接由进程内的有序数组回答，不访问数据库：
+数组元素为 (小写的匹配键, 类型, ID)，按匹配键排序，查询时 bisect 定位到前缀的起点后顺序取出。
+匹配键包括课程名、课程代码、课程名的拼音首字母和教师姓名（及其拼音首字母），
+例如 "数据结构" 可由 "数据"、"CS201"、"sjjg" 联想到。
+
+索引在 create_app 中从课程表和教师表构建，课程和教师的写接口提交后调用 index_course / index_teacher /
+remove_course / remove_teacher 增量更新。索引只在当前进程内，构建超过 SUGGEST_TTL 秒（默认300）后
+由下一次联想请求在后台线程重建（全量计算拼音首字母需要数秒），重建完成前请求继续使用旧索引；
+多 worker 部署时其他进程的写入最多延迟这么久可见；批量导入数据后调用 rebuild()。
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from pypinyin import Style, lazy_pinyin
+from app import db
+from app.models import Course, Teacher
+
+
+def normalize(value):
+    """匹配键与查询词统一小写并去掉空白"""
+    return ''.join((value or '').lower().split())
+
+
+def pinyin_initials(value):
+    """
+    文本的拼音首字母（非汉字按原样保留），如 "数据结构" -> "sjjg"
+
+    Returns:
+        str: 首字母串；文本中没有汉字时返回None
+    """
+    if not value:
+        return None
+    initials = normalize(''.join(lazy_pinyin(value, style=Style.FIRST_LETTER, errors='default')))
+    return initials if initials != normalize(value) else None
+
+
+class SuggestIndex:
+    """课程和教师的前缀索引"""
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._keys = []  # 有序的 (匹配键, 类型, ID)
+        self._items = {}  # (类型, ID) -> (联想结果, 匹配键列表)
+        self._built_at = None
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._pending = None  # 重建期间的增量更新，重建完成后在新索引上重放
+        self._rebuild_thread = None
+        self._app = None
+
+    def init_app(self, app):
+        """从数据库构建索引（需在应用上下文中调用）"""
+        self.ttl = int(app.config.get('SUGGEST_TTL', 300))
+        self._app = app
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        根据课程表和教师表全量重建索引
+
+        Returns:
+            int: 索引的课程和教师数量
+        """
+        with self._lock:
+            self._pending = []
+        keys = []
+        items = {}
+        rows = db.session.query(
+            Course.id, Course.name, Course.course_code, Teacher.name
+        ).outerjoin(Teacher, Teacher.id == Course.teacher_id)
+        for course_id, name, course_code, teacher_name in rows:
+            self._build_course(course_id, name, course_code, teacher_name, keys, items)
+        for teacher_id, name, department in db.session.query(Teacher.id, Teacher.name, Teacher.department):
+            self._build_teacher(teacher_id, name, department, keys, items)
+        keys.sort()
+        with self._lock:
+            self._keys = keys
+            self._items = items
+            # 查询之后提交的写入不在新索引中，按顺序重放
+            for ref, added_keys, added_items in self._pending:
+                self._apply(ref, added_keys, added_items)
+            self._pending = None
+            self._built_at = time.time()
+        return len(items)
+
+    def _ensure_fresh(self):
+        """索引过期时在后台线程重建；同时只有一个线程负责重建，请求不等待，继续使用旧索引"""
+        if self._built_at is not None and time.time() - self._built_at < self.ttl:
+            return
+        if self._app is None or not self._rebuild_lock.acquire(blocking=False):
+            return
+        self._rebuild_thread = threading.Thread(target=self._rebuild_in_background, daemon=True)
+        self._rebuild_thread.start()
+
+    def _rebuild_in_background(self):
+        try:
+            with self._app.app_context():
+                self.rebuild()
+        except Exception:
+            # 重建失败时保留旧索引，下一次联想请求再试
+            self._app.logger.exception('联想索引重建失败')
+            with self._lock:
+                self._pending = None
+        finally:
+            self._rebuild_lock.release()
+
+    def _build_course(self, course_id, name, course_code, teacher_name, keys, items):
+        item = {'type': 'course', 'id': course_id, 'name': name, 'course_code': course_code,
+                'teacher_name': teacher_name}
+        self._build(item, [name, course_code, pinyin_initials(name)], keys, items)
+
+    def _build_teacher(self, teacher_id, name, department, keys, items):
+        item = {'type': 'teacher', 'id': teacher_id, 'name': name, 'department': department}
+        self._build(item, [name, pinyin_initials(name)], keys, items)
+
+    def _build(self, item, values, keys, items):
+        ref = (item['type'], item['id'])
+        item_keys = sorted({normalize(value) for value in values if normalize(value)})
+        items[ref] = (item, item_keys)
+        keys.extend((key,) + ref for key in item_keys)
+
+    def _replace(self, ref, build):
+        """在锁内删除 ref 的旧匹配键，再插入 build 生成的新匹配键"""
+        added_keys = []
+        added_items = {}
+        if build is not None:
+            build(added_keys, added_items)
+        with self._lock:
+            self._apply(ref, added_keys, added_items)
+            if self._pending is not None:
+                self._pending.append((ref, added_keys, added_items))
+
+    def _apply(self, ref, added_keys, added_items):
+        """删除 ref 的旧匹配键并插入新匹配键（调用方持有 _lock）"""
+        _, old_keys = self._items.pop(ref, (None, ()))
+        for key in old_keys:
+            index = bisect_left(self._keys, (key,) + ref)
+            if index < len(self._keys) and self._keys[index] == (key,) + ref:
+                del self._keys[index]
+        for entry in added_keys:
+            insort(self._keys, entry)
+        self._items.update(added_items)
+
+    def index_course(self, course):
+        """新增或更新课程的联想项（课程已提交后调用）"""
+        teacher_name = course.teacher.name if course.teacher else None
+        self._replace(('course', course.id), lambda keys, items: self._build_course(
+            course.id, course.name, course.course_code, teacher_name, keys, items))
+
+    def index_teacher(self, teacher):
+        """新增或更新教师的联想项；课程联想项中带有教师姓名，一并刷新"""
+        self._replace(('teacher', teacher.id), lambda keys, items: self._build_teacher(
+            teacher.id, teacher.name, teacher.department, keys, items))
+        for course in teacher.courses:
+            self.index_course(course)
+
+    def remove_course(self, course_id):
+        self._replace(('course', course_id), None)
+
+    def remove_teacher(self, teacher_id):
+        self._replace(('teacher', teacher_id), None)
+
+    def suggest(self, prefix, limit=10):
+        """
+        按前缀查找课程和教师，同一对象多个匹配键命中时只返回一次
+
+        Returns:
+            list: 联想结果，按匹配键的字典序排列（完全匹配的排在最前）
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        self._ensure_fresh()
+        results = []
+        seen = set()
+        with self._lock:
+            index = bisect_left(self._keys, (prefix,))
+            while index < len(self._keys) and len(results) < limit:
+                key, kind, item_id = self._keys[index]
+                if not key.startswith(prefix):
+                    break
+                if (kind, item_id) not in seen:
+                    seen.add((kind, item_id))
+                    results.append(self._items[(kind, item_id)][0])
+                index += 1
+        return results
+
+
+suggest_index = SuggestIndex()
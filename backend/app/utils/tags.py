@@ -0,0 +1,251 @@
+"""
+评价标签索引模块
+
+Evaluation.tags 仍以逗号分隔的字符串保存并原样返回给前端，
+同时在 tags / evaluation_tags 表中维护规范化的索引，
+热门标签统计只需对索引表做一次 GROUP BY，无需扫描全部评价。
+
+全站标签排行另由 tag_stats 计数表提供：评价写入时按
+(不限, 不限)、(学期, 不限)、(不限, 学院)、(学期, 学院) 四个范围增量更新，
+排行查询只需按范围读取计数最高的若干行。
+"""
+from sqlalchemy import desc, func, update
+from app import db
+from app.models import Course, Evaluation, EvaluationTag, Tag, TagStats, Teacher
+from app.utils.upsert import insert_missing
+
+
+def parse_tags(tags):
+    """将逗号分隔的标签字符串拆分为去重后的标签列表（保持原顺序）"""
+    if not tags:
+        return []
+    names = []
+    for name in tags.split(','):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def get_or_create_tags(names):
+    """按名称获取标签，不存在的标签会被创建，返回 {name: Tag}"""
+    if not names:
+        return {}
+    tags = {tag.name: tag for tag in Tag.query.filter(Tag.name.in_(names)).all()}
+    missing = [name for name in names if name not in tags]
+    if missing:
+        # 并发事务可能已创建同名标签，由 insert_missing 跳过后重新查询
+        insert_missing(Tag, [{'name': name} for name in missing])
+        tags.update({tag.name: tag for tag in Tag.query.filter(Tag.name.in_(missing))})
+    return tags
+
+
+def tag_stats_scopes(semester, department):
+    """一次标签使用需要计入的 (学期, 学院) 范围，空字符串表示不限"""
+    semester = semester or ''
+    department = department or ''
+    return {('', ''), (semester, ''), ('', department), (semester, department)}
+
+
+def course_scope(course_id):
+    """课程所属的 (学期, 学院)"""
+    row = db.session.query(Course.semester, Teacher.department).outerjoin(
+        Teacher, Course.teacher_id == Teacher.id
+    ).filter(Course.id == course_id).first()
+    if row is None:
+        return None, None
+    return row.semester, row.department
+
+
+def shift_tag_stats(tag_counts, semester, department, sign=1):
+    """
+    按 {tag_id: 次数} 增加（sign=1）或减少（sign=-1）各范围的标签计数
+
+    使用 UPDATE ... SET usage_count = usage_count ± n 原子更新，
+    每个范围、每种增量只执行一条语句。
+    """
+    if not tag_counts:
+        return
+    scopes = tag_stats_scopes(semester, department)
+    tag_ids = list(tag_counts)
+
+    if sign > 0:
+        # 补齐尚不存在的计数行
+        existing = set(db.session.query(
+            TagStats.tag_id, TagStats.semester, TagStats.department
+        ).filter(
+            TagStats.tag_id.in_(tag_ids),
+            TagStats.semester.in_({scope[0] for scope in scopes}),
+            TagStats.department.in_({scope[1] for scope in scopes})
+        ))
+        # 并发事务可能已插入同一行，由 insert_missing 跳过
+        insert_missing(TagStats, [
+            {'tag_id': tag_id, 'semester': scope_semester, 'department': scope_department, 'usage_count': 0}
+            for tag_id in tag_ids
+            for scope_semester, scope_department in scopes
+            if (tag_id, scope_semester, scope_department) not in existing
+        ])
+
+    by_delta = {}
+    for tag_id, count in tag_counts.items():
+        by_delta.setdefault(sign * count, []).append(tag_id)
+    for delta, ids in by_delta.items():
+        for scope_semester, scope_department in scopes:
+            db.session.execute(
+                update(TagStats)
+                .where(
+                    TagStats.tag_id.in_(ids),
+                    TagStats.semester == scope_semester,
+                    TagStats.department == scope_department
+                )
+                .values(usage_count=TagStats.usage_count + delta)
+                .execution_options(synchronize_session=False)
+            )
+
+
+def shift_course_tag_stats(course_id, sign=1):
+    """
+    将课程全部评价的标签从当前学期/学院范围移出（sign=-1）或计入（sign=1）
+
+    课程的学期、授课教师或教师所属学院变更时，先移出、修改后再计入。
+    """
+    rows = db.session.query(
+        EvaluationTag.tag_id, func.count(EvaluationTag.evaluation_id)
+    ).filter(EvaluationTag.course_id == course_id).group_by(EvaluationTag.tag_id).all()
+    semester, department = course_scope(course_id)
+    shift_tag_stats(dict(rows), semester, department, sign)
+
+
+def index_evaluation_tags(evaluation):
+    """为评价写入标签索引并更新标签计数（评价需已flush，拥有ID）"""
+    names = parse_tags(evaluation.tags)
+    tags = get_or_create_tags(names)
+    for name in names:
+        db.session.add(EvaluationTag(
+            evaluation_id=evaluation.id,
+            tag_id=tags[name].id,
+            course_id=evaluation.course_id
+        ))
+    db.session.flush()
+
+    semester, department = course_scope(evaluation.course_id)
+    shift_tag_stats({tags[name].id: 1 for name in names}, semester, department)
+
+
+def unindex_evaluation_tags(evaluation):
+    """删除评价的标签索引并更新标签计数"""
+    tag_ids = [tag_id for (tag_id,) in db.session.query(EvaluationTag.tag_id).filter(
+        EvaluationTag.evaluation_id == evaluation.id
+    )]
+    if not tag_ids:
+        return
+    EvaluationTag.query.filter_by(evaluation_id=evaluation.id).delete(synchronize_session=False)
+
+    semester, department = course_scope(evaluation.course_id)
+    shift_tag_stats({tag_id: 1 for tag_id in tag_ids}, semester, department, -1)
+
+
+def popular_tags(course_id=None, limit=10):
+    """
+    统计热门标签
+
+    Args:
+        course_id: 课程ID，为None时统计全部课程
+        limit: 返回数量
+
+    Returns:
+        list: [(标签名, 使用次数), ...]，按使用次数降序
+    """
+    count = func.count(EvaluationTag.evaluation_id)
+    query = db.session.query(Tag.name, count).join(
+        EvaluationTag, EvaluationTag.tag_id == Tag.id
+    )
+    if course_id is not None:
+        query = query.filter(EvaluationTag.course_id == course_id)
+    rows = query.group_by(Tag.id, Tag.name).order_by(desc(count), Tag.id).limit(limit).all()
+    return [(name, tag_count) for name, tag_count in rows]
+
+
+def ranked_tags(semester=None, department=None, limit=10):
+    """
+    从标签计数表读取标签排行（不访问评价数据）
+
+    Returns:
+        list: [(标签名, 使用次数), ...]，按使用次数降序
+    """
+    rows = db.session.query(Tag.name, TagStats.usage_count).join(
+        TagStats, TagStats.tag_id == Tag.id
+    ).filter(
+        TagStats.semester == (semester or ''),
+        TagStats.department == (department or ''),
+        TagStats.usage_count > 0
+    ).order_by(desc(TagStats.usage_count), Tag.id).limit(limit).all()
+    return [(name, usage_count) for name, usage_count in rows]
+
+
+def rebuild_tag_stats():
+    """
+    根据标签索引全量重建标签计数表
+
+    Returns:
+        int: 写入的计数行数
+    """
+    rows = db.session.query(
+        EvaluationTag.tag_id, Course.semester, Teacher.department,
+        func.count(EvaluationTag.evaluation_id)
+    ).join(
+        Course, Course.id == EvaluationTag.course_id
+    ).outerjoin(
+        Teacher, Course.teacher_id == Teacher.id
+    ).group_by(EvaluationTag.tag_id, Course.semester, Teacher.department).all()
+
+    counts = {}
+    for tag_id, semester, department, count in rows:
+        for scope_semester, scope_department in tag_stats_scopes(semester, department):
+            key = (tag_id, scope_semester, scope_department)
+            counts[key] = counts.get(key, 0) + count
+
+    TagStats.query.delete()
+    db.session.bulk_insert_mappings(TagStats, [
+        {'tag_id': tag_id, 'semester': semester, 'department': department, 'usage_count': count}
+        for (tag_id, semester, department), count in counts.items()
+    ])
+    return len(counts)
+
+
+def rebuild_evaluation_tags(batch_size=1000):
+    """
+    根据 Evaluation.tags 字符串全量重建标签索引和标签计数（用于已有数据的回填）
+
+    Returns:
+        int: 写入的评价-标签关联数量
+    """
+    EvaluationTag.query.delete()
+    tag_ids = {name: tag_id for tag_id, name in db.session.query(Tag.id, Tag.name)}
+
+    total = 0
+    last_id = 0
+    while True:
+        # 按主键分批读取，避免一次性加载全部评价
+        rows = db.session.query(
+            Evaluation.id, Evaluation.course_id, Evaluation.tags
+        ).filter(Evaluation.id > last_id).order_by(Evaluation.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        mappings = []
+        for evaluation_id, course_id, tags in rows:
+            for name in parse_tags(tags):
+                if name not in tag_ids:
+                    tag = Tag(name=name)
+                    db.session.add(tag)
+                    db.session.flush()
+                    tag_ids[name] = tag.id
+                mappings.append({'evaluation_id': evaluation_id, 'tag_id': tag_ids[name], 'course_id': course_id})
+        db.session.bulk_insert_mappings(EvaluationTag, mappings)
+        total += len(mappings)
+
+    rebuild_tag_stats()
+    db.session.commit()
+    return total
@@ -0,0 +1,56 @@
+"""
+计数行的并发安全创建
+
+course_stats、course_daily_stats、tag_stats、user_stats 等计数表都按"行不存在则创建，再原子 UPDATE"维护。
+先查询再插入时，两个并发事务可能都发现行不存在并插入同一主键，后提交的一方会因 IntegrityError 失败。
+
+insert_missing 用 INSERT ... ON CONFLICT DO NOTHING（SQLite / PostgreSQL）或
+INSERT ... ON DUPLICATE KEY UPDATE（MySQL）插入缺失的行，已存在（包括刚被其他事务插入）的行保持不变；
+之后的 UPDATE col = col ± n 由数据库按行加锁串行执行，计数不会丢失。
+其他数据库退化为逐行在保存点内插入，主键冲突时只回滚该保存点。
+"""
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.util import identity_key
+from app import db
+
+_ON_CONFLICT_DO_NOTHING = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def insert_missing(model, rows):
+    """
+    插入唯一键（主键或唯一索引）尚不存在的行，已存在的行不变
+
+    Args:
+        model: 模型类
+        rows: [{列名: 值}, ...]，未给出的列使用模型的默认值
+    """
+    if not rows:
+        return
+    table = model.__table__
+    dialect = db.session().get_bind(mapper=model.__mapper__).dialect.name
+
+    if dialect in _ON_CONFLICT_DO_NOTHING:
+        db.session.execute(_ON_CONFLICT_DO_NOTHING[dialect](table).on_conflict_do_nothing(), rows)
+    elif dialect == 'mysql':
+        # 冲突时把第一个主键列赋为自身，不修改已有行
+        stmt = mysql.insert(table)
+        key = list(table.primary_key.columns)[0]
+        db.session.execute(stmt.on_duplicate_key_update({key.name: key}), rows)
+    else:
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(table.insert(), row)
+            except IntegrityError:
+                pass
+
+
+def expire_loaded(model, key):
+    """会话中已加载的该行对象在原子 UPDATE 后已过期，下次访问时重新读取；未加载时不查询"""
+    instance = db.session.identity_map.get(identity_key(model, key))
+    if instance is not None:
+        db.session.expire(instance)
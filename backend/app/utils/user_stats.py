@@ -0,0 +1,104 @@
+"""
+用户活动统计维护模块
+
+评价、评论的新增/删除以及点赞/取消点赞都通过这里同步更新 user_stats 表，
+与业务写入处于同一个数据库事务中，由调用方统一提交；
+/api/me 只需按用户ID读取一行统计数据，无需对评价表和评论表做 COUNT。
+"""
+from datetime import datetime
+from sqlalchemy import func, update
+from app import db
+from app.models import Comment, Evaluation, Like, User, UserStats
+from app.utils.upsert import expire_loaded, insert_missing
+
+# user_stats 中随写入增减的计数列
+COUNTERS = ('evaluation_count', 'discussion_count', 'reply_count', 'likes_received')
+
+
+def ensure_user_stats(user_id):
+    """确保用户有统计行，不存在时创建一行全零的统计（并发安全，用户注册时即调用）"""
+    insert_missing(UserStats, [dict({name: 0 for name in COUNTERS}, user_id=user_id)])
+
+
+def shift_user_stats(user_id, **deltas):
+    """
+    按 {计数列: 增量} 原子更新用户统计，统计行不存在时先创建
+
+    例如 shift_user_stats(user.id, evaluation_count=1)
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if user_id is None or not deltas:
+        return
+    ensure_user_stats(user_id)
+
+    db.session.execute(
+        update(UserStats)
+        .where(UserStats.user_id == user_id)
+        .values(updated_at=datetime.utcnow(),
+                **{name: getattr(UserStats, name) + delta for name, delta in deltas.items()})
+        .execution_options(synchronize_session=False)
+    )
+    expire_loaded(UserStats, user_id)
+
+
+def apply_comment(comment, sign=1):
+    """将一条评论计入（sign=1）或移出（sign=-1）作者的讨论数/回复数"""
+    if comment.parent_id is None:
+        shift_user_stats(comment.user_id, discussion_count=sign)
+    else:
+        shift_user_stats(comment.user_id, reply_count=sign)
+
+
+def user_stats_fields(stats):
+    """/api/me 中的 stats 字段"""
+    evaluations_count = stats.evaluation_count if stats else 0
+    discussions_count = stats.discussion_count if stats else 0
+    comments_count = stats.reply_count if stats else 0
+    return {
+        'evaluations_count': evaluations_count,
+        'discussions_count': discussions_count,
+        'comments_count': comments_count,
+        'total_posts': evaluations_count + discussions_count + comments_count,
+        'likes_received': stats.likes_received if stats else 0
+    }
+
+
+def rebuild_user_stats():
+    """
+    根据评价、评论、点赞表全量重建用户统计（用于已有数据的初始化或校正）
+
+    Returns:
+        int: 重建的用户统计行数
+    """
+    counts = {}
+
+    def add(rows, name):
+        for user_id, count in rows:
+            if user_id is not None:
+                counts.setdefault(user_id, {})[name] = counts.get(user_id, {}).get(name, 0) + (count or 0)
+
+    add(db.session.query(Evaluation.user_id, func.count(Evaluation.id))
+        .group_by(Evaluation.user_id), 'evaluation_count')
+    add(db.session.query(Comment.user_id, func.count(Comment.id))
+        .filter(Comment.parent_id.is_(None)).group_by(Comment.user_id), 'discussion_count')
+    add(db.session.query(Comment.user_id, func.count(Comment.id))
+        .filter(Comment.parent_id.isnot(None)).group_by(Comment.user_id), 'reply_count')
+    add(db.session.query(Evaluation.user_id, func.count(Like.id)).join(
+        Like, (Like.target_type == 'evaluation') & (Like.target_id == Evaluation.id)
+    ).group_by(Evaluation.user_id), 'likes_received')
+    add(db.session.query(Comment.user_id, func.count(Like.id)).join(
+        Like, (Like.target_type == 'comment') & (Like.target_id == Comment.id)
+    ).group_by(Comment.user_id), 'likes_received')
+
+    now = datetime.utcnow()
+    mappings = []
+    for (user_id,) in db.session.query(User.id):
+        user_counts = counts.get(user_id, {})
+        mapping = {name: user_counts.get(name, 0) for name in COUNTERS}
+        mapping.update(user_id=user_id, updated_at=now)
+        mappings.append(mapping)
+
+    UserStats.query.delete()
+    db.session.bulk_insert_mappings(UserStats, mappings)
+    db.session.commit()
+    return len(mappings)
@@ -0,0 +1,226 @@
+"""
+微信 code2session 客户端
+
+登录接口通过这里调用微信的 jscode2session：
+- 进程内共享一个 requests.Session，复用 keep-alive 连接，连接池大小可配置
+- 连接/读取超时分别设置，整个调用（含重试和退避）另有总时限，不超过原先单次请求的5秒超时
+- 连接失败、5xx 和微信"系统繁忙"（errcode -1）时带随机抖动的指数退避重试；
+  读取超时等请求可能已送达微信的错误不重试（js_code 只能使用一次，重发只会得到 code 已使用），
+  code 无效等业务错误也不重试
+- 熔断器：连续失败达到阈值后在一段时间内直接失败，不再占用 worker 等待超时，
+  冷却后放行一次试探请求，成功即恢复
+
+配置项（环境变量）：
+    WECHAT_API_URL            code2session 地址，压测或测试时可指向本地假服务（见 fake_wechat_server.py）
+    WECHAT_CONNECT_TIMEOUT    连接超时秒数，默认1
+    WECHAT_READ_TIMEOUT       读取超时秒数，默认2
+    WECHAT_MAX_RETRIES        失败后的重试次数，默认2
+    WECHAT_DEADLINE           整个调用的总时限秒数，默认5
+    WECHAT_POOL_SIZE          连接池大小，默认20
+    WECHAT_BREAKER_THRESHOLD  触发熔断的连续失败次数，默认5
+    WECHAT_BREAKER_RESET      熔断后的冷却秒数，默认30
+"""
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_API_URL = 'https://api.weixin.qq.com/sns/jscode2session'
+
+# 微信返回的可重试错误码：-1 系统繁忙
+RETRYABLE_ERRCODES = {-1}
+
+
+class WechatUnavailableError(Exception):
+    """微信接口暂不可用（熔断中或重试后仍失败）"""
+
+
+class CircuitBreaker:
+    """连续失败计数熔断器，线程安全"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """是否允许发出请求；冷却结束后只放行一个试探请求"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.time() - self._opened_at < self.reset_timeout:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.time()
+            self._probing = False
+
+    def end_probe(self):
+        """请求结束（包括异常退出）时释放试探名额，避免半开状态卡住"""
+        with self._lock:
+            self._probing = False
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None
+
+
+class WechatClient:
+    """微信 jscode2session 客户端，一个进程共享一个实例"""
+
+    def __init__(self, appid, secret, api_url=DEFAULT_API_URL, connect_timeout=1.0, read_timeout=2.0,
+                 max_retries=2, backoff=0.1, deadline=5.0, pool_size=20, breaker=None):
+        self.appid = appid
+        self.secret = secret
+        self.api_url = api_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        # 重试由本类控制（带抖动且区分错误类型），适配器本身不重试
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            appid=os.getenv('WECHAT_APPID', ''),
+            secret=os.getenv('WECHAT_SECRET', ''),
+            api_url=os.getenv('WECHAT_API_URL') or DEFAULT_API_URL,
+            connect_timeout=float(os.getenv('WECHAT_CONNECT_TIMEOUT', 1)),
+            read_timeout=float(os.getenv('WECHAT_READ_TIMEOUT', 2)),
+            max_retries=int(os.getenv('WECHAT_MAX_RETRIES', 2)),
+            deadline=float(os.getenv('WECHAT_DEADLINE', 5)),
+            pool_size=int(os.getenv('WECHAT_POOL_SIZE', 20)),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv('WECHAT_BREAKER_THRESHOLD', 5)),
+                reset_timeout=float(os.getenv('WECHAT_BREAKER_RESET', 30))
+            )
+        )
+
+    def _sleep_before_retry(self, attempt, deadline):
+        """
+        全抖动指数退避，避免大量登录请求同时重试
+
+        Returns:
+            bool: 退避后是否还有时间发出下一次请求
+        """
+        delay = random.uniform(0, self.backoff * (2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return False
+        time.sleep(delay)
+        return True
+
+    def _attempt_timeout(self, deadline):
+        """本次请求的 (连接, 读取) 超时，不超过总时限的剩余时间；总时限已到时返回None"""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        return min(self.timeout[0], remaining), min(self.timeout[1], remaining)
+
+    def code2session(self, code):
+        """
+        用登录 code 换取 openid
+
+        Returns:
+            dict: 微信返回的结果（含 openid、session_key）；code 无效等业务错误时返回None
+
+        Raises:
+            WechatUnavailableError: 熔断中，网络错误/微信繁忙重试后仍失败，或请求可能已送达但未得到结果
+        """
+        if not self.breaker.allow():
+            raise WechatUnavailableError('微信接口熔断中')
+        try:
+            return self._code2session(code)
+        finally:
+            self.breaker.end_probe()
+
+    def _code2session(self, code):
+        """code2session 的请求与重试，结果计入熔断器"""
+        params = {
+            'appid': self.appid,
+            'secret': self.secret,
+            'js_code': code,
+            'grant_type': 'authorization_code'
+        }
+        deadline = time.monotonic() + self.deadline
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt and not self._sleep_before_retry(attempt - 1, deadline):
+                break
+            timeout = self._attempt_timeout(deadline)
+            if timeout is None:
+                last_error = last_error or '超过总时限'
+                break
+            try:
+                response = self.session.get(self.api_url, params=params, timeout=timeout)
+            except requests.ConnectionError as e:
+                # 连接未建立（含连接超时），请求没有发出，可以重试
+                last_error = e
+                continue
+            except requests.RequestException as e:
+                # 读取超时等：微信可能已消费该 code，不重试
+                last_error = e
+                break
+            if response.status_code >= 500:
+                last_error = f'HTTP {response.status_code}'
+                continue
+            try:
+                result = response.json()
+            except ValueError as e:
+                last_error = e
+                break
+            if not isinstance(result, dict):
+                last_error = f'无法解析的响应: {result!r}'
+                break
+
+            if 'openid' in result:
+                self.breaker.record_success()
+                return result
+            if result.get('errcode') in RETRYABLE_ERRCODES:
+                last_error = result
+                continue
+
+            # code 无效、已使用等业务错误：微信服务本身正常
+            self.breaker.record_success()
+            print(f"微信API错误: {result}")
+            return None
+
+        self.breaker.record_failure()
+        print(f"请求微信API失败: {last_error}")
+        raise WechatUnavailableError(str(last_error))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_wechat_client():
+    """获取进程内共享的客户端（首次调用时按环境变量创建，gunicorn fork 后各 worker 各自创建）"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WechatClient.from_env()
+    return _client
@@ -0,0 +1,218 @@
+"""
+接口压测脚本
+
+对本地运行的后端按场景逐个压测：每个场景以固定并发持续请求一段时间，
+统计 p50/p95/p99 延迟、吞吐量和错误数，结果以 JSON 输出，便于对比改动前后的数据。
+
+先准备数据并启动服务（建议关闭 debug 模式，并使用与线上一致的缓存配置）：
+    DATABASE_URL=sqlite:////tmp/bench.db python data/generate_data.py --scale 0.1
+    DATABASE_URL=sqlite:////tmp/bench.db python run.py
+
+再运行压测：
+    python benchmark.py --concurrency 16 --duration 20 --output before.json
+    python benchmark.py --scenarios courses_score_desc,rankings_courses --duration 10
+
+点赞场景需要登录，脚本用 SECRET_KEY 为 --users 范围内的用户签发 token，需与服务端的 SECRET_KEY 一致。
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import jwt
+import requests
+from dotenv import load_dotenv
+
+# 场景名 -> (方法, 路径模板, 查询参数, 是否需要登录)
+# 路径中的 {course_id} / {evaluation_id} / {discussion_id} 每次请求从启动时采集的ID中随机选取
+SCENARIOS = {
+    'courses_default': ('GET', '/api/courses', {}, False),
+    'courses_score_desc': ('GET', '/api/courses', {'sort_by': 'score_desc'}, False),
+    'courses_score_asc': ('GET', '/api/courses', {'sort_by': 'score_asc'}, False),
+    'courses_comments_desc': ('GET', '/api/courses', {'sort_by': 'comments_desc'}, False),
+    'courses_name': ('GET', '/api/courses', {'sort_by': 'name'}, False),
+    'courses_cursor': ('GET', '/api/courses', {'cursor': ''}, False),
+    'courses_keyword': ('GET', '/api/courses', {'keyword': '数据'}, False),
+    'course_detail': ('GET', '/api/courses/{course_id}', {}, False),
+    'rankings': ('GET', '/api/rankings', {}, False),
+    'rankings_courses': ('GET', '/api/rankings/courses', {}, False),
+    'rankings_teachers': ('GET', '/api/rankings/teachers', {}, False),
+    'rankings_departments': ('GET', '/api/rankings/departments', {}, False),
+    'rankings_tags': ('GET', '/api/rankings/tags', {}, False),
+    'evaluations_by_likes': ('GET', '/api/evaluations', {'course_id': '{course_id}', 'sort_by': 'likes'}, True),
+    'discussions': ('GET', '/api/discussions', {}, True),
+    'discussion_detail': ('GET', '/api/discussions/{discussion_id}', {}, True),
+    'evaluation_like': ('POST', '/api/evaluations/{evaluation_id}/like', {}, True),
+    'discussion_like': ('POST', '/api/discussions/{discussion_id}/like', {}, True),
+}
+
+
+def percentile(sorted_values, p):
+    """最近秩法百分位数"""
+    if not sorted_values:
+        return None
+    rank = math.ceil(p / 100.0 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def parse_user_range(value):
+    start, _, end = value.partition('-')
+    return list(range(int(start), int(end or start) + 1))
+
+
+class Benchmark:
+    def __init__(self, base_url, concurrency, duration, warmup, tokens):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.tokens = tokens
+        self.ids = {}
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        # 每个线程一个 Session，复用 keep-alive 连接
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def discover_ids(self):
+        """从列表接口采集压测用的课程、评价和讨论ID"""
+        evaluations = requests.get(self.base_url + '/api/evaluations',
+                                   params={'cursor': '', 'per_page': 100, 'sort_by': 'likes'}).json()
+        discussions = requests.get(self.base_url + '/api/discussions',
+                                   params={'cursor': '', 'page_size': 100}).json()
+        courses = requests.get(self.base_url + '/api/courses',
+                               params={'cursor': '', 'per_page': 100, 'sort_by': 'comments_desc'}).json()
+        self.ids = {
+            'course_id': [course['id'] for course in courses.get('courses', [])],
+            'evaluation_id': [evaluation['id'] for evaluation in evaluations.get('evaluations', [])],
+            'discussion_id': [discussion['id'] for discussion in discussions.get('discussions', [])],
+        }
+        missing = [name for name, values in self.ids.items() if not values]
+        if missing:
+            raise SystemExit('✗ 未采集到 %s，请先导入数据' % ', '.join(missing))
+
+    def build_request(self, scenario):
+        method, path, params, auth = SCENARIOS[scenario]
+        values = {name: random.choice(ids) for name, ids in self.ids.items()}
+        url = self.base_url + path.format(**values)
+        params = {key: value.format(**values) for key, value in params.items()}
+        headers = {'Authorization': 'Bearer ' + random.choice(self.tokens)} if auth and self.tokens else {}
+        return method, url, params, headers
+
+    def request_once(self, scenario):
+        method, url, params, headers = self.build_request(scenario)
+        started = time.perf_counter()
+        try:
+            status = self.session.request(method, url, params=params, headers=headers, timeout=30).status_code
+        except requests.RequestException:
+            status = 'error'
+        return time.perf_counter() - started, status
+
+    def worker(self, scenario, deadline):
+        latencies = []
+        statuses = Counter()
+        while time.perf_counter() < deadline:
+            elapsed, status = self.request_once(scenario)
+            latencies.append(elapsed)
+            statuses[status] += 1
+        return latencies, statuses
+
+    def run_scenario(self, scenario):
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            # 预热：建立连接、填充缓存，不计入结果
+            if self.warmup:
+                list(pool.map(lambda _: self.request_once(scenario), range(self.warmup * self.concurrency)))
+
+            started = time.perf_counter()
+            deadline = started + self.duration
+            results = list(pool.map(lambda _: self.worker(scenario, deadline), range(self.concurrency)))
+            wall = time.perf_counter() - started
+
+        latencies = sorted(latency for worker_latencies, _ in results for latency in worker_latencies)
+        statuses = Counter()
+        for _, worker_statuses in results:
+            statuses.update(worker_statuses)
+        errors = sum(count for status, count in statuses.items() if status == 'error' or status >= 400)
+
+        def ms(value):
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            'method': SCENARIOS[scenario][0],
+            'path': SCENARIOS[scenario][1],
+            'params': SCENARIOS[scenario][2],
+            'requests': len(latencies),
+            'errors': errors,
+            'status_codes': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+            'throughput_rps': round(len(latencies) / wall, 2) if wall else None,
+            'latency_ms': {
+                'p50': ms(percentile(latencies, 50)),
+                'p95': ms(percentile(latencies, 95)),
+                'p99': ms(percentile(latencies, 99)),
+                'mean': ms(sum(latencies) / len(latencies)) if latencies else None,
+                'max': ms(latencies[-1]) if latencies else None,
+            },
+        }
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='接口压测')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5001')
+    parser.add_argument('--concurrency', type=int, default=8, help='并发线程数')
+    parser.add_argument('--duration', type=float, default=15, help='每个场景持续的秒数')
+    parser.add_argument('--warmup', type=int, default=2, help='每个线程的预热请求数')
+    parser.add_argument('--scenarios', help='逗号分隔的场景名，默认全部：' + ','.join(SCENARIOS))
+    parser.add_argument('--users', default='1-100', help='点赞等需要登录的场景使用的用户ID范围')
+    parser.add_argument('--secret-key', default=os.getenv('SECRET_KEY', 'default_secret_key'),
+                        help='签发token的密钥，需与服务端一致')
+    parser.add_argument('--output', help='结果JSON的写入路径，默认输出到标准输出')
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error('未知场景: %s' % ', '.join(unknown))
+
+    expires = datetime.utcnow() + timedelta(hours=12)
+    tokens = [jwt.encode({'user_id': user_id, 'exp': expires}, args.secret_key, algorithm='HS256')
+              for user_id in parse_user_range(args.users)]
+
+    benchmark = Benchmark(args.base_url, args.concurrency, args.duration, args.warmup, tokens)
+    benchmark.discover_ids()
+
+    report = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'base_url': args.base_url,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'scenarios': {},
+    }
+    for name in scenarios:
+        result = benchmark.run_scenario(name)
+        report['scenarios'][name] = result
+        latency = result['latency_ms']
+        print(f"✓ {name}: {result['throughput_rps']} req/s, p50 {latency['p50']}ms, "
+              f"p95 {latency['p95']}ms, p99 {latency['p99']}ms, 错误 {result['errors']}", file=sys.stderr)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        print(f"✓ 结果已写入 {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
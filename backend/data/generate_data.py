@@ -0,0 +1,365 @@
+"""
+大规模模拟数据生成脚本（用于压测和性能对比）
+
+按参数生成指定数量的教师、课程、用户、评价、讨论/回复和点赞，数据分布带有偏斜：
+课程热度、学院规模、评价和评论收到的点赞数都服从 Zipf 分布（少数热门对象占据大部分数据），
+讨论下的回复按分支过程生成，少数讨论形成很深的回复链。
+
+所有数据以 executemany 批量插入，主键在脚本中预先分配，冗余列（点赞数、评论路径）直接写入，
+最后调用各重建函数生成课程统计、标签索引和用户统计。数据追加在现有数据之后，不会删除已有数据。
+
+示例：
+    # 完整规模：5万课程、2千教师、100万评价、200万点赞
+    DATABASE_URL=sqlite:////tmp/bench.db python data/generate_data.py
+    # 按比例缩小到1%
+    DATABASE_URL=sqlite:////tmp/bench.db python data/generate_data.py --scale 0.01
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, text
+from app import create_app, db
+from app.models import User, Teacher, Course, Evaluation, Comment, Like
+from app.utils.comments import path_segment
+from app.utils.search import search_index
+from app.utils.stats import rebuild_course_stats
+from app.utils.tags import rebuild_evaluation_tags
+from app.utils.user_stats import rebuild_user_stats
+
+DEPARTMENTS = [
+    '计算机与人工智能学院', '数学与统计学院', '物理学院', '化学学院', '生命科学学院', '经济学院', '商学院',
+    '法学院', '外国语学院', '文学院', '历史学院', '哲学学院', '新闻传播学院', '艺术学院', '医学院',
+    '机械工程学院', '电子信息学院', '土木工程学院', '环境学院', '马克思主义学院',
+]
+TITLES = ['教授', '副教授', '讲师', '助教']
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何林高罗郑梁谢宋唐许韩冯邓曹彭曾肖田董潘袁蔡蒋余于杜叶程魏苏吕丁任沈'
+GIVEN_NAMES = '伟芳娜敏静丽强磊洋艳勇军杰娟涛明超秀霞平刚桂英华玉兰萍红鹏辉建国志宇浩然子轩雨欣思远晨阳'
+SUBJECTS = [
+    '数据结构', '操作系统', '线性代数', '高等数学', '概率论', '大学物理', '有机化学', '细胞生物学', '微观经济学',
+    '宏观经济学', '市场营销', '会计学原理', '民法总论', '刑法学', '大学英语', '中国古代文学', '世界近代史',
+    '伦理学', '新闻写作', '素描基础', '人体解剖学', '机械设计', '电路分析', '结构力学', '环境科学概论', '思想政治理论',
+]
+LEVELS = ['导论', '原理', '基础', '进阶', '专题', '实践', '研讨']
+SEMESTERS = ['2021春', '2021秋', '2022春', '2022秋', '2023春', '2023秋', '2024春', '2024秋']
+# 标签按列表顺序由常见到少见
+TAG_POOL = ['干货', '实用', '易懂', '收获大', '给分好', '作业多', '有挑战', '有趣', '点名', '难', '互动多',
+            '案例丰富', '理论性强', '需要时间', '氛围好', '考试难', '水课', '推荐']
+
+# 默认规模（--scale 按比例缩放全部数量）
+DEFAULT_VOLUMES = {
+    'teachers': 2000,
+    'courses': 50000,
+    'users': 200000,
+    'evaluations': 1000000,
+    'comments': 500000,
+    'likes': 2000000,
+}
+
+
+def zipf_cum_weights(n, skew, rng):
+    """
+    n 个对象的 Zipf 累积权重，供 rng.choices(cum_weights=...) 使用
+
+    名次随机分配给对象，热门对象不会集中在小ID上
+    """
+    ranks = list(range(1, n + 1))
+    rng.shuffle(ranks)
+    return list(itertools.accumulate(1.0 / rank ** skew for rank in ranks))
+
+
+def skewed_counts(total, n, skew, rng):
+    """把 total 个事件按 Zipf 分布分配给 n 个对象，返回每个对象分到的数量列表"""
+    if n <= 0 or total <= 0:
+        return [0] * max(n, 0)
+    counter = Counter(rng.choices(range(n), cum_weights=zipf_cum_weights(n, skew, rng), k=total))
+    return [counter.get(i, 0) for i in range(n)]
+
+
+def next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def random_time(rng, now, days):
+    return now - timedelta(seconds=rng.randint(0, days * 86400))
+
+
+class Generator:
+    def __init__(self, volumes, skew=1.1, max_depth=8, batch_size=5000, days=730, seed=2024):
+        self.volumes = volumes
+        self.skew = skew
+        self.max_depth = max_depth
+        self.batch_size = batch_size
+        self.days = days
+        self.rng = random.Random(seed)
+        self.now = datetime.utcnow()
+
+    def insert(self, model, rows):
+        """按批执行 executemany 插入，每批提交一次"""
+        for start in range(0, len(rows), self.batch_size):
+            db.session.execute(model.__table__.insert(), rows[start:start + self.batch_size])
+            db.session.commit()
+
+    def stream(self, model, rows):
+        """边生成边插入，不在内存中保留全部行"""
+        batch = []
+        count = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self.insert(model, batch)
+                count += len(batch)
+                batch = []
+        self.insert(model, batch)
+        return count + len(batch)
+
+    def nickname(self, user_id):
+        return '用户%d' % user_id
+
+    def generate_teachers(self):
+        rng = self.rng
+        self.teacher_start = next_id(Teacher)
+        department_weights = zipf_cum_weights(len(DEPARTMENTS), 0.8, rng)
+        rows = []
+        for i in range(self.volumes['teachers']):
+            rows.append({
+                'id': self.teacher_start + i,
+                'name': rng.choice(SURNAMES) + ''.join(rng.sample(GIVEN_NAMES, rng.randint(1, 2))),
+                'department': rng.choices(DEPARTMENTS, cum_weights=department_weights)[0],
+                'title': rng.choices(TITLES, weights=[3, 4, 5, 1])[0],
+                'introduction': '从事相关领域教学与研究工作%d年' % rng.randint(1, 35),
+                'created_at': random_time(rng, self.now, self.days),
+            })
+        self.insert(Teacher, rows)
+        return len(rows)
+
+    def generate_courses(self):
+        rng = self.rng
+        self.course_start = next_id(Course)
+        n = self.volumes['courses']
+        # 每位教师开设的课程数量也有偏斜
+        teacher_weights = zipf_cum_weights(self.volumes['teachers'], 0.7, rng)
+        teacher_ids = rng.choices(range(self.volumes['teachers']), cum_weights=teacher_weights, k=n)
+        rows = []
+        for i in range(n):
+            course_id = self.course_start + i
+            rows.append({
+                'id': course_id,
+                'course_code': 'GEN%07d' % course_id,
+                'name': '%s%s' % (rng.choice(SUBJECTS), rng.choice(LEVELS)),
+                'description': '课程简介 %d' % course_id,
+                'credit': rng.choice([1, 1.5, 2, 2.5, 3, 4]),
+                'semester': rng.choice(SEMESTERS),
+                'teacher_id': self.teacher_start + teacher_ids[i],
+                'created_at': random_time(rng, self.now, self.days),
+            })
+        self.insert(Course, rows)
+        return n
+
+    def generate_users(self):
+        self.user_start = next_id(User)
+        rng = self.rng
+
+        def rows():
+            for i in range(self.volumes['users']):
+                user_id = self.user_start + i
+                yield {
+                    'id': user_id,
+                    'openid': 'gen_openid_%d_%d' % (self.user_start, i),
+                    'nickname': self.nickname(user_id),
+                    'avatar_url': 'https://example.com/avatar/%d.jpg' % user_id,
+                    'created_at': random_time(rng, self.now, self.days),
+                }
+        return self.stream(User, rows())
+
+    def generate_evaluations(self):
+        rng = self.rng
+        n_users = self.volumes['users']
+        n_courses = self.volumes['courses']
+        self.evaluation_start = next_id(Evaluation)
+
+        # 热门课程的评价多；同一用户对同一课程只评价一次，因此每门课的评价数不超过用户数
+        per_course = [min(count, n_users) for count in
+                      skewed_counts(self.volumes['evaluations'], n_courses, self.skew, rng)]
+        raters = {i: rng.sample(range(n_users), count) for i, count in enumerate(per_course) if count}
+        # 打乱课程顺序，使评价ID与课程无关
+        course_order = [i for i, count in enumerate(per_course) for _ in range(count)]
+        rng.shuffle(course_order)
+        self.evaluation_count = len(course_order)
+        likes = self.like_counts['evaluation']
+        tag_weights = zipf_cum_weights(len(TAG_POOL), 1.0, random.Random(0))
+
+        def rows():
+            for i, course_index in enumerate(course_order):
+                user_id = self.user_start + raters[course_index].pop()
+                anonymous = rng.random() < 0.15
+                # 评分偏向高分
+                score = rng.choices([1, 2, 3, 3.5, 4, 4.5, 5], weights=[2, 3, 8, 10, 20, 25, 32])[0]
+                tags = []
+                for tag in rng.choices(TAG_POOL, cum_weights=tag_weights, k=rng.randint(0, 3)):
+                    if tag not in tags:
+                        tags.append(tag)
+                yield {
+                    'id': self.evaluation_start + i,
+                    'course_id': self.course_start + course_index,
+                    'user_id': user_id,
+                    'score': score,
+                    'workload_score': rng.randint(1, 5),
+                    'content_score': max(1, min(5, round(score + rng.uniform(-1, 1)))),
+                    'teaching_score': max(1, min(5, round(score + rng.uniform(-1, 1)))),
+                    'tags': ','.join(tags),
+                    'comment': '评价内容 %d' % (self.evaluation_start + i),
+                    'is_anonymous': anonymous,
+                    'user_name': '匿名用户' if anonymous else self.nickname(user_id),
+                    'likes_count': likes[i] if i < len(likes) else 0,
+                    'created_at': random_time(rng, self.now, self.days),
+                }
+        return self.stream(Evaluation, rows())
+
+    def generate_comments(self):
+        """
+        生成讨论及回复树：讨论按课程热度分布；每条讨论的直接回复数服从均值3的几何分布，
+        更深层级的平均回复数小于1（分支过程），多数回复链很短，少数可达 max_depth 层
+        """
+        rng = self.rng
+        n_users = self.volumes['users']
+        total = self.volumes['comments']
+        self.comment_start = next_id(Comment)
+        course_weights = zipf_cum_weights(self.volumes['courses'], self.skew, rng)
+        likes = self.like_counts['comment']
+
+        def children_count(depth):
+            mean = 3.0 if depth == 0 else 0.9
+            # 几何分布：P(k) = (1-p)^k * p，均值为 (1-p)/p
+            p = 1.0 / (1.0 + mean)
+            count = 0
+            while rng.random() > p:
+                count += 1
+            return count
+
+        def rows():
+            emitted = 0
+            while emitted < total:
+                course_id = self.course_start + rng.choices(range(self.volumes['courses']),
+                                                            cum_weights=course_weights)[0]
+                created_at = random_time(rng, self.now, self.days)
+                # (父评论ID, 父评论路径, 深度, 父评论时间)，None 表示讨论本身
+                stack = [(None, '', 0, created_at)]
+                while stack and emitted < total:
+                    parent_id, parent_path, depth, parent_time = stack.pop()
+                    comment_id = self.comment_start + emitted
+                    user_id = self.user_start + rng.randrange(n_users)
+                    created_at = parent_time + timedelta(minutes=rng.randint(1, 60 * 24)) if parent_id else parent_time
+                    path = parent_path + path_segment(comment_id)
+                    yield {
+                        'id': comment_id,
+                        'course_id': course_id,
+                        'user_id': user_id,
+                        'user_name': self.nickname(user_id),
+                        'content': ('讨论 %d' if parent_id is None else '回复 %d') % comment_id,
+                        'parent_id': parent_id,
+                        'path': path,
+                        'likes_count': likes[emitted] if emitted < len(likes) else 0,
+                        'created_at': created_at,
+                    }
+                    emitted += 1
+                    if depth < self.max_depth:
+                        for _ in range(children_count(depth)):
+                            stack.append((comment_id, path, depth + 1, created_at))
+        return self.stream(Comment, rows())
+
+    def plan_likes(self):
+        """预先按 Zipf 分布把点赞分配给评价和评论（评价约占七成），写入行时直接带上点赞数"""
+        rng = self.rng
+        n_users = self.volumes['users']
+        total = self.volumes['likes']
+        evaluation_likes = int(total * 0.7)
+        self.like_counts = {
+            'evaluation': [min(count, n_users) for count in
+                           skewed_counts(evaluation_likes, self.volumes['evaluations'], self.skew, rng)],
+            'comment': [min(count, n_users) for count in
+                        skewed_counts(total - evaluation_likes, self.volumes['comments'], self.skew, rng)],
+        }
+
+    def generate_likes(self):
+        rng = self.rng
+        n_users = self.volumes['users']
+        targets = {
+            'evaluation': (self.evaluation_start, self.evaluation_count),
+            'comment': (self.comment_start, self.volumes['comments']),
+        }
+
+        def rows():
+            for target_type, (start, count) in targets.items():
+                for i, like_count in enumerate(self.like_counts[target_type][:count]):
+                    # 同一用户对同一目标只点赞一次
+                    for user_index in rng.sample(range(n_users), like_count):
+                        yield {
+                            'user_id': self.user_start + user_index,
+                            'target_type': target_type,
+                            'target_id': start + i,
+                            'created_at': random_time(rng, self.now, self.days),
+                        }
+        return self.stream(Like, rows())
+
+    def run(self):
+        if db.engine.dialect.name == 'sqlite':
+            # 批量导入期间放宽SQLite的落盘要求，导入速度可提升数倍
+            db.session.execute(text('PRAGMA synchronous=OFF'))
+            db.session.execute(text('PRAGMA journal_mode=MEMORY'))
+
+        self.plan_likes()
+        steps = [
+            ('教师', self.generate_teachers),
+            ('课程', self.generate_courses),
+            ('用户', self.generate_users),
+            ('评价', self.generate_evaluations),
+            ('讨论和回复', self.generate_comments),
+            ('点赞', self.generate_likes),
+        ]
+        for name, step in steps:
+            started = time.time()
+            count = step()
+            print(f"✓ 生成{name} {count} 条，耗时 {time.time() - started:.1f}s")
+
+        started = time.time()
+        rebuild_course_stats()
+        rebuild_evaluation_tags()
+        rebuild_user_stats()
+        search_index.rebuild(self.batch_size)
+        print(f"✓ 重建课程统计、标签索引、用户统计和搜索索引，耗时 {time.time() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成大规模模拟数据')
+    parser.add_argument('--scale', type=float, default=1.0, help='按比例缩放全部默认数量')
+    for name, default in DEFAULT_VOLUMES.items():
+        parser.add_argument('--' + name, type=int, help='%s数量（默认 %d × scale）' % (name, default))
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf 偏斜指数，越大热门对象越集中')
+    parser.add_argument('--max-depth', type=int, default=8, help='回复树的最大深度')
+    parser.add_argument('--days', type=int, default=730, help='数据创建时间分布在最近多少天内')
+    parser.add_argument('--batch-size', type=int, default=5000, help='每批插入的行数')
+    parser.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args()
+
+    volumes = {}
+    for name, default in DEFAULT_VOLUMES.items():
+        value = getattr(args, name)
+        volumes[name] = value if value is not None else max(1, int(default * args.scale))
+
+    app = create_app()
+    with app.app_context():
+        started = time.time()
+        Generator(volumes, skew=args.skew, max_depth=args.max_depth, batch_size=args.batch_size,
+                  days=args.days, seed=args.seed).run()
+        print(f"✓ 数据生成完成，总耗时 {time.time() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
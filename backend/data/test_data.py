@@ -1,15 +1,22 @@
-import sys
+import argparse
 import os
+import random
+import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.models import db, User, Teacher, Course, Evaluation, Comment, Like
 from app import create_app
+from app.utils.comments import rebuild_comment_paths
+from app.utils.likes import reconcile_likes_count
+from app.utils.search import search_index
+from app.utils.stats import rebuild_course_stats
+from app.utils.suggest import suggest_index
+from app.utils.tags import rebuild_evaluation_tags
+from app.utils.user_stats import rebuild_user_stats
 
-# 创建应用实例
-app = create_app()
 
-# 在应用上下文中导入数据
-with app.app_context():
+def import_base_data():
+    """导入基础演示数据，返回各类数据的导入数量"""
     # 创建用户数据
     users = [
         User(openid='test_openid_001', nickname='小明', avatar_url='https://example.com/avatar1.jpg'),
@@ -146,10 +153,131 @@ with app.app_context():
     db.session.add_all(likes)
     db.session.commit()
 
-    print("测试数据导入成功！")
-    print(f"导入用户数量: {len(users)}")
-    print(f"导入教师数量: {len(teachers)}")
-    print(f"导入课程数量: {len(courses)}")
-    print(f"导入评价数量: {len(evaluations)}")
-    print(f"导入评论数量: {len(comments)}")
-    print(f"导入点赞数量: {len(likes)}")
\ No newline at end of file
+    return {'用户': len(users), '教师': len(teachers), '课程': len(courses),
+            '评价': len(evaluations), '评论': len(comments), '点赞': len(likes)}
+
+
+# 中等规模数据使用的文本素材
+SEMESTERS = ['2022春', '2022秋', '2023春', '2023秋', '2024春']
+TAG_POOL = ['干货', '易懂', '收获大', '作业多', '实用', '有挑战', '给分好', '点名', '有趣', '难', '互动多', '案例丰富']
+
+
+def import_medium_data(user_count=40, courses_per_teacher=5, seed=2024):
+    """
+    在基础数据之上追加中等规模的数据（用于接口查询次数回归测试和本地调试）
+
+    每个列表接口都能翻出多页：课程、评价、讨论和用户的评价/讨论都多于一页，
+    讨论 1 带有多于一页的直接回复，回复下还有多层嵌套回复，评价和评论都有点赞。
+    同一 seed 生成的数据完全相同。
+    """
+    rng = random.Random(seed)
+
+    users = [User(openid='medium_openid_%03d' % i, nickname='用户%d' % i,
+                  avatar_url='https://example.com/avatar_m%d.jpg' % i)
+             for i in range(user_count)]
+    db.session.add_all(users)
+    db.session.commit()
+    all_users = User.query.order_by(User.id).all()
+
+    courses = []
+    for teacher in Teacher.query.order_by(Teacher.id).all():
+        for i in range(courses_per_teacher):
+            n = len(courses) + 1
+            courses.append(Course(course_code='MED%03d' % n, name='%s专题%d' % (teacher.department, n),
+                                  description='%s老师的第%d门专题课' % (teacher.name, i + 1),
+                                  credit=rng.choice([1, 2, 3, 4]), semester=rng.choice(SEMESTERS),
+                                  teacher_id=teacher.id))
+    db.session.add_all(courses)
+    db.session.commit()
+    all_courses = Course.query.order_by(Course.id).all()
+
+    # 每个用户评价约一半的课程；1号用户评价全部课程，保证其评价列表多于一页
+    evaluated = set(db.session.query(Evaluation.user_id, Evaluation.course_id))
+    evaluations = []
+    for user in all_users:
+        for course in all_courses:
+            if (user.id, course.id) in evaluated or (user.id != 1 and rng.random() < 0.5):
+                continue
+            anonymous = rng.random() < 0.2
+            evaluations.append(Evaluation(
+                course_id=course.id, user_id=user.id,
+                score=rng.choice([1, 2, 3, 3.5, 4, 4.5, 5]),
+                workload_score=rng.randint(1, 5), content_score=rng.randint(1, 5), teaching_score=rng.randint(1, 5),
+                tags=','.join(rng.sample(TAG_POOL, rng.randint(1, 3))),
+                comment='%s的评价：%s' % (user.nickname, course.name),
+                is_anonymous=anonymous, user_name='匿名用户' if anonymous else user.nickname))
+    db.session.add_all(evaluations)
+    db.session.commit()
+
+    # 每门课若干条讨论，讨论下有回复，部分回复下还有嵌套回复；1号用户发起约四分之一的讨论
+    comments = []
+    discussions = []
+    for course in all_courses:
+        for _ in range(rng.randint(1, 4)):
+            user = all_users[0] if rng.random() < 0.25 else rng.choice(all_users)
+            discussions.append(Comment(course_id=course.id, user_id=user.id, user_name=user.nickname,
+                                       content='%s的讨论：%s' % (user.nickname, course.name)))
+    db.session.add_all(discussions)
+    db.session.commit()
+    comments.extend(discussions)
+
+    # 讨论 1 的直接回复多于一页
+    parents = [(Comment.query.get(1), 25)] + [(discussion, rng.randint(0, 4)) for discussion in discussions]
+    for depth in range(3):
+        replies = []
+        for parent, count in parents:
+            for i in range(count):
+                user = rng.choice(all_users)
+                replies.append(Comment(course_id=parent.course_id, user_id=user.id, user_name=user.nickname,
+                                       content='%s的回复 %d' % (user.nickname, i + 1), parent_id=parent.id))
+        db.session.add_all(replies)
+        db.session.commit()
+        comments.extend(replies)
+        parents = [(reply, rng.randint(0, 2)) for reply in replies if rng.random() < 0.3]
+
+    liked = set(db.session.query(Like.user_id, Like.target_type, Like.target_id))
+    likes = []
+    targets = [('evaluation', evaluation.id) for evaluation in evaluations] + \
+              [('comment', comment.id) for comment in comments]
+    for target_type, target_id in targets:
+        for user in rng.sample(all_users, rng.randint(0, 3)):
+            if (user.id, target_type, target_id) not in liked:
+                liked.add((user.id, target_type, target_id))
+                likes.append(Like(user_id=user.id, target_type=target_type, target_id=target_id))
+    db.session.add_all(likes)
+    db.session.commit()
+
+    return {'用户': len(users), '教师': 0, '课程': len(courses),
+            '评价': len(evaluations), '评论': len(comments), '点赞': len(likes)}
+
+
+def rebuild_derived_data():
+    """批量导入的数据未经过接口写入，需重建课程评分统计、标签索引、评论路径、点赞计数、用户统计、课程搜索索引和输入联想索引"""
+    rebuild_course_stats()
+    rebuild_evaluation_tags()
+    rebuild_comment_paths()
+    reconcile_likes_count()
+    rebuild_user_stats()
+    search_index.rebuild()
+    suggest_index.rebuild()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='导入测试数据')
+    parser.add_argument('--medium', action='store_true', help='在基础数据之上追加中等规模数据')
+    args = parser.parse_args()
+
+    # 创建应用实例
+    app = create_app()
+
+    # 在应用上下文中导入数据
+    with app.app_context():
+        counts = import_base_data()
+        if args.medium:
+            for name, count in import_medium_data().items():
+                counts[name] += count
+        rebuild_derived_data()
+
+        print("测试数据导入成功！")
+        for name, count in counts.items():
+            print(f"导入{name}数量: {count}")
@@ -0,0 +1,75 @@
+"""
+本地假微信 code2session 服务，用于测试和登录压测
+
+启动后将后端的 WECHAT_API_URL 指向它，并配置任意非空的 WECHAT_APPID / WECHAT_SECRET：
+    python fake_wechat_server.py --port 9100 --latency 50
+    WECHAT_API_URL=http://127.0.0.1:9100/sns/jscode2session WECHAT_APPID=test WECHAT_SECRET=test python run.py
+
+同一个 code 总是返回同一个 openid；可通过参数模拟延迟、5xx 和微信"系统繁忙"，
+用于观察超时、重试和熔断的表现。code 以 invalid 开头时返回 40029（code无效）。
+"""
+import argparse
+import hashlib
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_handler(latency, error_rate, busy_rate):
+    class FakeWechatHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # 支持 keep-alive
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency / 1000.0)
+
+            if random.random() < error_rate:
+                self._send(502, {'errmsg': 'bad gateway'})
+                return
+            if random.random() < busy_rate:
+                self._send(200, {'errcode': -1, 'errmsg': 'system error'})
+                return
+
+            code = parse_qs(urlparse(self.path).query).get('js_code', [''])[0]
+            if not code or code.startswith('invalid'):
+                self._send(200, {'errcode': 40029, 'errmsg': 'invalid code'})
+                return
+
+            digest = hashlib.sha1(code.encode('utf-8')).hexdigest()
+            self._send(200, {'openid': 'fake_' + digest[:24], 'session_key': digest[24:]})
+
+        def _send(self, status, body):
+            raw = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeWechatHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地假微信 code2session 服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency', type=int, default=0, help='每个请求的延迟毫秒数')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回502的比例（0~1）')
+    parser.add_argument('--busy-rate', type=float, default=0.0, help='返回errcode -1（系统繁忙）的比例（0~1）')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port),
+                                 make_handler(args.latency, args.error_rate, args.busy_rate))
+    print(f"✓ 假微信服务已启动: http://{args.host}:{args.port}/sns/jscode2session")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""
+数据库迁移脚本：为comments表的parent_id字段添加索引
+
+讨论列表按父评论批量查询前几条回复和回复数量，需要该索引
+"""
+from app import create_app, db
+from sqlalchemy import text
+
+def migrate():
+    app = create_app()
+
+    with app.app_context():
+        try:
+            db.session.execute(text(
+                "CREATE INDEX ix_comments_parent_id ON comments (parent_id)"
+            ))
+            print("✓ 成功创建ix_comments_parent_id索引")
+        except Exception as e:
+            if "already exists" in str(e).lower() or "duplicate key name" in str(e).lower():
+                print("⚠ ix_comments_parent_id索引已存在，跳过")
+                db.session.rollback()
+            else:
+                print(f"✗ 创建索引失败: {e}")
+                raise
+
+        db.session.commit()
+        print("\n✓ 数据库迁移成功完成！")
+
+if __name__ == '__main__':
+    migrate()
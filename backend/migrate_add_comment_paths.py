@@ -0,0 +1,46 @@
+"""
+数据库迁移脚本：为comments表添加path物化路径字段，并根据parent_id回填
+"""
+from app import create_app, db
+from app.utils.comments import rebuild_comment_paths
+from sqlalchemy import text
+
+def migrate():
+    app = create_app()
+
+    with app.app_context():
+        try:
+            db.session.execute(text(
+                "ALTER TABLE comments ADD COLUMN path VARCHAR(512)"
+            ))
+            print("✓ 成功添加path字段")
+        except Exception as e:
+            if "duplicate column name" in str(e).lower() or "already exists" in str(e).lower():
+                print("⚠ path字段已存在，跳过")
+                db.session.rollback()
+            else:
+                print(f"✗ 添加path字段失败: {e}")
+                raise
+
+        try:
+            db.session.execute(text(
+                "CREATE INDEX ix_comments_path ON comments (path)"
+            ))
+            print("✓ 成功创建ix_comments_path索引")
+        except Exception as e:
+            if "already exists" in str(e).lower() or "duplicate key name" in str(e).lower():
+                print("⚠ ix_comments_path索引已存在，跳过")
+                db.session.rollback()
+            else:
+                print(f"✗ 创建索引失败: {e}")
+                raise
+
+        db.session.commit()
+
+        print("开始回填评论路径...")
+        count = rebuild_comment_paths()
+        print(f"✓ 已写入 {count} 条评论的路径")
+        print("\n✓ 数据库迁移成功完成！")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,19 @@
+"""
+数据库迁移脚本：创建 tags / evaluation_tags 标签索引表与 tag_stats 标签计数表，
+并从 evaluations.tags 字符串回填
+"""
+from app import create_app
+from app.utils.tags import rebuild_evaluation_tags
+
+def migrate():
+    # create_app 中的 db.create_all() 会创建尚不存在的 tags、evaluation_tags 与 tag_stats 表
+    app = create_app()
+
+    with app.app_context():
+        print("开始回填评价标签索引和标签计数...")
+        count = rebuild_evaluation_tags()
+        print(f"✓ 已写入 {count} 条评价-标签关联")
+        print("\n✓ 数据库迁移成功完成！")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,50 @@
+"""
+数据库迁移脚本：为evaluations和comments表添加likes_count点赞计数字段，
+并根据likes表回填
+"""
+from app import create_app, db
+from app.utils.likes import reconcile_likes_count
+from sqlalchemy import text
+
+def migrate():
+    app = create_app()
+
+    with app.app_context():
+        for table in ('evaluations', 'comments'):
+            try:
+                db.session.execute(text(
+                    f"ALTER TABLE {table} ADD COLUMN likes_count INTEGER NOT NULL DEFAULT 0"
+                ))
+                print(f"✓ 成功为{table}表添加likes_count字段")
+            except Exception as e:
+                if "duplicate column name" in str(e).lower() or "already exists" in str(e).lower():
+                    print(f"⚠ {table}表的likes_count字段已存在，跳过")
+                    db.session.rollback()
+                else:
+                    print(f"✗ 为{table}表添加likes_count字段失败: {e}")
+                    raise
+
+        try:
+            # 课程内按点赞数排序的索引
+            db.session.execute(text(
+                "CREATE INDEX ix_evaluations_course_likes ON evaluations (course_id, likes_count)"
+            ))
+            print("✓ 成功创建ix_evaluations_course_likes索引")
+        except Exception as e:
+            if "already exists" in str(e).lower() or "duplicate key name" in str(e).lower():
+                print("⚠ ix_evaluations_course_likes索引已存在，跳过")
+                db.session.rollback()
+            else:
+                print(f"✗ 创建索引失败: {e}")
+                raise
+
+        db.session.commit()
+
+        print("开始根据likes表回填点赞计数...")
+        fixed = reconcile_likes_count()
+        for target_type, count in fixed.items():
+            print(f"✓ {target_type}: 已回填 {count} 行")
+        print("\n✓ 数据库迁移成功完成！")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,36 @@
+"""
+数据库迁移脚本：为course_stats表添加评分分布的五档计数字段（score_1_count ~ score_5_count），
+并根据评价表重建课程评分统计
+"""
+from app import create_app, db
+from app.utils.stats import SCORE_BUCKETS, bucket_column, rebuild_course_stats
+from sqlalchemy import text
+
+def migrate():
+    app = create_app()
+
+    with app.app_context():
+        for star in sorted(SCORE_BUCKETS):
+            column = bucket_column(star)
+            try:
+                db.session.execute(text(
+                    f"ALTER TABLE course_stats ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"
+                ))
+                print(f"✓ 成功添加{column}字段")
+            except Exception as e:
+                if "duplicate column name" in str(e).lower() or "already exists" in str(e).lower():
+                    print(f"⚠ {column}字段已存在，跳过")
+                    db.session.rollback()
+                else:
+                    print(f"✗ 添加{column}字段失败: {e}")
+                    raise
+
+        db.session.commit()
+
+        print("开始根据评价表重建课程评分统计...")
+        count = rebuild_course_stats()
+        print(f"✓ 已重建 {count} 门课程的评分统计")
+        print("\n✓ 数据库迁移成功完成！")
+
+if __name__ == '__main__':
+    migrate()
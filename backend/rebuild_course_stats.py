@@ -0,0 +1,18 @@
+"""
+数据维护脚本：根据评价表重建课程评分统计（course_stats）及每日分桶（course_daily_stats）
+
+首次部署课程评分统计表，或统计数据与评价表不一致时运行
+"""
+from app import create_app
+from app.utils.stats import rebuild_course_stats
+
+def rebuild():
+    app = create_app()
+
+    with app.app_context():
+        print("开始重建课程评分统计...")
+        count = rebuild_course_stats()
+        print(f"✓ 已重建 {count} 门课程的评分统计")
+
+if __name__ == '__main__':
+    rebuild()
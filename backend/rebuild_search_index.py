@@ -0,0 +1,19 @@
+"""
+数据维护脚本：根据课程表和教师表重建课程搜索索引（course_search）
+
+首次部署搜索索引、切换 SEARCH_BACKEND，或直接修改数据库中的课程/教师数据后运行
+"""
+from app import create_app
+from app.utils.search import search_index
+
+def rebuild():
+    # create_app 中的 search_index.init_app() 会创建尚不存在的索引表
+    app = create_app()
+
+    with app.app_context():
+        print(f"开始重建课程搜索索引（{search_index.backend.name}）...")
+        count = search_index.rebuild()
+        print(f"✓ 已重建 {count} 门课程的搜索索引")
+
+if __name__ == '__main__':
+    rebuild()
@@ -0,0 +1,19 @@
+"""
+数据维护脚本：根据评价、评论、点赞表重建用户活动统计（user_stats）
+
+首次部署用户统计表，或统计数据与业务表不一致时运行
+"""
+from app import create_app
+from app.utils.user_stats import rebuild_user_stats
+
+def rebuild():
+    # create_app 中的 db.create_all() 会创建尚不存在的 user_stats 表
+    app = create_app()
+
+    with app.app_context():
+        print("开始重建用户活动统计...")
+        count = rebuild_user_stats()
+        print(f"✓ 已重建 {count} 个用户的活动统计")
+
+if __name__ == '__main__':
+    rebuild()
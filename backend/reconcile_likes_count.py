@@ -0,0 +1,20 @@
+"""
+数据维护脚本：根据likes表校正评价和评论的点赞计数（likes_count）
+
+点赞计数随点赞/取消点赞同步更新，正常情况下无需运行；
+可作为定期对账任务，或在手工修改likes表后运行
+"""
+from app import create_app
+from app.utils.likes import reconcile_likes_count
+
+def reconcile():
+    app = create_app()
+
+    with app.app_context():
+        print("开始校正点赞计数...")
+        fixed = reconcile_likes_count()
+        for target_type, count in fixed.items():
+            print(f"✓ {target_type}: 修正 {count} 行")
+
+if __name__ == '__main__':
+    reconcile()
@@ -0,0 +1,95 @@
+"""
+接口测试的公共夹具
+
+测试使用临时 SQLite 数据库，导入 data/test_data.py 的基础数据和中等规模数据。
+响应缓存和用户缓存关闭，每次请求的查询次数是确定的；STRICT_LOADING 开启，
+列表查询访问未声明加载策略的关系时直接报错。
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 需在导入 app 之前设置：部分配置在模块导入时读取，且 .env 不会覆盖已有的环境变量
+os.environ['SECRET_KEY'] = 'test_secret_key'
+os.environ['CACHE_BACKEND'] = 'none'
+os.environ['AUTH_USER_CACHE_TTL'] = '0'
+os.environ['STRICT_LOADING'] = '1'
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    os.environ['DATABASE_URL'] = 'sqlite:///%s' % (tmp_path_factory.mktemp('db') / 'test.db')
+
+    from app import create_app
+    from data.test_data import import_base_data, import_medium_data, rebuild_derived_data
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        import_base_data()
+        import_medium_data()
+        rebuild_derived_data()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers():
+    """1号用户的登录请求头"""
+    token = jwt.encode({'user_id': 1, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                       os.environ['SECRET_KEY'], algorithm='HS256')
+    return {'Authorization': 'Bearer ' + token}
+
+
+class QueryRecorder:
+    """记录数据库连接上执行的SQL语句"""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def reset(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def report(self):
+        return '\n'.join('%d. %s' % (i + 1, ' '.join(statement.split()))
+                         for i, statement in enumerate(self.statements))
+
+
+@pytest.fixture
+def queries(app):
+    """在 before_cursor_execute 事件上统计查询"""
+    from app import db
+
+    recorder = QueryRecorder()
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', recorder)
+    yield recorder
+    event.remove(engine, 'before_cursor_execute', recorder)
+
+
+@pytest.fixture
+def memory_cache(app, monkeypatch):
+    """在单个测试内启用进程内响应缓存"""
+    from app.utils.cache import MemoryBackend, cache
+
+    monkeypatch.setattr(cache, 'backend', MemoryBackend())
+    monkeypatch.setattr(cache, 'max_ttl', None)
+    return cache
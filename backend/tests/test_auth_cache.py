@@ -0,0 +1,86 @@
+"""
+登录态缓存测试
+
+测试默认关闭用户缓存（AUTH_USER_CACHE_TTL=0），这里按 app.config 开启后检查：
+缓存的 token 到期后返回401；用户缓存有上限，修改昵称后立即可见；
+同一请求内多次调用 get_current_user 只解析一次。
+"""
+import os
+import time
+
+import jwt
+import pytest
+
+from app.utils import auth
+from tests.test_counter_upsert import headers_for
+
+
+@pytest.fixture
+def user_cache(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'AUTH_USER_CACHE_TTL', 60)
+    monkeypatch.setitem(app.config, 'AUTH_USER_CACHE_SIZE', 2)
+    auth.init_app(app)
+    yield
+    monkeypatch.undo()
+    auth.init_app(app)
+
+
+def user_queries(queries):
+    return [statement for statement in queries.statements if 'FROM users' in statement]
+
+
+def test_cached_token_expires(client):
+    exp = int(time.time()) + 1
+    token = jwt.encode({'user_id': 1, 'exp': exp}, os.environ['SECRET_KEY'], algorithm='HS256')
+    headers = {'Authorization': 'Bearer ' + token}
+    assert client.get('/api/me', headers=headers).status_code == 200
+    assert client.get('/api/me', headers=headers).status_code == 200
+
+    # token 已在缓存中，到期后仍须拒绝
+    time.sleep(max(0, exp - time.time()) + 0.05)
+    assert client.get('/api/me', headers=headers).status_code == 401
+
+
+def test_cached_user_skips_query(client, queries, user_cache):
+    headers = headers_for(1)
+    assert client.get('/api/me', headers=headers).status_code == 200
+    queries.reset()
+    response = client.get('/api/me', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['id'] == 1
+    assert user_queries(queries) == [], queries.report()
+
+
+def test_user_cache_is_bounded(app, user_cache):
+    with app.app_context():
+        for user_id in (1, 2, 3):
+            auth._load_user(user_id)
+    assert len(auth._user_cache) == 2
+    assert auth._user_cache.get(1) is None
+    assert auth._user_cache.get(3)['id'] == 3
+
+
+def test_nickname_update_invalidates_cached_user(client, user_cache):
+    headers = headers_for(1)
+    nickname = client.get('/api/me', headers=headers).get_json()['nickname']
+    try:
+        response = client.put('/api/me/nickname', headers=headers, json={'nickname': '缓存测试昵称'})
+        assert response.status_code == 200
+        assert client.get('/api/me', headers=headers).get_json()['nickname'] == '缓存测试昵称'
+    finally:
+        client.put('/api/me/nickname', headers=headers, json={'nickname': nickname})
+    assert client.get('/api/me', headers=headers).get_json()['nickname'] == nickname
+
+
+def test_current_user_memoized_per_request(app, queries):
+    with app.test_request_context('/api/me', headers=headers_for(1)):
+        queries.reset()
+        user = auth.get_current_user()
+        assert user.id == 1
+        assert len(user_queries(queries)) == 1
+        assert auth.get_current_user() is user
+        assert len(user_queries(queries)) == 1, queries.report()
+
+    # 下一个请求重新解析
+    with app.test_request_context('/api/me', headers=headers_for(2)):
+        assert auth.get_current_user().id == 2
@@ -0,0 +1,231 @@
+"""
+响应缓存后端测试
+
+RedisBackend 用实现了所需命令的假客户端测试读写、按标签失效和过期时间；
+多 worker 使用进程内后端时缓存时间受限；stale-while-revalidate 缓存项失效后返回旧数据
+并只在后台刷新一次，并发未命中只计算一次。
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils.cache import MemoryBackend, RedisBackend, ResponseCache, cached
+
+
+class FakeRedis:
+    """RedisBackend 用到的 Redis 命令的内存实现，时间由 now 控制"""
+
+    def __init__(self):
+        self.now = 0
+        self.values = {}  # key -> bytes 或 set
+        self.expires = {}  # key -> 过期时刻
+
+    def _alive(self, key):
+        if key in self.expires and self.expires[key] <= self.now:
+            self.values.pop(key, None)
+            self.expires.pop(key)
+        return key in self.values
+
+    def get(self, key):
+        return self.values[key] if self._alive(key) else None
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode('utf-8')
+        self.expires.pop(key, None)
+        if ex is not None:
+            self.expires[key] = self.now + ex
+
+    def sadd(self, key, *members):
+        if not self._alive(key):
+            self.values[key] = set()
+        self.values[key].update(member.encode('utf-8') for member in members)
+
+    def smembers(self, key):
+        return set(self.values[key]) if self._alive(key) else set()
+
+    def expire(self, key, seconds):
+        if self._alive(key):
+            self.expires[key] = self.now + seconds
+
+    def ttl(self, key):
+        if not self._alive(key):
+            return -2
+        if key not in self.expires:
+            return -1
+        return self.expires[key] - self.now
+
+    def delete(self, *keys):
+        for key in keys:
+            key = key.decode('utf-8') if isinstance(key, bytes) else key
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+
+
+@pytest.fixture
+def redis_backend():
+    return RedisBackend(FakeRedis())
+
+
+def test_redis_get_set(redis_backend):
+    assert redis_backend.get('/api/courses?') is None
+    value = {'courses': [{'id': 1, 'name': '数据结构'}], 'total': 1}
+    redis_backend.set('/api/courses?', value, 60, tags=['courses'])
+    assert redis_backend.get('/api/courses?') == value
+
+
+def test_redis_tag_invalidation(redis_backend):
+    redis_backend.set('/api/courses/1?', {'id': 1}, 60, tags=['course:1', 'courses'])
+    redis_backend.set('/api/courses/2?', {'id': 2}, 60, tags=['course:2', 'courses'])
+    redis_backend.set('/api/rankings?', {'rankings': []}, 60, tags=['rankings'])
+
+    redis_backend.invalidate(['course:1'])
+    assert redis_backend.get('/api/courses/1?') is None
+    assert redis_backend.get('/api/courses/2?') == {'id': 2}
+
+    redis_backend.invalidate(['courses'])
+    assert redis_backend.get('/api/courses/2?') is None
+    assert redis_backend.get('/api/rankings?') == {'rankings': []}
+
+
+def test_redis_ttl(redis_backend):
+    client = redis_backend.client
+    redis_backend.set('/api/rankings?', {'rankings': []}, 60, tags=['rankings'])
+    redis_backend.set('/api/rankings?type=tags', {'rankings': []}, 10, tags=['rankings'])
+
+    # 标签集合的过期时间不短于其中任一缓存项
+    assert client.ttl(redis_backend._tag_key('rankings')) == 60
+    client.now = 30
+    assert redis_backend.get('/api/rankings?type=tags') is None
+    assert redis_backend.get('/api/rankings?') == {'rankings': []}
+    redis_backend.invalidate(['rankings'])
+    assert redis_backend.get('/api/rankings?') is None
+
+    redis_backend.set('/api/courses?', {'courses': []}, 60)
+    client.now = 89
+    assert redis_backend.get('/api/courses?') is not None
+    client.now = 90
+    assert redis_backend.get('/api/courses?') is None
+
+
+def test_redis_errors_are_cache_misses():
+    class BrokenRedis:
+        def __getattr__(self, name):
+            def fail(*args, **kwargs):
+                raise ConnectionError('redis down')
+            return fail
+
+    backend = RedisBackend(BrokenRedis())
+    backend.set('/api/courses?', {'courses': []}, 60, tags=['courses'])
+    assert backend.get('/api/courses?') is None
+    backend.invalidate(['courses'])
+
+
+@pytest.mark.parametrize('workers, expected_ttl', [(1, 60), (4, 5)])
+def test_memory_ttl_limited_with_multiple_workers(workers, expected_ttl):
+    cache = ResponseCache()
+    cache.init_app(SimpleNamespace(config={
+        'CACHE_BACKEND': 'memory', 'CACHE_DEFAULT_TTL': 60, 'CACHE_WORKERS': workers,
+        'CACHE_MEMORY_MULTI_WORKER_TTL': 5
+    }))
+    assert isinstance(cache.backend, MemoryBackend)
+
+    cache.set('/api/courses?', {'courses': []})
+    _, expires_at, _ = cache.backend._entries['/api/courses?']
+    assert expected_ttl - 1 < expires_at - time.time() <= expected_ttl
+
+
+SWR_VALUE = {'value': {'rankings': [1]}, 'fresh_until': 100}
+
+
+def test_memory_invalidation_keeps_stale_entries():
+    backend = MemoryBackend()
+    backend.set('/api/rankings?', SWR_VALUE, 60, tags=['rankings'])
+    backend.set('/api/courses?', {'courses': []}, 60, tags=['rankings'])
+
+    backend.invalidate(['rankings'])
+    assert backend.get('/api/rankings?') == {'value': {'rankings': [1]}, 'fresh_until': 0}
+    assert backend.get('/api/courses?') is None
+
+
+def test_redis_invalidation_keeps_stale_entries(redis_backend):
+    client = redis_backend.client
+    redis_backend.set('/api/rankings?', SWR_VALUE, 60, tags=['rankings'])
+    redis_backend.set('/api/courses?', {'courses': []}, 60, tags=['rankings'])
+    client.now = 20
+
+    redis_backend.invalidate(['rankings'])
+    assert redis_backend.get('/api/rankings?') == {'value': {'rankings': [1]}, 'fresh_until': 0}
+    assert redis_backend.get('/api/courses?') is None
+    # 保留原来剩余的存活时间，标签集合仍在，之后的写入可再次失效
+    assert client.ttl(redis_backend.prefix + '/api/rankings?') == 40
+    assert client.ttl(redis_backend._tag_key('rankings')) == 40
+
+
+def make_view(delay=0, **kwargs):
+    """返回调用次数的视图，每次计算后设置 computed 事件"""
+    calls = []
+    computed = threading.Event()
+
+    @cached(tags=['rankings'], ttl=60, **kwargs)
+    def view():
+        time.sleep(delay)
+        calls.append(1)
+        computed.set()
+        return {'version': len(calls)}, 200
+
+    return view, calls, computed
+
+
+def test_stale_served_while_refreshing_in_background(app, memory_cache):
+    view, calls, computed = make_view(stale_ttl=300)
+    with app.test_request_context('/api/rankings'):
+        assert view() == ({'version': 1}, 200)
+        assert view() == ({'version': 1}, 200)
+        assert len(calls) == 1
+
+        # 写接口失效后先返回旧数据，同时后台刷新一次
+        computed.clear()
+        memory_cache.invalidate('rankings')
+        assert view() == ({'version': 1}, 200)
+        assert computed.wait(5)
+        for _ in range(50):
+            if memory_cache.get('/api/rankings?')['fresh_until'] > 0:
+                break
+            time.sleep(0.01)
+        assert view() == ({'version': 2}, 200)
+        assert len(calls) == 2
+
+
+def test_stale_triggers_single_background_refresh(app, memory_cache):
+    view, calls, computed = make_view(delay=0.2, stale_ttl=300)
+    with app.test_request_context('/api/rankings'):
+        view()
+        computed.clear()
+        memory_cache.invalidate('rankings')
+        started = time.monotonic()
+        for _ in range(5):
+            assert view() == ({'version': 1}, 200)
+        # 返回旧数据不等待后台计算
+        assert time.monotonic() - started < 0.2
+        assert computed.wait(5)
+    time.sleep(0.1)
+    assert len(calls) == 2
+
+
+def test_single_flight_collapses_concurrent_misses(app, memory_cache):
+    view, calls, _ = make_view(delay=0.2, stale_ttl=300)
+    results = []
+
+    def request():
+        with app.test_request_context('/api/rankings'):
+            results.append(view())
+
+    threads = [threading.Thread(target=request) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert results == [({'version': 1}, 200)] * 5
@@ -0,0 +1,129 @@
+"""
+响应缓存失效测试
+
+启用进程内缓存后按 读取 -> 写入 -> 再次读取 的顺序访问接口：
+写接口提交后使对应标签失效，再次读取时看到写入的结果。
+排行榜启用了 stale-while-revalidate，失效后的第一次读取可能仍是旧数据，后台刷新完成后可见。
+"""
+import time
+
+from tests.test_counter_upsert import headers_for
+
+
+def create_course(client, code):
+    response = client.post('/api/courses', json={'course_code': code, 'name': '缓存测试课程', 'teacher_id': 1})
+    assert response.status_code == 201, response.get_data(as_text=True)
+    return response.get_json()['id']
+
+
+def course_page(client, course_id, headers=None):
+    response = client.get('/api/courses/%d/page' % course_id, headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def evaluate(client, course_id, user_id=1, score=4):
+    response = client.post('/api/evaluations', headers=headers_for(user_id), json={
+        'course_id': course_id, 'score': score, 'comment': '缓存测试'
+    })
+    assert response.status_code == 201, response.get_data(as_text=True)
+    return response.get_json()['id']
+
+
+def wait_for(read, predicate, timeout=5):
+    """反复读取直到满足条件（等待排行榜的后台刷新）"""
+    deadline = time.monotonic() + timeout
+    data = read()
+    while not predicate(data) and time.monotonic() < deadline:
+        time.sleep(0.02)
+        data = read()
+    return data
+
+
+def test_course_page_after_evaluation(client, memory_cache):
+    course_id = create_course(client, 'CA100')
+    page = course_page(client, course_id)
+    assert page['evaluations']['evaluations'] == []
+    assert course_page(client, course_id) == page
+
+    evaluation_id = evaluate(client, course_id, score=5)
+    page = course_page(client, course_id)
+    assert [item['id'] for item in page['evaluations']['evaluations']] == [evaluation_id]
+    assert page['course']['evaluation_count'] == 1
+    assert sum(page['rating_distribution'].values()) == 1
+
+
+def test_course_page_after_comment(client, auth_headers, memory_cache):
+    course_id = create_course(client, 'CA101')
+    assert course_page(client, course_id)['discussions']['discussions'] == []
+
+    response = client.post('/api/comments', headers=auth_headers, json={
+        'course_id': course_id, 'user_name': '测试用户', 'content': '缓存测试'
+    })
+    assert response.status_code == 201, response.get_data(as_text=True)
+    discussions = course_page(client, course_id)['discussions']['discussions']
+    assert [item['id'] for item in discussions] == [response.get_json()['id']]
+
+
+def test_course_page_after_like(client, auth_headers, memory_cache):
+    course_id = create_course(client, 'CA102')
+    evaluation_id = evaluate(client, course_id, user_id=2)
+    comment_id = client.post('/api/comments', headers=auth_headers, json={
+        'course_id': course_id, 'user_name': '测试用户', 'content': '缓存测试'
+    }).get_json()['id']
+    page = course_page(client, course_id, auth_headers)
+    assert page['evaluations']['evaluations'][0]['likes'] == 0
+    assert page['discussions']['discussions'][0]['likes_count'] == 0
+
+    assert client.post('/api/evaluations/%d/like' % evaluation_id, headers=auth_headers).status_code == 200
+    assert client.post('/api/discussions/%d/like' % comment_id, headers=auth_headers).status_code == 200
+    page = course_page(client, course_id, auth_headers)
+    evaluation = page['evaluations']['evaluations'][0]
+    discussion = page['discussions']['discussions'][0]
+    assert (evaluation['likes'], evaluation['is_liked']) == (1, True)
+    assert (discussion['likes_count'], discussion['is_liked']) == (1, True)
+
+    # 取消点赞
+    client.post('/api/comments/%d/like' % comment_id, headers=auth_headers)
+    assert course_page(client, course_id, auth_headers)['discussions']['discussions'][0]['likes_count'] == 0
+
+
+def test_teachers_after_teacher_update(client, memory_cache):
+    teacher = client.get('/api/teachers/1').get_json()
+    listed = {item['id']: item for item in client.get('/api/teachers').get_json()}
+    assert listed[1]['title'] == teacher['title']
+
+    title = (teacher['title'] or '') + '（缓存测试）'
+    assert client.put('/api/teachers/1', json={'title': title}).status_code == 200
+    try:
+        assert client.get('/api/teachers/1').get_json()['title'] == title
+        listed = {item['id']: item for item in client.get('/api/teachers').get_json()}
+        assert listed[1]['title'] == title
+    finally:
+        client.put('/api/teachers/1', json={'title': teacher['title']})
+
+
+def test_rankings_after_evaluation(client, memory_cache):
+    course_id = create_course(client, 'CA103')
+
+    def ranked():
+        rankings = client.get('/api/rankings/courses', query_string={'limit': 1000}).get_json()['rankings']
+        return {item['course_id']: item for item in rankings}
+
+    assert course_id not in ranked()
+    evaluate(client, course_id, score=5)
+    rankings = wait_for(ranked, lambda data: course_id in data)
+    assert rankings[course_id]['evaluation_count'] == 1
+
+
+def test_department_rankings_after_course_created(client, memory_cache):
+    def course_counts():
+        rankings = client.get('/api/rankings/departments', query_string={'limit': 1000}).get_json()['rankings']
+        return {item['department']: item['course_count'] for item in rankings}
+
+    department = client.get('/api/teachers/1').get_json()['department']
+    before = course_counts()[department]
+    assert course_counts()[department] == before
+
+    create_course(client, 'CA104')
+    assert course_counts()[department] == before + 1
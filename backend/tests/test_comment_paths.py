@@ -0,0 +1,58 @@
+"""
+评论物化路径测试
+
+回复层级不能超过 path 列能容纳的深度；路径尚未回填（为 NULL）的旧评论
+仍能正常删除整棵子树和继续回复。
+"""
+from app.utils.comments import MAX_COMMENT_LEVEL, PATH_WIDTH
+
+
+def post_comment(client, headers, parent_id=None):
+    return client.post('/api/comments', headers=headers, json={
+        'course_id': 1, 'user_name': '测试用户', 'content': '路径测试', 'parent_id': parent_id
+    })
+
+
+def test_reply_depth_limit(app, client, auth_headers):
+    from app.models import Comment
+
+    parent_id = None
+    for _ in range(MAX_COMMENT_LEVEL):
+        response = post_comment(client, auth_headers, parent_id)
+        assert response.status_code == 201, response.get_data(as_text=True)
+        parent_id = response.get_json()['id']
+
+    assert post_comment(client, auth_headers, parent_id).status_code == 400
+    assert client.post('/api/discussions/%d/replies' % parent_id, headers=auth_headers,
+                       json={'content': '路径测试'}).status_code == 400
+    with app.app_context():
+        path = Comment.query.get(parent_id).path
+        assert len(path) == MAX_COMMENT_LEVEL * (PATH_WIDTH + 1) <= Comment.__table__.c.path.type.length
+
+
+def test_legacy_comments_without_path(app, client, auth_headers):
+    from app import db
+    from app.models import Comment
+    from app.utils.comments import path_segment
+
+    root_id = post_comment(client, auth_headers).get_json()['id']
+    child_id = post_comment(client, auth_headers, root_id).get_json()['id']
+    grandchild_id = post_comment(client, auth_headers, child_id).get_json()['id']
+    # 模拟未运行 migrate_add_comment_paths.py 的旧数据
+    with app.app_context():
+        Comment.query.filter(Comment.id.in_([root_id, child_id, grandchild_id])).update(
+            {'path': None}, synchronize_session=False)
+        db.session.commit()
+
+    # 回复旧评论时沿父评论链计算出完整路径
+    reply = post_comment(client, auth_headers, grandchild_id)
+    assert reply.status_code == 201
+    with app.app_context():
+        assert Comment.query.get(reply.get_json()['id']).path == ''.join(
+            path_segment(comment_id) for comment_id in (root_id, child_id, grandchild_id, reply.get_json()['id']))
+
+    response = client.delete('/api/comments/%d' % root_id, headers=auth_headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    with app.app_context():
+        assert Comment.query.filter(
+            Comment.id.in_([root_id, child_id, grandchild_id, reply.get_json()['id']])).count() == 0
@@ -0,0 +1,27 @@
+"""
+评论回复列表测试
+
+不传分页参数时同样返回 {replies, next_cursor, replies_count}，按游标翻页能取到全部直接回复。
+"""
+
+
+def test_replies_always_paginated(app, client, auth_headers):
+    root_id = client.post('/api/comments', headers=auth_headers, json={
+        'course_id': 1, 'user_name': '测试用户', 'content': '回复分页测试'
+    }).get_json()['id']
+    reply_ids = [client.post('/api/comments', headers=auth_headers, json={
+        'course_id': 1, 'user_name': '测试用户', 'content': '回复', 'parent_id': root_id
+    }).get_json()['id'] for _ in range(25)]
+
+    first = client.get('/api/comments/%d/replies' % root_id).get_json()
+    assert first['replies_count'] == 25
+    assert len(first['replies']) == 20
+    assert first['next_cursor']
+
+    collected = []
+    cursor = ''
+    while cursor is not None:
+        page = client.get('/api/comments/%d/replies' % root_id, query_string={'cursor': cursor, 'limit': 7}).get_json()
+        collected += [reply['id'] for reply in page['replies']]
+        cursor = page['next_cursor']
+    assert collected == reply_ids
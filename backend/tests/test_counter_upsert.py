@@ -0,0 +1,121 @@
+"""
+计数行并发创建测试
+
+计数表的行由 insert_missing 创建：行已存在（例如刚被另一个事务插入）时不报错、不改动已有计数，
+随后的原子 UPDATE 在已有计数上累加。
+"""
+import os
+from datetime import datetime, timedelta
+
+import jwt
+
+
+def headers_for(user_id):
+    token = jwt.encode({'user_id': user_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                       os.environ['SECRET_KEY'], algorithm='HS256')
+    return {'Authorization': 'Bearer ' + token}
+
+
+def test_course_created_with_stats(app, client):
+    from app import db
+    from app.models import CourseStats
+
+    created = client.post('/api/courses', json={'course_code': 'UP100', 'name': '计数测试课程', 'teacher_id': 1})
+    assert created.status_code == 201
+    with app.app_context():
+        stats = db.session.get(CourseStats, created.get_json()['id'])
+        assert stats is not None
+        assert (stats.evaluation_count, stats.score_sum, stats.score_5_count) == (0, 0, 0)
+
+
+def test_existing_course_stats_row_is_kept(app):
+    from app import db
+    from app.models import CourseStats
+    from app.utils.stats import ensure_course_stats
+
+    with app.app_context():
+        before = db.session.get(CourseStats, 1)
+        count, score_sum = before.evaluation_count, before.score_sum
+        assert count > 0
+        # 另一个事务已插入统计行时，再次创建不会报错也不会清零
+        ensure_course_stats(1)
+        db.session.flush()
+        after = db.session.get(CourseStats, 1)
+        assert (after.evaluation_count, after.score_sum) == (count, score_sum)
+        db.session.rollback()
+
+
+def test_first_evaluation_without_stats_row(app, client):
+    from app import db
+    from app.models import CourseDailyStats, CourseStats
+
+    course_id = client.post('/api/courses', json={
+        'course_code': 'UP101', 'name': '缺少统计行的课程', 'teacher_id': 1
+    }).get_json()['id']
+    # 旧数据中的课程可能没有统计行，写入评价时补建
+    with app.app_context():
+        CourseStats.query.filter_by(course_id=course_id).delete()
+        db.session.commit()
+
+    for user_id in (1, 2):
+        response = client.post('/api/evaluations', headers=headers_for(user_id), json={
+            'course_id': course_id, 'score': 4, 'comment': '测试'
+        })
+        assert response.status_code == 201, response.get_data(as_text=True)
+
+    with app.app_context():
+        stats = db.session.get(CourseStats, course_id)
+        assert (stats.evaluation_count, stats.score_sum, stats.score_4_count) == (2, 8, 2)
+        # 两条评价落在同一个每日分桶，第二条复用已有分桶
+        buckets = CourseDailyStats.query.filter_by(course_id=course_id).all()
+        assert [(bucket.evaluation_count, bucket.score_sum) for bucket in buckets] == [(2, 8)]
+
+
+def test_tag_stats_rows_created_once(app):
+    from app import db
+    from app.models import TagStats
+    from app.utils.tags import get_or_create_tags, shift_tag_stats
+    from app.utils.upsert import insert_missing
+
+    with app.app_context():
+        tag_id = get_or_create_tags(['计数测试标签'])['计数测试标签'].id
+        shift_tag_stats({tag_id: 2}, '2024春', '测试学院')
+        # 另一个事务在查询之后插入了同一行：insert_missing 跳过，已有计数不变
+        insert_missing(TagStats, [{'tag_id': tag_id, 'semester': '', 'department': '', 'usage_count': 0}])
+        shift_tag_stats({tag_id: 1}, '2024春', '测试学院')
+        counts = {(row.semester, row.department): row.usage_count
+                  for row in TagStats.query.filter_by(tag_id=tag_id)}
+        assert counts == {('', ''): 3, ('2024春', ''): 3, ('', '测试学院'): 3, ('2024春', '测试学院'): 3}
+        db.session.rollback()
+
+
+def test_tags_created_once(app):
+    from app import db
+    from app.models import Tag
+    from app.utils.tags import get_or_create_tags
+    from app.utils.upsert import insert_missing
+
+    with app.app_context():
+        first = get_or_create_tags(['并发标签甲', '并发标签乙'])
+        # 另一个事务已创建同名标签时跳过插入，返回已有标签
+        insert_missing(Tag, [{'name': '并发标签丙'}])
+        second = get_or_create_tags(['并发标签乙', '并发标签丙', '并发标签甲'])
+        assert {name: tag.id for name, tag in second.items() if name in first} == \
+            {name: tag.id for name, tag in first.items()}
+        assert Tag.query.filter(Tag.name.like('并发标签%')).count() == 3
+        db.session.rollback()
+
+
+def test_user_stats_row_created_once(app):
+    from app import db
+    from app.models import UserStats
+    from app.utils.user_stats import ensure_user_stats, shift_user_stats
+
+    with app.app_context():
+        before = db.session.get(UserStats, 1)
+        counts = (before.evaluation_count, before.reply_count)
+        # 统计行已存在（例如另一个事务刚创建）时不报错也不清零
+        ensure_user_stats(1)
+        shift_user_stats(1, evaluation_count=1, reply_count=2)
+        assert (before.evaluation_count, before.reply_count) == (counts[0] + 1, counts[1] + 2)
+        db.session.rollback()
@@ -0,0 +1,32 @@
+"""
+批量获取课程接口测试
+"""
+
+
+def test_get_preserves_order_and_reports_missing(client):
+    data = client.get('/api/courses/batch', query_string={'ids': '3, 1,999999,3,2'}).get_json()
+    assert [course['id'] for course in data['courses']] == [3, 1, 2]
+    assert data['missing_ids'] == [999999]
+
+    detail = client.get('/api/courses/1').get_json()
+    course = data['courses'][1]
+    assert (course['avg_score'], course['evaluation_count']) == (detail['avg_score'], detail['evaluation_count'])
+
+
+def test_post_matches_get(client):
+    ids = [5, 4, 999999, 1]
+    posted = client.post('/api/courses/batch', json={'ids': ids}).get_json()
+    assert posted == client.get('/api/courses/batch', query_string={'ids': ','.join(map(str, ids))}).get_json()
+
+
+def test_empty_ids(client):
+    assert client.get('/api/courses/batch').get_json() == {'courses': [], 'missing_ids': []}
+
+
+def test_invalid_ids(client):
+    from app.api.courses import MAX_BATCH_IDS
+
+    assert client.get('/api/courses/batch', query_string={'ids': '1,a'}).status_code == 400
+    assert client.post('/api/courses/batch', json={'ids': '1,2'}).status_code == 400
+    assert client.post('/api/courses/batch', json={'ids': [1, 2.5]}).status_code == 400
+    assert client.post('/api/courses/batch', json={'ids': list(range(1, MAX_BATCH_IDS + 2))}).status_code == 400
@@ -0,0 +1,42 @@
+"""
+课程页聚合接口测试
+
+聚合接口各区块应与对应的单独接口返回相同的数据。
+"""
+PER_PAGE = 5
+
+
+def get_json(client, url, headers, **params):
+    response = client.get(url, query_string=params, headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def test_sections_match_individual_endpoints(client, auth_headers):
+    page = get_json(client, '/api/courses/1/page', auth_headers, per_page=PER_PAGE)
+
+    assert page['course'] == get_json(client, '/api/courses/1', auth_headers)
+    assert page['popular_tags'] == get_json(client, '/api/courses/1/popular_tags', auth_headers)['tags']
+    assert page['rating_distribution'] == get_json(
+        client, '/api/courses/1/rating_distribution', auth_headers)['distribution']
+
+    evaluations = get_json(client, '/api/evaluations', auth_headers, course_id=1, cursor='', per_page=PER_PAGE)
+    assert page['evaluations']['evaluations'] == evaluations['evaluations']
+    assert page['evaluations']['next_cursor'] == evaluations['next_cursor']
+
+    discussions = get_json(client, '/api/discussions', auth_headers, course_id=1, cursor='', page_size=PER_PAGE)
+    assert page['discussions'] == discussions
+
+
+def test_liked_state_follows_user(client, auth_headers):
+    page = get_json(client, '/api/courses/1/page', auth_headers, per_page=PER_PAGE)
+    anonymous = get_json(client, '/api/courses/1/page', {}, per_page=PER_PAGE)
+
+    assert not any(item['is_liked'] for item in anonymous['evaluations']['evaluations'])
+    assert not any(item['is_liked'] for item in anonymous['discussions']['discussions'])
+    for section, key in (('evaluations', 'evaluations'), ('discussions', 'discussions')):
+        assert [item['id'] for item in page[section][key]] == [item['id'] for item in anonymous[section][key]]
+
+
+def test_missing_course(client):
+    assert client.get('/api/courses/999999/page').status_code == 404
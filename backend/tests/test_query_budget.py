@@ -0,0 +1,136 @@
+"""
+接口查询次数回归测试
+
+对每个已注册的 GET 接口分别以较小和较大的每页数量发出已登录请求：
+查询次数不得超过该接口的预算，也不得随每页数量增长。
+新增的逐行查询（N+1）会使测试失败，失败信息中列出本次请求执行的全部SQL。
+"""
+from urllib.parse import urlencode
+
+import pytest
+
+SMALL_PAGE = 5
+LARGE_PAGE = 15
+
+# 路由参数的取值，中等规模数据中这些对象都有多于一页的关联数据
+ROUTE_ARGS = {
+    'course_id': 1,
+    'teacher_id': 1,
+    'evaluation_id': 1,
+    'comment_id': 1,
+    'discussion_id': 1,
+    'user_id': 1,
+    'department': '计算机与人工智能学院',
+}
+
+# 需要额外查询参数才会访问数据库的接口
+ROUTE_PARAMS = {
+    '/api/courses/batch': {'ids': ','.join(str(course_id) for course_id in range(1, 40))},
+    '/api/search/suggest': {'q': '数'},
+}
+
+# 按查询参数走不同查询分支的接口，每个分支分别以同一预算检查
+ROUTE_VARIANTS = {
+    '/api/rankings': [{'type': ranking_type} for ranking_type in ('courses', 'teachers', 'tags', 'departments')],
+}
+
+# 各接口已登录请求允许的最多查询次数；接口改动使查询次数变化时同步调整
+QUERY_BUDGETS = {
+    '/api/comments': 5,
+    '/api/comments/<int:comment_id>': 4,
+    '/api/comments/<int:comment_id>/replies': 3,
+    '/api/courses': 3,
+    '/api/courses/batch': 2,
+    '/api/courses/<int:course_id>': 4,
+    '/api/courses/<int:course_id>/page': 9,
+    '/api/courses/<int:course_id>/popular_tags': 2,
+    '/api/courses/<int:course_id>/rating_distribution': 2,
+    '/api/departments/<department>/rating_summary': 2,
+    '/api/discussions': 6,
+    '/api/discussions/<int:discussion_id>': 5,
+    '/api/evaluations': 4,
+    '/api/evaluations/<int:evaluation_id>': 2,
+    '/api/me': 2,
+    '/api/rankings': 1,
+    '/api/rankings/courses': 1,
+    '/api/rankings/departments': 1,
+    '/api/rankings/tags': 1,
+    '/api/rankings/teachers': 1,
+    '/api/search/suggest': 0,
+    '/api/teachers': 1,
+    '/api/teachers/<int:teacher_id>': 1,
+    '/api/teachers/<int:teacher_id>/courses': 3,
+    '/api/teachers/<int:teacher_id>/rating_summary': 2,
+    '/api/users/<int:user_id>/discussions': 3,
+    '/api/users/<int:user_id>/evaluations': 2,
+}
+
+# 列表接口另以游标分页模式检查
+CURSOR_ROUTES = [
+    '/api/courses',
+    '/api/evaluations',
+    '/api/comments',
+    '/api/comments/<int:comment_id>/replies',
+    '/api/discussions',
+    '/api/discussions/<int:discussion_id>',
+    '/api/users/<int:user_id>/evaluations',
+    '/api/users/<int:user_id>/discussions',
+]
+
+
+def get_routes(app):
+    """全部 GET 接口的路由规则"""
+    return sorted(rule.rule for rule in app.url_map.iter_rules()
+                  if 'GET' in rule.methods and rule.endpoint != 'static')
+
+
+def build_url(rule):
+    url = rule
+    for name, value in ROUTE_ARGS.items():
+        url = url.replace('<int:%s>' % name, str(value)).replace('<%s>' % name, str(value))
+    return url
+
+
+def page_args(size):
+    # 各接口的每页数量参数名不同，一并传入
+    return {'per_page': size, 'page_size': size, 'limit': size}
+
+
+def route_cases(rules, cursor):
+    """(路由, 分支参数, 是否游标分页) 的测试用例，分支参数写入用例ID"""
+    cases = []
+    for rule in rules:
+        for variant in ROUTE_VARIANTS.get(rule, [{}]):
+            case_id = rule + ('?' + urlencode(variant) if variant else '') + ('?cursor' if cursor else '')
+            cases.append(pytest.param(rule, variant, cursor, id=case_id))
+    return cases
+
+
+def measure(client, queries, url, params, headers):
+    queries.reset()
+    response = client.get(url, query_string=params, headers=headers)
+    assert response.status_code == 200, '%s 返回 %d: %s' % (url, response.status_code, response.get_data(as_text=True))
+    return queries.count, queries.report()
+
+
+def test_every_route_has_budget(app):
+    missing = [rule for rule in get_routes(app) if rule not in QUERY_BUDGETS]
+    assert not missing, '以下接口缺少查询预算，请在 QUERY_BUDGETS 中补充: %s' % missing
+
+
+@pytest.mark.parametrize('rule, variant, cursor', route_cases(sorted(QUERY_BUDGETS), False) +
+                         route_cases(CURSOR_ROUTES, True))
+def test_query_budget(client, queries, auth_headers, rule, variant, cursor):
+    url = build_url(rule)
+    extra = dict(ROUTE_PARAMS.get(rule, {}), **variant, **({'cursor': ''} if cursor else {}))
+
+    # 预热：进程内只执行一次的查询（如数据库版本探测）不计入
+    client.get(url, query_string=dict(extra, **page_args(SMALL_PAGE)), headers=auth_headers)
+
+    small, small_report = measure(client, queries, url, dict(extra, **page_args(SMALL_PAGE)), auth_headers)
+    large, large_report = measure(client, queries, url, dict(extra, **page_args(LARGE_PAGE)), auth_headers)
+
+    assert large <= small, '%s 的查询次数随每页数量增长（%d 条/页: %d 次，%d 条/页: %d 次）：\n%s' % (
+        url, SMALL_PAGE, small, LARGE_PAGE, large, large_report)
+    assert large <= QUERY_BUDGETS[rule], '%s 执行了 %d 次查询，超出预算 %d 次：\n%s' % (
+        url, large, QUERY_BUDGETS[rule], large_report)
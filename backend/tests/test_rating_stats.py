@@ -0,0 +1,115 @@
+"""
+评分分布与各维度平均分测试
+
+course_stats 中维护的五档计数和维度汇总应与直接按评价表计算的结果一致，
+课程、教师、学院三个层级都要检查，评价增删改后同样一致。
+"""
+import os
+from datetime import datetime, timedelta
+
+import jwt
+
+from app.utils.stats import DIMENSIONS
+
+
+def expected_summary(evaluations):
+    distribution = {str(star): 0 for star in (5, 4, 3, 2, 1)}
+    for evaluation in evaluations:
+        distribution[str(int(evaluation.score))] += 1
+    summary = {
+        'evaluation_count': len(evaluations),
+        'avg_score': round(sum(e.score for e in evaluations) / len(evaluations), 1) if evaluations else 0,
+        'distribution': distribution,
+    }
+    for name in DIMENSIONS:
+        values = [getattr(e, name + '_score') for e in evaluations if getattr(e, name + '_score') is not None]
+        if values:
+            summary['avg_%s_score' % name] = round(sum(values) / len(values), 1)
+    return summary
+
+
+def check_all_levels(app, client):
+    from app.models import Course, Evaluation, Teacher
+
+    with app.app_context():
+        course_ids = [course.id for course in Course.query.filter(Course.id.in_([1, 2, 3]))]
+        teacher = Teacher.query.get(1)
+        teacher_id, department = teacher.id, teacher.department
+        expected = {
+            'course': {course_id: expected_summary(Evaluation.query.filter_by(course_id=course_id).all())
+                       for course_id in course_ids},
+            'teacher': expected_summary(Evaluation.query.join(Course).filter(Course.teacher_id == teacher_id).all()),
+            'department': expected_summary(
+                Evaluation.query.join(Course).join(Teacher).filter(Teacher.department == department).all()),
+        }
+
+    for course_id, summary in expected['course'].items():
+        distribution = client.get('/api/courses/%d/rating_distribution' % course_id).get_json()['distribution']
+        assert distribution == summary['distribution']
+        detail = client.get('/api/courses/%d' % course_id).get_json()
+        for name in DIMENSIONS:
+            assert detail.get('avg_%s_score' % name) == summary.get('avg_%s_score' % name)
+
+    teacher_summary = client.get('/api/teachers/%d/rating_summary' % teacher_id).get_json()
+    assert teacher_summary == dict(expected['teacher'], teacher_id=teacher_id)
+    department_summary = client.get('/api/departments/%s/rating_summary' % department).get_json()
+    assert department_summary == dict(expected['department'], department=department)
+
+
+def test_summaries_match_evaluations(app, client):
+    check_all_levels(app, client)
+
+
+def test_summaries_follow_evaluation_writes(app, client):
+    from app.models import Evaluation, User
+
+    # 找一个尚未评价1号课程的用户
+    with app.app_context():
+        evaluated = {user_id for (user_id,) in Evaluation.query.with_entities(Evaluation.user_id).filter_by(course_id=1)}
+        user_id = next(user.id for user in User.query.order_by(User.id) if user.id not in evaluated)
+    token = jwt.encode({'user_id': user_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                       os.environ['SECRET_KEY'], algorithm='HS256')
+    headers = {'Authorization': 'Bearer ' + token}
+
+    response = client.post('/api/evaluations', headers=headers, json={
+        'course_id': 1, 'score': 2.5, 'workload_score': 5, 'content_score': 1, 'comment': '测试'
+    })
+    assert response.status_code == 201, response.get_data(as_text=True)
+    evaluation_id = response.get_json()['id']
+    check_all_levels(app, client)
+
+    assert client.put('/api/evaluations/%d' % evaluation_id, headers=headers, json={'score': 4.5}).status_code == 200
+    check_all_levels(app, client)
+
+    assert client.delete('/api/evaluations/%d' % evaluation_id, headers=headers).status_code == 200
+    check_all_levels(app, client)
+
+
+def test_missing_department(client):
+    assert client.get('/api/departments/不存在的学院/rating_summary').status_code == 404
+
+
+def test_zero_dimension_score_counted_like_rebuild(app):
+    from sqlalchemy import func
+
+    from app import db
+    from app.models import Course, CourseStats, Evaluation
+    from app.utils.stats import apply_evaluation, ensure_course_stats
+
+    with app.app_context():
+        course = Course(course_code='ZS100', name='零分维度课程', teacher_id=1)
+        db.session.add(course)
+        db.session.flush()
+        ensure_course_stats(course.id)
+        # 导入的旧数据中维度评分可能为0：与 rebuild_course_stats 的 COUNT(列) 一样计入
+        evaluation = Evaluation(course_id=course.id, user_id=1, score=3, workload_score=0, content_score=None,
+                                teaching_score=4, comment='测试', created_at=datetime.utcnow())
+        db.session.add(evaluation)
+        db.session.flush()
+        apply_evaluation(evaluation)
+
+        stats = db.session.get(CourseStats, course.id)
+        rebuilt = db.session.query(*[func.count(getattr(Evaluation, name + '_score')) for name in DIMENSIONS]).filter(
+            Evaluation.course_id == course.id).one()
+        assert [getattr(stats, name + '_count') for name in DIMENSIONS] == list(rebuilt) == [1, 0, 1]
+        db.session.rollback()
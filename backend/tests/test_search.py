@@ -0,0 +1,137 @@
+"""
+课程关键词搜索测试
+
+搜索索引的匹配结果应与原先四个字段的子串匹配（LIKE）一致，
+关键词搜索默认按相关度排序，页码分页与游标分页的结果顺序相同。
+"""
+import pytest
+
+KEYWORDS = ['数据', '据结构', 'CS1', 'cs', '张三', '数', 'a', '1', 'xyz', '%']
+
+
+def like_ids(keyword):
+    from app.models import Course, Teacher
+    return {course.id for course in Course.query.filter(
+        Course.name.contains(keyword) |
+        Course.course_code.contains(keyword) |
+        Course.description.contains(keyword) |
+        Course.teacher.has(Teacher.name.contains(keyword))
+    )}
+
+
+def search_ids(client, **params):
+    response = client.get('/api/courses', query_string=params)
+    assert response.status_code == 200
+    return [course['id'] for course in response.get_json()['courses']]
+
+
+@pytest.mark.parametrize('keyword', KEYWORDS)
+def test_keyword_matches_substring(app, client, keyword):
+    with app.app_context():
+        expected = like_ids(keyword)
+    assert set(search_ids(client, keyword=keyword, per_page=1000)) == expected
+
+
+@pytest.mark.parametrize('keyword', ['数', '1'])
+def test_cursor_pages_follow_relevance_order(client, keyword):
+    ranked = search_ids(client, keyword=keyword, per_page=1000)
+    paged = []
+    cursor = ''
+    while cursor is not None:
+        data = client.get('/api/courses', query_string={'keyword': keyword, 'per_page': 3, 'cursor': cursor}).get_json()
+        paged += [course['id'] for course in data['courses']]
+        cursor = data['next_cursor']
+    assert paged == ranked
+
+
+def test_keyword_with_explicit_sort(client):
+    data = client.get('/api/courses', query_string={'keyword': '张三', 'sort_by': 'name', 'per_page': 1000}).get_json()
+    courses = [(course['name'], course['id']) for course in data['courses']]
+    assert courses == sorted(courses)
+    assert {course_id for _, course_id in courses} == set(search_ids(client, keyword='张三', per_page=1000))
+
+
+def test_keyword_query_count(client, queries):
+    client.get('/api/courses', query_string={'keyword': '数据'})
+    queries.reset()
+    client.get('/api/courses', query_string={'keyword': '数据', 'per_page': 15})
+    assert queries.count <= 3, queries.report()
+
+
+@pytest.mark.parametrize('prefix', ['数', '数据', 'cs', 'CS1', '张'])
+def test_suggest_matches_prefix(client, queries, prefix):
+    queries.reset()
+    data = client.get('/api/search/suggest', query_string={'q': prefix, 'limit': 20}).get_json()
+    assert queries.count == 0, queries.report()
+    assert data['suggestions']
+    for item in data['suggestions']:
+        keys = [item['name'], item.get('course_code') or '']
+        assert any(key.lower().startswith(prefix.lower()) for key in keys), item
+
+
+def test_suggest_follows_writes(app, client):
+    from app import db
+    from app.models import Course
+
+    created = client.post('/api/courses', json={'course_code': 'QX900', 'name': '琴弦物理导论', 'teacher_id': 1}).get_json()
+    assert [item['id'] for item in client.get('/api/search/suggest', query_string={'q': '琴弦'}).get_json()['suggestions']] == [created['id']]
+
+    client.put('/api/courses/%d/rating_distribution' % created['id'], json={'name': '鸣弦物理导论'})
+    assert client.get('/api/search/suggest', query_string={'q': '琴弦'}).get_json()['suggestions'] == []
+    assert client.get('/api/search/suggest', query_string={'q': 'qx9'}).get_json()['suggestions'][0]['name'] == '鸣弦物理导论'
+
+    client.delete('/api/courses/%d/rating_distribution' % created['id'])
+    assert client.get('/api/search/suggest', query_string={'q': '鸣弦'}).get_json()['suggestions'] == []
+    with app.app_context():
+        assert db.session.get(Course, created['id']) is None
+
+
+def test_suggest_matches_pinyin_initials(client):
+    created = client.post('/api/courses', json={'course_code': 'XJ100', 'name': '璇玑图研读', 'teacher_id': 1}).get_json()
+    for prefix in ('xjty', 'XJTYD'):
+        suggestions = client.get('/api/search/suggest', query_string={'q': prefix}).get_json()['suggestions']
+        assert created['id'] in [item['id'] for item in suggestions if item['type'] == 'course']
+    client.delete('/api/courses/%d/rating_distribution' % created['id'])
+
+
+def test_suggest_rebuilds_after_ttl(app, client):
+    from app import db
+    from app.models import Course
+    from app.utils.suggest import suggest_index
+
+    # 模拟其他 worker 的写入：直接写库，不经过本进程的增量更新
+    with app.app_context():
+        course = Course(course_code='QT100', name='曲水流觞赏析', teacher_id=1)
+        db.session.add(course)
+        db.session.commit()
+        course_id = course.id
+    assert client.get('/api/search/suggest', query_string={'q': '曲水'}).get_json()['suggestions'] == []
+
+    # 过期后的请求不等待重建，重建在后台线程完成
+    suggest_index._built_at -= suggest_index.ttl
+    assert client.get('/api/search/suggest', query_string={'q': '曲水'}).status_code == 200
+    suggest_index._rebuild_thread.join(5)
+    suggestions = client.get('/api/search/suggest', query_string={'q': '曲水'}).get_json()['suggestions']
+    assert [item['id'] for item in suggestions] == [course_id]
+
+    client.delete('/api/courses/%d/rating_distribution' % course_id)
+
+
+def test_suggest_rebuild_replays_concurrent_updates(app, monkeypatch):
+    from app.utils.suggest import suggest_index
+
+    # 重建查询数据库之后、替换索引之前提交的写入，替换后仍然可见
+    build_teacher = suggest_index._build_teacher
+
+    def build_teacher_then_write(*args):
+        build_teacher(*args)
+        if args[0] == 1:
+            suggest_index._replace(('teacher', 999), lambda keys, items: build_teacher(
+                999, '赵重放', None, keys, items))
+
+    monkeypatch.setattr(suggest_index, '_build_teacher', build_teacher_then_write)
+    with app.app_context():
+        suggest_index.rebuild()
+    monkeypatch.undo()
+    assert [item['id'] for item in suggest_index.suggest('赵重放')] == [999]
+    suggest_index.remove_teacher(999)
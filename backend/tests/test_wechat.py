@@ -0,0 +1,114 @@
+"""
+微信 code2session 客户端重试测试
+
+只有请求确定没有送达（连接失败）或微信明确要求重试（5xx、errcode -1）时才重试，
+读取超时不重试（js_code 只能使用一次）；整个调用不超过总时限。
+"""
+import time
+
+import pytest
+import requests
+
+from app.utils.wechat import CircuitBreaker, WechatClient, WechatUnavailableError
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        if isinstance(self._body, Exception):
+            raise self._body
+        return self._body
+
+
+class FakeSession:
+    """按顺序返回预设的结果（FakeResponse 或要抛出的异常）"""
+
+    def __init__(self, outcomes, delay=0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        # 与 requests 一致：超时必须为正数
+        if timeout is not None and min(timeout) <= 0:
+            raise ValueError('Attempted to set connect timeout to %r' % (timeout,))
+        self.calls.append(timeout)
+        time.sleep(self.delay)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def make_client(outcomes, delay=0, **kwargs):
+    kwargs.setdefault('backoff', 0.01)
+    client = WechatClient('appid', 'secret', **kwargs)
+    client.session = FakeSession(outcomes, delay)
+    return client
+
+
+OK = FakeResponse(body={'openid': 'o1', 'session_key': 'k'})
+
+
+@pytest.mark.parametrize('failure', [
+    requests.ConnectionError('refused'),
+    requests.ConnectTimeout('connect timeout'),
+    FakeResponse(status_code=502),
+    FakeResponse(body={'errcode': -1, 'errmsg': 'system busy'}),
+])
+def test_retryable_failures(failure):
+    client = make_client([failure, OK])
+    assert client.code2session('code')['openid'] == 'o1'
+    assert len(client.session.calls) == 2
+
+
+@pytest.mark.parametrize('failure', [
+    requests.ReadTimeout('read timeout'),
+    FakeResponse(body=ValueError('not json')),
+])
+def test_no_retry_once_request_may_have_been_consumed(failure):
+    client = make_client([failure, OK])
+    with pytest.raises(WechatUnavailableError):
+        client.code2session('code')
+    assert len(client.session.calls) == 1
+
+
+def test_business_error_not_retried():
+    client = make_client([FakeResponse(body={'errcode': 40163, 'errmsg': 'code been used'}), OK])
+    assert client.code2session('code') is None
+    assert len(client.session.calls) == 1
+
+
+def test_deadline_bounds_total_time():
+    busy = FakeResponse(body={'errcode': -1})
+    client = make_client([busy] * 10, delay=0.2, max_retries=9, backoff=0.05, deadline=0.5)
+    started = time.monotonic()
+    with pytest.raises(WechatUnavailableError):
+        client.code2session('code')
+    assert time.monotonic() - started < 0.5 + 0.2
+    assert len(client.session.calls) < 10
+    # 每次请求的超时不超过剩余时间
+    assert all(connect <= 0.5 and read <= 0.5 for connect, read in client.session.calls)
+
+
+def test_deadline_reached_between_attempts(monkeypatch):
+    client = make_client([FakeResponse(status_code=503)] * 3, delay=0.1, deadline=0.05)
+    # 退避后总时限恰好用完：不再发出请求，按微信不可用处理
+    monkeypatch.setattr(client, '_sleep_before_retry', lambda attempt, deadline: True)
+    with pytest.raises(WechatUnavailableError):
+        client.code2session('code')
+    assert len(client.session.calls) == 1
+
+
+def test_probe_released_after_unexpected_error():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    client = make_client([RuntimeError('boom'), OK], breaker=breaker)
+    with pytest.raises(RuntimeError):
+        client.code2session('code')
+    # 试探请求异常退出后，下一次请求仍可作为试探放行
+    assert client.code2session('code')['openid'] == 'o1'
+    assert not breaker.is_open